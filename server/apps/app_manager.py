@@ -3,16 +3,30 @@ from threading import Thread
 import tornado.web
 
 from support.logger import Logger
+from support.runtime_metrics import runtime_metrics
 from .visualization.visualization_manager import Visualization, VisualizationWebSocketHandler
 
 from middleware.client_middleware import ClientMiddleware
+from middleware.listener_queue import StatusOverloadPolicy
+
+# The UI only shows the latest value of each topic, so a stalled websocket
+# side conflates statuses instead of letting the queue grow without limit
+APP_MANAGER_QUEUE_CAPACITY = int(os.getenv('APP_MANAGER_QUEUE_CAPACITY', '10000'))
+REQUEST_EXPIRY_INTERVAL_MS = 500
 
 
 class AppManager:
-    def __init__(self, middleware):
-        self._middleware = ClientMiddleware(middleware, "app_manager")
+    LISTENER_NAME = "app_manager"
+    QUEUE_CAPACITY = APP_MANAGER_QUEUE_CAPACITY
+    COMMANDS = ()
+
+    def __init__(self, middleware, use_multiprocessing=False):
+        self._middleware = ClientMiddleware(middleware, self.LISTENER_NAME, use_multiprocessing,
+                                            queue_capacity=self.QUEUE_CAPACITY,
+                                            status_policy=StatusOverloadPolicy.KEEP_LATEST)
         self._server = AppServer(self._middleware)
         self._thread = Thread(target=self.threaded_function)
+        runtime_metrics.add_source(self.LISTENER_NAME, self._middleware.get_metrics)
 
     def threaded_function(self):
         self._server.run()
@@ -23,6 +37,9 @@ class AppManager:
     def join(self):
         self._thread.join()
 
+    def wait(self):
+        self._thread.join()
+
 
 class AppServer:
     _logger: Logger
@@ -35,8 +52,16 @@ class AppServer:
     def run(self):
         self.app.listen(8888)  # Listen on port 8888
         self._logger.info("Server is running on http://localhost:8888")
-        tornado.ioloop.PeriodicCallback(self.send_test_messages, 200).start()
-        tornado.ioloop.IOLoop.current().start()
+        io_loop = tornado.ioloop.IOLoop.current()
+        if not self._middleware.set_wakeup_callback(
+                lambda: io_loop.add_callback(self.send_test_messages)):
+            # Listeners in another process cannot wake the loop, keep polling
+            tornado.ioloop.PeriodicCallback(
+                self.send_test_messages, 200).start()
+        # Wakeups only come with messages, deadlines of unanswered commands need their own tick
+        tornado.ioloop.PeriodicCallback(
+            self._middleware.expire_requests, REQUEST_EXPIRY_INTERVAL_MS).start()
+        io_loop.start()
 
     def send_test_messages(self):
         self._middleware.run_middleware_update()
@@ -2,6 +2,7 @@ import json
 import multiprocessing
 import threading
 import time
+import uuid
 import tornado.web
 import tornado.websocket
 
@@ -16,7 +17,8 @@ from support.logger import Logger
 from dataModules.panel import Panel
 from middleware.subscriber_interface import SubscriberInterface
 from middleware.status_subscriber import StatuSubscribers
-from middleware.client_middleware import ClientMiddleware
+from middleware.subscriber_dispatcher import DispatchMode
+from middleware.client_middleware import ClientMiddleware, CommandError
 from services.sensor_data_storage.sensor_data_storage_commands import SensorDataStorageCommands
 
 from services.config_handler.config_handler_command import ConfigHandlerCommands
@@ -76,13 +78,18 @@ class VisualizationWebSocketHandler(tornado.websocket.WebSocketHandler):
 
         self._gateway_status_subscriber = StatuSubscribers(
             self.send_gateway_status, "gateway-statusupdate-*")
+        # Replayed so a new dashboard shows the gateways without waiting for an update
         self._middleware.add_subscribe_to_status(
-            self._gateway_status_subscriber, "gateway-statusupdate-*")
+            self._gateway_status_subscriber, "gateway-statusupdate-*", replay_last_value=True)
 
     def initialize(self, middleware):
         self._logger = Logger()
         self._middleware = middleware
+        # Sensor updates are prepared on a dispatcher thread, writes go back to this loop
+        self._io_loop = tornado.ioloop.IOLoop.current()
         self._status_subscribers = {}
+        # Every gateway topic of this socket is prepared on one dispatcher thread
+        self._serial_lane = f"websocket-{uuid.uuid4()}"
         self.initialize_event_sub()
         self.initialize_ui_update_sub()
         self.initialize_error_sub()
@@ -105,9 +112,9 @@ class VisualizationWebSocketHandler(tornado.websocket.WebSocketHandler):
         payload = message_obj["payload"]
         try:
             if ("addPanel" in message_obj["commandName"]):
-                self.add_panel_request(payload)
+                self.spawn_command(self.add_panel_request, payload)
             elif "removePanel" in message_obj["commandName"]:
-                self.remove_panel(payload)
+                self.spawn_command(self.remove_panel, payload)
             elif "getStatusHistory" in message_obj["commandName"]:
                 self.request_status(payload)
             elif "requestEvents" in message_obj["commandName"]:
@@ -121,11 +128,11 @@ class VisualizationWebSocketHandler(tornado.websocket.WebSocketHandler):
             elif "updatePanelInfo" in message_obj["commandName"]:
                 self.update_panel_info(payload)
             elif "addGroupPanel" in message_obj["commandName"]:
-                self.add_panel_group(payload)
+                self.spawn_command(self.add_panel_group, payload)
             elif "removeGroupPanel" in message_obj["commandName"]:
-                self.remove_panel_group(payload)
+                self.spawn_command(self.remove_panel_group, payload)
             elif "updateGroupPanel" in message_obj["commandName"]:
-                self.update_panel_group(payload)
+                self.spawn_command(self.update_panel_group, payload)
             elif "generaterReport" in message_obj["commandName"]:
                 self.generate_report(payload)
             elif "updateGateways" in message_obj["commandName"]:
@@ -157,10 +164,31 @@ class VisualizationWebSocketHandler(tornado.websocket.WebSocketHandler):
         for subscriber_topic in self._status_subscribers:
             self._middleware.remove_subscribe_from_status(
                 self._status_subscribers[subscriber_topic], subscriber_topic)
+        self._middleware.close_serial_lane(self._serial_lane)
 
     def send_error_message(self, message: str):
         self.send_message_to_ui("error", message)
 
+    def spawn_command(self, handler, payload):
+        """
+        Runs a command round trip on the IOLoop, so on_message returns right
+        away and a slow answer does not hold the next messages of this socket
+        """
+        async def run():
+            try:
+                await handler(payload)
+            except Exception as e:
+                self._logger.error(f"Exception occured on websocket command {handler.__name__}: {e}")
+        self._io_loop.spawn_callback(run)
+
+    async def await_command(self, command_name, data):
+        """Returns the command answer, or None after reporting the error to the UI"""
+        try:
+            return await self._middleware.send_command_async(command_name, data)
+        except CommandError as e:
+            self.send_error_message(e.answer)
+            return None
+
     def safe_write_message(self, obj):
         try:
             if not self.ws_connection or self.ws_connection.is_closing():
@@ -202,11 +230,9 @@ class VisualizationWebSocketHandler(tornado.websocket.WebSocketHandler):
             "status": status,
             "message": message_copy
         }
-        tornado.ioloop.IOLoop.current().add_callback(self.safe_write_message, obj)
-
-        # Limpa os dados originais após criar a cópia
-        if isinstance(message, dict) and "isCommand" in message and message["isCommand"] == True:
-            message.clear()
+        # A mensagem original é compartilhada com os outros listeners do
+        # middleware, por isso apenas a cópia pode ser limpa após o envio
+        self._io_loop.add_callback(self.safe_write_message, obj)
 
 ################# Status commands #############################
     def request_status(self, request):
@@ -244,17 +270,15 @@ class VisualizationWebSocketHandler(tornado.websocket.WebSocketHandler):
 ################# Panel commands #############################
 
 
-    def add_panel_request(self, panel_info):
-        self._middleware.send_command(ConfigHandlerCommands.ADD_PANEL, panel_info,
-                                      lambda data: (self.add_panel_subscriber_command(
-                                          data["data"]), self.send_panel_info()),
-                                      self.send_error_message)
+    async def add_panel_request(self, panel_info):
+        answer = await self.await_command(ConfigHandlerCommands.ADD_PANEL, panel_info)
+        if answer:
+            self.add_panel_subscriber_command(answer["data"])
+            self.send_panel_info()
 
-    def remove_panel(self, panel_id):
-        self._middleware.send_command(ConfigHandlerCommands.REMOVE_PANEL, {"id": panel_id},
-                                      lambda data: self.remove_panel_subscriber(
-                                          panel_id),
-                                      self.send_error_message)
+    async def remove_panel(self, panel_id):
+        if await self.await_command(ConfigHandlerCommands.REMOVE_PANEL, {"id": panel_id}):
+            self.remove_panel_subscriber(panel_id)
 
     def remove_panel_subscriber(self, panel_id):
         panel_topic = self._id_to_topic_map[panel_id]
@@ -280,20 +304,17 @@ class VisualizationWebSocketHandler(tornado.websocket.WebSocketHandler):
             ConfigHandlerCommands.UPDATE_PANEL_FUNCTIONALITIES, update_panel_command)
 
 ################# Panel Group commands #############################
-    def add_panel_group(self, group_info):
-        self._middleware.send_command(ConfigHandlerCommands.ADD_PANEL_GROUP, group_info,
-                                      lambda data: self.send_panel_info(),
-                                      self.send_error_message)
+    async def add_panel_group(self, group_info):
+        if await self.await_command(ConfigHandlerCommands.ADD_PANEL_GROUP, group_info):
+            self.send_panel_info()
 
-    def remove_panel_group(self, group_info):
-        self._middleware.send_command(ConfigHandlerCommands.REMOVE_PANEL_GROUP, group_info,
-                                      lambda data: self.send_panel_info(),
-                                      self.send_error_message)
+    async def remove_panel_group(self, group_info):
+        if await self.await_command(ConfigHandlerCommands.REMOVE_PANEL_GROUP, group_info):
+            self.send_panel_info()
 
-    def update_panel_group(self, group_info):
-        self._middleware.send_command(ConfigHandlerCommands.UPDATE_PANEL_GROUP, group_info,
-                                      lambda data: self.send_panel_info(),
-                                      self.send_error_message)
+    async def update_panel_group(self, group_info):
+        if await self.await_command(ConfigHandlerCommands.UPDATE_PANEL_GROUP, group_info):
+            self.send_panel_info()
 
     def send_panel_info(self):
         self._middleware.send_command(ConfigHandlerCommands.GET_PANEL_LIST, {},
@@ -408,8 +429,10 @@ class VisualizationWebSocketHandler(tornado.websocket.WebSocketHandler):
         if (panel_topic not in self._status_subscribers):
             self._status_subscribers[panel_topic] = StatuSubscribers(
                 self.send_status, panel_topic)
+            # The copy of each report is heavy, a lagging socket must not delay the others
             self._middleware.add_subscribe_to_status(
-                self._status_subscribers[panel_topic], panel_topic)
+                self._status_subscribers[panel_topic], panel_topic, dispatch_mode=DispatchMode.SERIAL,
+                latency_stage="websocket", serial_lane=self._serial_lane)
         self._status_subscribers[panel_topic].add_count()
 
 
@@ -0,0 +1,84 @@
+"""
+Time to translate one sensor report through the scalar plan and through the
+NumPy calibration, per report size.
+
+Each report is translated and then read the way the subscribers read it
+(every reading object built), so the lazy columnar report gets no credit
+for readings nobody asks for.
+
+    python -m benchmarks.calibration_benchmark --sizes 8 26 256 --reports 5000 --output calibration.json
+"""
+import argparse
+import time
+from typing import Any
+from unittest.mock import MagicMock
+
+from benchmarks.common import add_output_argument, create_result, write_result
+from modules.titanium_mqtt.translators.io_cloud_api import IoCloudApiTranslator
+from modules.titanium_mqtt.translators.payload_decoder import ReportColumns
+from modules.titanium_mqtt.translators.vectorized_calibration import NUMPY_AVAILABLE
+
+GATEWAY = "benchGw"
+# The sensor mix of a real gateway, repeated up to the report size
+UNITS = ["°C", "°C", "kPa", "V", "A", "W", "%", "°C"]
+
+
+def create_translator(size: int, vectorized: bool) -> IoCloudApiTranslator:
+    translator = IoCloudApiTranslator()
+    translator.initialize()
+    translator.logger = MagicMock()
+    translator._create_system_update({
+        "device_id": GATEWAY, "ip_address": "10.0.0.1", "uptime": 1,
+        "sensors": [{"index": index, "unit": UNITS[index % len(UNITS)], "state": 0, "gain": 1, "offset": 0}
+                    for index in range(size)]})
+    translator.update_calibration([{"gateway": GATEWAY, "indicator": index, "gain": 1.5, "offset": 0.25}
+                                   for index in range(0, size, 2)])
+    translator._vectorized = vectorized
+    return translator
+
+
+def create_report(size: int, sequence: int) -> ReportColumns:
+    return ReportColumns(1700000000 + sequence,
+                         [(index * 7 + sequence) % 500 / 4 for index in range(size)],
+                         [True] * size)
+
+
+def measure(size: int, reports: int, vectorized: bool) -> float:
+    """Microseconds to translate one report and build its readings"""
+    translator = create_translator(size, vectorized)
+    columns = [create_report(size, sequence) for sequence in range(reports)]
+    started_at = time.perf_counter()
+    for report in columns:
+        translator._read_sensor_report_message(GATEWAY, report).readings
+    return (time.perf_counter() - started_at) / reports * 1e6
+
+
+def run_benchmark(sizes: list[int] | None = None, reports: int = 5000) -> dict[str, Any]:
+    results = {}
+    for size in sizes or [8, 26, 64, 256, 1024]:
+        scalar = measure(size, reports, False)
+        result = {"scalarUs": scalar}
+        if NUMPY_AVAILABLE:
+            vectorized = measure(size, reports, True)
+            result["vectorizedUs"] = vectorized
+            result["speedup"] = scalar / vectorized if vectorized else 0.0
+        results[str(size)] = result
+
+    return create_result({"reports": reports, "numpy": NUMPY_AVAILABLE}, results)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="*", help="sensors per report")
+    parser.add_argument("--reports", type=int, default=5000)
+    add_output_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    return write_result(run_benchmark(args.sizes, args.reports), args.output)
+
+
+if __name__ == "__main__":
+    main()
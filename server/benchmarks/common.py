@@ -0,0 +1,53 @@
+"""
+Helpers shared by the benchmark scripts: the environment a result was
+measured in, latency summaries and the JSON output of the command line.
+"""
+import argparse
+import json
+import platform
+import sys
+from typing import Any
+
+
+def get_environment() -> dict[str, str]:
+    return {
+        "python": sys.version.split()[0],
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+    }
+
+
+def create_result(config: dict[str, Any], results: dict[str, Any]) -> dict[str, Any]:
+    return {"config": config, "environment": get_environment(), "results": results}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+def latency_summary(durations: list[float]) -> dict[str, float]:
+    """Count and p50, p99 and max in milliseconds of durations in seconds"""
+    ordered = sorted(durations)
+    return {
+        "count": len(ordered),
+        "p50": percentile(ordered, 0.50) * 1000,
+        "p99": percentile(ordered, 0.99) * 1000,
+        "max": (ordered[-1] * 1000) if ordered else 0.0,
+    }
+
+
+def add_output_argument(parser: argparse.ArgumentParser):
+    parser.add_argument("--output", help="write the JSON result to this file")
+
+
+def write_result(result: dict[str, Any], output: str | None = None) -> dict[str, Any]:
+    """Prints result as JSON and writes it to output when given"""
+    serialized = json.dumps(result, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as output_file:
+            output_file.write(serialized)
+    print(serialized)
+    return result
@@ -0,0 +1,176 @@
+"""
+In-process stand-in for an MQTT broker and the paho client surface that
+TitaniumMqtt uses, for load tests and tests without a network.
+
+Like paho with loop_start(), every client delivers its messages to
+on_message from its own network thread. Shared subscriptions
+($share/<group>/<filter>) deliver each message to one member of the group,
+chosen by the broker SharedStrategy.
+"""
+import queue
+import threading
+import zlib
+from typing import Any, Callable
+
+import paho.mqtt.client as mqtt
+
+
+class FakeMessage:
+    __slots__ = ("topic", "payload", "qos", "retain")
+
+    def __init__(self, topic: str, payload: bytes, qos: int = 0, retain: bool = False):
+        self.topic = topic
+        self.payload = payload
+        self.qos = qos
+        self.retain = retain
+
+
+class SharedStrategy:
+    # Every message goes to the next member, like Mosquitto
+    ROUND_ROBIN = "round_robin"
+    # A topic always goes to the same member, like EMQX hash_topic
+    HASH_TOPIC = "hash_topic"
+
+
+class FakeBroker:
+    """Routes published messages to the clients subscribed to a matching filter"""
+
+    def __init__(self, shared_strategy: str = SharedStrategy.HASH_TOPIC):
+        if shared_strategy not in (SharedStrategy.ROUND_ROBIN, SharedStrategy.HASH_TOPIC):
+            raise ValueError(
+                f"FakeBroker::__init__: unknown shared strategy {shared_strategy}")
+        self._shared_strategy = shared_strategy
+        self._lock = threading.Lock()
+        self._subscriptions: dict[str, list["FakeMqttClient"]] = {}
+        # (group, filter) -> members
+        self._shared_subscriptions: dict[tuple[str, str], list["FakeMqttClient"]] = {}
+        self._next_member: dict[tuple[str, str], int] = {}
+        self._published = 0
+        self._delivered = 0
+
+    def subscribe(self, client: "FakeMqttClient", topic_filter: str):
+        with self._lock:
+            if topic_filter.startswith("$share/"):
+                _, group, shared_filter = topic_filter.split("/", 2)
+                subscribers = self._shared_subscriptions.setdefault((group, shared_filter), [])
+            else:
+                subscribers = self._subscriptions.setdefault(topic_filter, [])
+            if client not in subscribers:
+                subscribers.append(client)
+
+    def unsubscribe_all(self, client: "FakeMqttClient"):
+        with self._lock:
+            for subscribers in list(self._subscriptions.values()) + list(self._shared_subscriptions.values()):
+                if client in subscribers:
+                    subscribers.remove(client)
+
+    def _pick_member(self, key: tuple[str, str], members: list["FakeMqttClient"], topic: str):
+        if self._shared_strategy == SharedStrategy.HASH_TOPIC:
+            return members[zlib.crc32(topic.encode()) % len(members)]
+        index = self._next_member.get(key, 0) % len(members)
+        self._next_member[key] = index + 1
+        return members[index]
+
+    def publish(self, topic: str, payload: bytes, qos: int = 0):
+        with self._lock:
+            self._published += 1
+            targets = set()
+            for topic_filter, subscribers in self._subscriptions.items():
+                if subscribers and mqtt.topic_matches_sub(topic_filter, topic):
+                    targets.update(subscribers)
+            for key, members in self._shared_subscriptions.items():
+                if members and mqtt.topic_matches_sub(key[1], topic):
+                    targets.add(self._pick_member(key, members, topic))
+            self._delivered += len(targets)
+        for client in targets:
+            client.deliver(FakeMessage(topic, payload, qos))
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"published": self._published, "delivered": self._delivered,
+                    "subscriptions": sum(len(subscribers) for subscribers in self._subscriptions.values()),
+                    "sharedSubscriptions": sum(len(members) for members in self._shared_subscriptions.values())}
+
+    def create_client_factory(self) -> Callable[..., "FakeMqttClient"]:
+        """Factory with the mqtt.Client signature, for TitaniumMqtt"""
+        return lambda *args, **kwargs: FakeMqttClient(self, *args, **kwargs)
+
+
+class FakeMqttClient:
+    """The part of paho.mqtt.client.Client used by this project"""
+
+    def __init__(self, broker: FakeBroker, client_id: str = "", *_args, **_kwargs):
+        self._broker = broker
+        self._client_id = client_id
+        self._userdata = None
+        self._connected = False
+        self._inbox: queue.Queue = queue.Queue()
+        self._loop_thread = None
+        self.on_connect: Callable | None = None
+        self.on_disconnect: Callable | None = None
+        self.on_message: Callable | None = None
+
+    def user_data_set(self, userdata: Any):
+        self._userdata = userdata
+
+    def connect(self, _host: str = "", _port: int = 1883, _keepalive: int = 60):
+        self._connected = True
+        if self.on_connect is not None:
+            self.on_connect(self, self._userdata, {}, 0)
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def connect_async(self, host: str = "", port: int = 1883, keepalive: int = 60):
+        return self.connect(host, port, keepalive)
+
+    def reconnect(self):
+        return self.connect()
+
+    def is_connected(self) -> bool:
+        return self._connected
+
+    def disconnect(self):
+        if not self._connected:
+            return mqtt.MQTT_ERR_NO_CONN
+        self._connected = False
+        self._broker.unsubscribe_all(self)
+        if self.on_disconnect is not None:
+            self.on_disconnect(self, self._userdata, 0)
+        return mqtt.MQTT_ERR_SUCCESS
+
+    def subscribe(self, topic, qos: int = 0):
+        # A filter, or a list of (filter, qos) like paho
+        topics = [topic] if isinstance(topic, str) else [topic_filter for topic_filter, _ in topic]
+        for topic_filter in topics:
+            self._broker.subscribe(self, topic_filter)
+        return mqtt.MQTT_ERR_SUCCESS, 1
+
+    def publish(self, topic: str, payload: Any = None, qos: int = 0, retain: bool = False):
+        if isinstance(payload, str):
+            payload = payload.encode()
+        self._broker.publish(topic, payload or b"", qos)
+        return mqtt.MQTTMessageInfo(0)
+
+    def deliver(self, message: FakeMessage):
+        self._inbox.put(message)
+
+    def loop_start(self):
+        if self._loop_thread is not None:
+            return
+        self._loop_thread = threading.Thread(
+            target=self._loop, daemon=True, name=f"fake-mqtt-{self._client_id}")
+        self._loop_thread.start()
+
+    def loop_stop(self):
+        if self._loop_thread is None:
+            return
+        self._inbox.put(None)
+        self._loop_thread.join()
+        self._loop_thread = None
+
+    def _loop(self):
+        while True:
+            message = self._inbox.get()
+            if message is None:
+                break
+            if self.on_message is not None:
+                self.on_message(self, self._userdata, message)
@@ -0,0 +1,317 @@
+"""
+Simulates IoCloud gateways against TitaniumMqtt without real hardware.
+
+Every virtual gateway answers the system request (command 2) with the same
+system message a real gateway sends, and publishes sensor reports on its own
+schedule. The capacity test runs the simulator and TitaniumMqtt over the
+in-process broker of benchmarks.fake_broker and reports the rate and latency
+of the reports delivered through the middleware, as JSON.
+
+    python -m benchmarks.gateway_simulator --gateways 5000 --intervals 5 10 --duration 30
+"""
+import argparse
+from dataclasses import asdict, dataclass, field
+import heapq
+import json
+import random
+import threading
+import time
+from typing import Any
+
+from benchmarks.common import add_output_argument, create_result, latency_summary, write_result
+from benchmarks.fake_broker import FakeBroker, SharedStrategy
+from middleware.client_middleware import ClientMiddleware
+from middleware.middleware import Middleware
+from middleware.status_subscriber import StatuSubscribers
+from modules.titanium_mqtt.mqtt import TitaniumMqtt
+from support.ingest_latency import ingest_latency
+
+REQUEST_TOPIC_FILTER = "iocloud/request/#"
+SYSTEM_COMMAND = 2
+
+# Same sensors as scripts/mqtt_stress_test.py
+BASE_SENSORS = (
+    [{"value": value, "unit": "°C"} for value in (
+        -41.5, -29.08, -18.41, -10.97, -0.67, 7.33, 20.88, 25.1, 28.18, 39.2,
+        48.3, 62.77, 68.89, 80.62, 92.21, 98.12, 111.21, 124.4, 132.87, 140.7)] +
+    [{"value": 20, "unit": "kPa"}, {"value": 20, "unit": "kPa"}, {"value": 221, "unit": "V"},
+     {"value": 2, "unit": "A"}, {"value": 1000, "unit": "W"}, {"value": 0.96, "unit": "%"}]
+)
+
+
+def get_gateway_name(prefix: str, index: int) -> str:
+    return f"{prefix}{index:06d}"
+
+
+def create_system_message(gateway: str, sensors: list[dict[str, Any]] = BASE_SENSORS) -> dict[str, Any]:
+    return {
+        "command_index": SYSTEM_COMMAND,
+        "command_status": 0,
+        "device_id": gateway,
+        "ip_address": "192.168.3.79",
+        "uptime": 19510,
+        "sensors": [{"gain": 1, "offset": 0, "index": index, "state": 0, "unit": sensor["unit"]}
+                    for index, sensor in enumerate(sensors)],
+    }
+
+
+@dataclass
+class SimulatorConfig:
+    gateways: int = 1000
+    # Seconds between reports, gateways take them round robin
+    intervals: list[float] = field(default_factory=lambda: [5.0])
+    # Every interval varies by up to this fraction, 0 keeps gateways periodic
+    jitter: float = 0.0
+    seed: int = 0
+    gateway_prefix: str = "SIM"
+
+
+class GatewaySimulator:
+    """
+    Drives a population of virtual gateways through an MQTT client, the
+    FakeMqttClient of benchmarks.fake_broker or a real paho client.
+
+    Reports are scheduled on one thread with a heap of next due times. The
+    first report of every gateway is spread over its interval so the
+    population does not publish in bursts.
+    """
+
+    def __init__(self, client: Any, config: SimulatorConfig | None = None):
+        self._client = client
+        self._config = config or SimulatorConfig()
+        if not self._config.intervals or min(self._config.intervals) <= 0:
+            raise ValueError(
+                "GatewaySimulator::__init__: report intervals must be positive")
+        self._random = random.Random(self._config.seed)
+        self._gateways = [get_gateway_name(self._config.gateway_prefix, index)
+                          for index in range(self._config.gateways)]
+        self._topics = [f"iocloud/response/{gateway}/sensor/report" for gateway in self._gateways]
+        self._stop_event = threading.Event()
+        self._scheduler = None
+        self._lock = threading.Lock()
+        self._reports_sent = 0
+        self._system_requests = 0
+        self._system_messages_sent = 0
+
+    @property
+    def gateways(self) -> list[str]:
+        return list(self._gateways)
+
+    def get_interval(self, index: int) -> float:
+        intervals = self._config.intervals
+        return intervals[index % len(intervals)]
+
+    def create_report(self, timestamp: float | None = None) -> dict[str, Any]:
+        sensors = []
+        for sensor in BASE_SENSORS:
+            value = sensor["value"]
+            if sensor["unit"] == "°C":
+                value = round(value + self._random.uniform(-5, 5), 2)
+            sensors.append({"value": value, "active": True})
+        return {"timestamp": time.time() if timestamp is None else timestamp, "sensors": sensors}
+
+    def publish_report(self, index: int, timestamp: float | None = None):
+        self._client.publish(self._topics[index], json.dumps(self.create_report(timestamp)))
+        with self._lock:
+            self._reports_sent += 1
+
+    def publish_system_message(self, gateway: str):
+        self._client.publish(f"iocloud/response/{gateway}/command",
+                             json.dumps(create_system_message(gateway)))
+        with self._lock:
+            self._system_messages_sent += 1
+
+    def on_connect(self, client, _userdata, _flags, _rc):
+        client.subscribe(REQUEST_TOPIC_FILTER)
+
+    def on_message(self, _client, _userdata, msg):
+        try:
+            request = json.loads(msg.payload)
+        except ValueError:
+            return
+        if not isinstance(request, dict) or request.get("command") != SYSTEM_COMMAND:
+            return
+
+        with self._lock:
+            self._system_requests += 1
+        target = msg.topic.split("/")[2]
+        if target == "all":
+            for gateway in self._gateways:
+                self.publish_system_message(gateway)
+        elif target in self._gateways:
+            self.publish_system_message(target)
+
+    def start(self, connect: bool = True):
+        self._client.on_connect = self.on_connect
+        self._client.on_message = self.on_message
+        if connect:
+            self._client.connect("localhost")
+        self._client.loop_start()
+        self._stop_event.clear()
+        self._scheduler = threading.Thread(
+            target=self._run_schedule, daemon=True, name="gateway-simulator")
+        self._scheduler.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._scheduler is not None:
+            self._scheduler.join()
+            self._scheduler = None
+        self._client.loop_stop()
+        self._client.disconnect()
+
+    def _next_interval(self, index: int) -> float:
+        interval = self.get_interval(index)
+        if self._config.jitter > 0:
+            interval *= 1 + self._random.uniform(-self._config.jitter, self._config.jitter)
+        return max(interval, 0.001)
+
+    def _run_schedule(self):
+        started_at = time.monotonic()
+        due_times = [(started_at + self._random.uniform(0, self.get_interval(index)), index)
+                     for index in range(len(self._gateways))]
+        heapq.heapify(due_times)
+
+        while due_times and not self._stop_event.is_set():
+            due, index = due_times[0]
+            wait_time = due - time.monotonic()
+            if wait_time > 0 and self._stop_event.wait(wait_time):
+                break
+            self.publish_report(index)
+            heapq.heapreplace(due_times, (due + self._next_interval(index), index))
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "gateways": len(self._gateways),
+                "reportsSent": self._reports_sent,
+                "systemRequests": self._system_requests,
+                "systemMessagesSent": self._system_messages_sent,
+            }
+
+
+def run_capacity_test(config: SimulatorConfig, duration: float = 10.0, drain_timeout: float = 10.0,
+                      ingest_clients: int = 1, shared_strategy: str = SharedStrategy.HASH_TOPIC) -> dict:
+    """
+    Simulated gateways -> fake broker -> TitaniumMqtt -> middleware ->
+    subscriber. Latency is measured from the report timestamp to the
+    subscriber callback, stagesMs splits it with support.ingest_latency.
+
+    With ingest_clients > 1 TitaniumMqtt joins a shared subscription with
+    that many connections, which must be thread members (MQTT_INGEST_MODE)
+    since the broker stand-in lives in this process. outOfOrder counts the
+    reports delivered before an older report of the same gateway.
+    """
+    broker = FakeBroker(shared_strategy)
+    middleware = Middleware()
+    mqtt_client = ClientMiddleware(middleware, "simulator_mqtt")
+    observer = ClientMiddleware(middleware, "simulator_observer")
+    titanium_mqtt = TitaniumMqtt(mqtt_client, broker.create_client_factory(), ingest_clients)
+    simulator = GatewaySimulator(broker.create_client_factory()("gateway_simulator"), config)
+
+    latencies = []
+    delivered = {"reports": 0, "outOfOrder": 0}
+    last_timestamps: dict[str, float] = {}
+    delivered_lock = threading.Lock()
+
+    def on_report(status_info):
+        report = status_info["data"]
+        # Only reports carry readings
+        readings = getattr(report, "readings", None)
+        if not readings:
+            return
+        timestamp = readings[0].timestamp.timestamp()
+        latency = time.time() - timestamp
+        gateway = report.full_topic.split('-')[0]
+        with delivered_lock:
+            delivered["reports"] += 1
+            if timestamp < last_timestamps.get(gateway, timestamp):
+                delivered["outOfOrder"] += 1
+            else:
+                last_timestamps[gateway] = timestamp
+            latencies.append(latency)
+
+    # One subscription per simulated gateway: "*-status-*" would also match the
+    # system messages (gateway-status-*) and count them in the observer stage
+    observer_subscriber = StatuSubscribers(on_report, "simulator_observer")
+    for gateway in simulator.gateways:
+        observer.add_subscribe_to_status(observer_subscriber, ClientMiddleware.get_gateway_status_topic(gateway),
+                                         latency_stage="observer")
+    ingest_latency.reset()
+    observer_thread = threading.Thread(target=observer.run_middleware_loop, daemon=True)
+    observer_thread.start()
+
+    titanium_mqtt.run()
+    simulator.start()
+    started_at = time.perf_counter()
+    time.sleep(duration)
+    simulator.stop()
+    sent = simulator.get_stats()["reportsSent"]
+
+    drain_deadline = time.perf_counter() + drain_timeout
+    while time.perf_counter() < drain_deadline:
+        if titanium_mqtt._read_queue.empty() and observer.get_queue_metrics()["depth"] == 0:
+            time.sleep(0.05)
+            if titanium_mqtt._read_queue.empty() and observer.get_queue_metrics()["depth"] == 0:
+                break
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - started_at
+
+    titanium_mqtt.stop()
+    observer.stop()
+    observer_thread.join(timeout=5)
+
+    with delivered_lock:
+        reports = delivered["reports"]
+        out_of_order = delivered["outOfOrder"]
+        gateways = len(last_timestamps)
+        latency_durations = list(latencies)
+    offered_rate = sum(1 / simulator.get_interval(index) for index in range(config.gateways))
+    config_info = {**asdict(config), "duration": duration, "ingestClients": ingest_clients,
+                   "sharedStrategy": shared_strategy}
+    return create_result(config_info, {
+        "offeredReportsPerSecond": offered_rate,
+        "reportsSent": sent,
+        "reportsDelivered": reports,
+        "gatewaysDelivered": gateways,
+        "outOfOrder": out_of_order,
+        "elapsedSeconds": elapsed,
+        "reportsPerSecond": reports / elapsed if elapsed else 0.0,
+        "simulator": simulator.get_stats(),
+        "broker": broker.get_stats(),
+        "ingestFilter": titanium_mqtt.get_ingest_filter_stats(),
+        "ingestMembers": titanium_mqtt.get_ingest_stats(),
+        "latencyMs": latency_summary(latency_durations),
+        "stagesMs": ingest_latency.get_stats(),
+    })
+
+
+def parse_args(argv=None) -> tuple[SimulatorConfig, argparse.Namespace]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--gateways", type=int, default=1000)
+    parser.add_argument("--intervals", type=float, nargs="+", default=[5.0],
+                        help="seconds between reports, assigned to the gateways round robin")
+    parser.add_argument("--jitter", type=float, default=0.0,
+                        help="fraction every interval may vary by")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--drain-timeout", type=float, default=10.0)
+    parser.add_argument("--ingest-clients", type=int, default=1,
+                        help="MQTT connections of TitaniumMqtt, more than 1 uses a shared subscription")
+    parser.add_argument("--shared-strategy", choices=[SharedStrategy.HASH_TOPIC, SharedStrategy.ROUND_ROBIN],
+                        default=SharedStrategy.HASH_TOPIC)
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+    config = SimulatorConfig(args.gateways, args.intervals, args.jitter, args.seed)
+    return config, args
+
+
+def main(argv=None):
+    config, args = parse_args(argv)
+    result = run_capacity_test(config, args.duration, args.drain_timeout,
+                               args.ingest_clients, args.shared_strategy)
+    return write_result(result, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+"""
+Self-contained throughput and latency benchmark of the middleware bus.
+
+Builds a real Middleware with N ClientMiddleware listeners, each one draining
+its queue on its own thread, spreads M subscribers (wildcard and exact)
+across them and publishes synthetic gateway reports at a controlled rate.
+Results are printed (or written) as JSON so runs can be compared between
+releases.
+
+    python -m benchmarks.middleware_benchmark --listeners 3 --subscribers 12 \\
+        --rate 2000 --duration 5 --output middleware.json
+"""
+import argparse
+from dataclasses import asdict, dataclass
+from datetime import datetime
+import threading
+import time
+import tracemalloc
+
+from benchmarks.common import add_output_argument, create_result, latency_summary, write_result
+from middleware.client_middleware import ClientMiddleware
+from middleware.middleware import Middleware
+from middleware.status_subscriber import StatuSubscribers
+from modules.titanium_mqtt.translators.payload_model import MqttGatewayReadingModel, MqttReadingModel
+
+SENSOR_TYPES = ("temperature", "pressure", "tension", "current", "power", "powerFactor")
+
+
+@dataclass
+class BenchmarkConfig:
+    listeners: int = 3
+    subscribers: int = 12
+    # Share of the subscribers using wildcard patterns, the others are exact
+    wildcard_ratio: float = 0.5
+    gateways: int = 10
+    readings_per_report: int = 26
+    # Reports per second, 0 publishes as fast as possible
+    rate: float = 1000
+    duration: float = 5.0
+    queue_capacity: int = 0
+    trace_memory: bool = False
+
+
+class SyntheticReport(MqttGatewayReadingModel):
+    """Gateway report stamped with its publish time"""
+
+    def __init__(self, gateway: str, readings: list[MqttReadingModel]):
+        super().__init__(ClientMiddleware.get_gateway_status_topic(gateway), readings)
+        self.sent_at = 0.0
+
+
+def build_readings(gateway: str, count: int) -> list[MqttReadingModel]:
+    readings = []
+    timestamp = datetime.now()
+    for index in range(count):
+        readings.append(MqttReadingModel(
+            ClientMiddleware.get_status_topic(gateway, SENSOR_TYPES[index % len(SENSOR_TYPES)], str(index)),
+            float(index), timestamp, True))
+    return readings
+
+
+def subscription_patterns(config: BenchmarkConfig) -> list[str]:
+    """Wildcard patterns first, then exact gateway topics, round robin over gateways"""
+    wildcard_count = round(config.subscribers * config.wildcard_ratio)
+    wildcard_patterns = ("*-status-*", "*-*-*")
+    patterns = [wildcard_patterns[index % len(wildcard_patterns)]
+                for index in range(wildcard_count)]
+    patterns += [ClientMiddleware.get_gateway_status_topic(f"gw{index % config.gateways}")
+                 for index in range(config.subscribers - wildcard_count)]
+    return patterns
+
+
+def run_benchmark(config: BenchmarkConfig) -> dict:
+    if config.trace_memory:
+        tracemalloc.start()
+    memory_before = tracemalloc.get_traced_memory()[0] if config.trace_memory else 0
+
+    middleware = Middleware()
+    clients = [ClientMiddleware(middleware, f"listener-{index}", queue_capacity=config.queue_capacity)
+               for index in range(config.listeners)]
+
+    latencies: list[float] = []
+    deliveries = [0]
+    deliveries_lock = threading.Lock()
+
+    def on_status(status_info):
+        latency = time.perf_counter() - status_info["data"].sent_at
+        with deliveries_lock:
+            latencies.append(latency)
+            deliveries[0] += 1
+
+    patterns = subscription_patterns(config)
+    expected_per_gateway = {f"gw{index}": 0 for index in range(config.gateways)}
+    for index, pattern in enumerate(patterns):
+        clients[index % len(clients)].add_subscribe_to_status(
+            StatuSubscribers(on_status, pattern), pattern)
+        for gateway in expected_per_gateway:
+            if pattern.startswith("*") or pattern.startswith(f"{gateway}-"):
+                expected_per_gateway[gateway] += 1
+
+    threads = [threading.Thread(target=client.run_middleware_loop, name=f"listener-{index}", daemon=True)
+               for index, client in enumerate(clients)]
+    for thread in threads:
+        thread.start()
+
+    readings = {gateway: build_readings(gateway, config.readings_per_report)
+                for gateway in expected_per_gateway}
+    gateways = list(readings)
+    interval = 1 / config.rate if config.rate > 0 else 0.0
+
+    published = 0
+    expected_deliveries = 0
+    started_at = time.perf_counter()
+    next_publish = started_at
+    while time.perf_counter() - started_at < config.duration:
+        gateway = gateways[published % len(gateways)]
+        report = SyntheticReport(gateway, readings[gateway])
+        report.sent_at = time.perf_counter()
+        middleware.send_status(report.full_topic, report)
+        published += 1
+        expected_deliveries += expected_per_gateway[gateway]
+
+        if interval:
+            next_publish += interval
+            sleep_time = next_publish - time.perf_counter()
+            if sleep_time > 0:
+                time.sleep(sleep_time)
+    publish_elapsed = time.perf_counter() - started_at
+
+    # Wait for the listeners to drain, dropped statuses never arrive
+    drain_deadline = time.perf_counter() + max(5.0, config.duration)
+    while deliveries[0] < expected_deliveries and time.perf_counter() < drain_deadline:
+        if all(client.get_queue_metrics()["depth"] == 0 for client in clients):
+            time.sleep(0.05)
+            if all(client.get_queue_metrics()["depth"] == 0 for client in clients):
+                break
+        time.sleep(0.005)
+    total_elapsed = time.perf_counter() - started_at
+
+    listener_metrics = {f"listener-{index}": client.get_queue_metrics()
+                        for index, client in enumerate(clients)}
+    memory_per_listener = None
+    if config.trace_memory:
+        memory_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        memory_per_listener = (memory_peak - memory_before) / config.listeners
+
+    for client in clients:
+        client.stop()
+    for thread in threads:
+        thread.join(timeout=5)
+
+    with deliveries_lock:
+        latency_durations = list(latencies)
+        delivered = deliveries[0]
+
+    return create_result(asdict(config), {
+        "published": published,
+        "expectedDeliveries": expected_deliveries,
+        "delivered": delivered,
+        "publishRate": published / publish_elapsed,
+        "deliveryRate": delivered / total_elapsed,
+        "latencyMs": latency_summary(latency_durations),
+        "memoryPerListenerBytes": memory_per_listener,
+        "listeners": listener_metrics,
+    })
+
+
+def parse_args(argv=None) -> tuple[BenchmarkConfig, str | None]:
+    defaults = BenchmarkConfig()
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--listeners", type=int, default=defaults.listeners)
+    parser.add_argument("--subscribers", type=int, default=defaults.subscribers)
+    parser.add_argument("--wildcard-ratio", type=float, default=defaults.wildcard_ratio)
+    parser.add_argument("--gateways", type=int, default=defaults.gateways)
+    parser.add_argument("--readings-per-report", type=int, default=defaults.readings_per_report)
+    parser.add_argument("--rate", type=float, default=defaults.rate,
+                        help="reports per second, 0 for as fast as possible")
+    parser.add_argument("--duration", type=float, default=defaults.duration)
+    parser.add_argument("--queue-capacity", type=int, default=defaults.queue_capacity)
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="measure memory with tracemalloc (slows the run down)")
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+    config = BenchmarkConfig(**{key: value for key, value in vars(args).items() if key != "output"})
+    return config, args.output
+
+
+def main(argv=None):
+    config, output = parse_args(argv)
+    return write_result(run_benchmark(config), output)
+
+
+if __name__ == "__main__":
+    main()
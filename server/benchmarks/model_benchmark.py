@@ -0,0 +1,119 @@
+"""
+Per-instance memory and allocation rate of the hot-path data models.
+
+Every slotted model is compared with a twin class using the same constructor
+but a regular instance __dict__, which is how the models were stored before
+they were slotted.
+
+    python -m benchmarks.model_benchmark --instances 100000 --output models.json
+"""
+import argparse
+from datetime import datetime
+import gc
+import sys
+import time
+import tracemalloc
+import types
+from typing import Any, Callable
+
+from benchmarks.common import add_output_argument, create_result, write_result
+from dataModules.alarm import Alarm
+from dataModules.event import EventModel
+from dataModules.panel import Panel
+from dataModules.sensor_info import SensorInfo
+from modules.titanium_mqtt.translators.payload_model import (
+    MqttGatewayReadingModel,
+    MqttPayloadModel,
+    MqttReadingModel,
+)
+
+_TIMESTAMP = datetime.now()
+_ALARM = {"id": 1, "name": "high", "topic": "gw1-temperature-0", "threshold": 80, "type": 0, "panelId": 1}
+_PANEL = {"id": 1, "name": "Panel", "gateway": "gw1", "topic": "temperature", "color": "#fff",
+          "indicator": "0", "group": 1, "sensorType": "Temperature", "maxAlarm": _ALARM}
+
+# Model, then the arguments of one instance
+MODELS: dict[str, tuple[type, Callable[[], tuple[Any, ...]]]] = {
+    "MqttReadingModel": (MqttReadingModel, lambda: ("gw1-temperature-0", 25.5, _TIMESTAMP, True)),
+    "MqttGatewayReadingModel": (MqttGatewayReadingModel, lambda: ("gw1-status-*",)),
+    "MqttPayloadModel": (MqttPayloadModel, lambda: ("gw1",)),
+    "SensorInfo": (SensorInfo, lambda: ("gw1-temperature-0", _TIMESTAMP, 25.5)),
+    "EventModel": (EventModel, lambda: (1, 1, _TIMESTAMP, 90, -1, "high")),
+    "Alarm": (Alarm, lambda: (_ALARM,)),
+    "Panel": (Panel, lambda: (_PANEL,)),
+}
+
+
+def dict_twin(model: type) -> type:
+    """Same constructor and methods, instances keep a __dict__"""
+    namespace = {name: value for name, value in vars(model).items()
+                 if name not in ("__slots__", "__dict__", "__weakref__") and
+                 not isinstance(value, types.MemberDescriptorType)}
+    return type(f"{model.__name__}WithDict", (), namespace)
+
+
+def measure_memory(factory: Callable[[], Any], instances: int) -> float:
+    """Bytes allocated per instance still alive, nested objects included"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    kept = [factory() for _ in range(instances)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    # The list holding them is not part of the instances
+    list_size = sys.getsizeof(kept)
+    del kept
+    return (after - before - list_size) / instances
+
+
+def measure_rate(factory: Callable[[], Any], instances: int) -> float:
+    """Instances created (and released) per second"""
+    started_at = time.perf_counter()
+    for _ in range(instances):
+        factory()
+    return instances / (time.perf_counter() - started_at)
+
+
+def run_benchmark(instances: int = 100000, models: list[str] | None = None) -> dict:
+    results = {}
+    for name in models or MODELS:
+        model, arguments = MODELS[name]
+        twin = dict_twin(model)
+        args = arguments()
+
+        def slotted():
+            return model(*args)
+
+        def with_dict():
+            return twin(*args)
+
+        slotted_bytes = measure_memory(slotted, instances)
+        dict_bytes = measure_memory(with_dict, instances)
+        slotted_rate = measure_rate(slotted, instances)
+        dict_rate = measure_rate(with_dict, instances)
+        results[name] = {
+            "slotted": {"bytesPerInstance": slotted_bytes, "instancesPerSecond": slotted_rate},
+            "dict": {"bytesPerInstance": dict_bytes, "instancesPerSecond": dict_rate},
+            "memoryReduction": 1 - slotted_bytes / dict_bytes if dict_bytes else 0.0,
+            "allocationSpeedup": slotted_rate / dict_rate if dict_rate else 0.0,
+        }
+
+    return create_result({"instances": instances}, results)
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--instances", type=int, default=100000)
+    parser.add_argument("--models", nargs="*", choices=list(MODELS),
+                        help="models to measure, all by default")
+    add_output_argument(parser)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    return write_result(run_benchmark(args.instances, args.models), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Replays a raw MQTT recording (see MQTT_RECORD_FILE) without a broker.
+
+The "translator" target translates every message directly on this thread,
+the "handler" target feeds TitaniumMqtt.on_message like the broker would,
+with a real middleware and a subscriber on every gateway report, and reports
+the per-stage ingest latencies traced along the way.
+Messages are paced by their recorded arrival times divided by --speed, 0
+replays as fast as possible. Results are printed (or written) as JSON.
+
+    python -m benchmarks.mqtt_replay traffic.rec --target handler --speed 10
+"""
+import argparse
+from dataclasses import asdict, dataclass
+import threading
+import time
+from typing import Callable
+
+from benchmarks.common import add_output_argument, create_result, latency_summary, write_result
+from benchmarks.fake_broker import FakeMessage
+from middleware.client_middleware import ClientMiddleware
+from middleware.middleware import Middleware
+from middleware.status_subscriber import StatuSubscribers
+from modules.titanium_mqtt.mqtt import TitaniumMqtt
+from modules.titanium_mqtt.traffic_recorder import read_traffic
+from modules.titanium_mqtt.translators.io_cloud_api import IoCloudApiTranslator
+from support.ingest_latency import ingest_latency
+
+
+# Subscriber stage of the replay observer in the ingest latency stats
+REPLAY_LATENCY_STAGE = "replay"
+
+
+class ReplayTarget:
+    TRANSLATOR = "translator"
+    HANDLER = "handler"
+
+
+@dataclass
+class ReplayConfig:
+    path: str
+    target: str = ReplayTarget.HANDLER
+    # 1 replays at the recorded pace, N is N times faster, 0 as fast as possible
+    speed: float = 0.0
+    # Seconds to wait for the handler to publish what was fed
+    drain_timeout: float = 10.0
+
+
+class _Pacer:
+    def __init__(self, speed: float):
+        self._speed = speed
+        self._first_arrival = None
+        self._started_at = None
+
+    def wait(self, arrival_time: float):
+        if self._speed <= 0:
+            return
+        if self._first_arrival is None:
+            self._first_arrival = arrival_time
+            self._started_at = time.perf_counter()
+            return
+        due = self._started_at + (arrival_time - self._first_arrival) / self._speed
+        sleep_time = due - time.perf_counter()
+        if sleep_time > 0:
+            time.sleep(sleep_time)
+
+
+def replay_translator(config: ReplayConfig) -> dict:
+    translator = IoCloudApiTranslator()
+    translator.initialize()
+    pacer = _Pacer(config.speed)
+    translate_durations = []
+    messages = errors = 0
+
+    started_at = time.perf_counter()
+    for arrival_time, topic, payload in read_traffic(config.path):
+        pacer.wait(arrival_time)
+        translate_started_at = time.perf_counter()
+        try:
+            translator.translate_incoming_message(topic, payload)
+        except Exception:
+            errors += 1
+        translate_durations.append(time.perf_counter() - translate_started_at)
+        messages += 1
+    elapsed = time.perf_counter() - started_at
+
+    return {
+        "messages": messages,
+        "errors": errors,
+        "elapsedSeconds": elapsed,
+        "messagesPerSecond": messages / elapsed if elapsed else 0.0,
+        "stagesMs": {"translate": latency_summary(translate_durations)},
+    }
+
+
+def _wait_for_drain(progress: Callable[[], int], idle: Callable[[], bool], timeout: float,
+                    quiet_period: float = 0.25):
+    """Waits until progress() stops changing for quiet_period while idle() holds"""
+    deadline = time.perf_counter() + timeout
+    last_progress = progress()
+    last_change = time.perf_counter()
+    while time.perf_counter() < deadline:
+        time.sleep(0.01)
+        current = progress()
+        now = time.perf_counter()
+        if current != last_progress:
+            last_progress = current
+            last_change = now
+        elif idle() and now - last_change >= quiet_period:
+            return
+
+
+def replay_handler(config: ReplayConfig) -> dict:
+    middleware = Middleware()
+    mqtt_client = ClientMiddleware(middleware, "replay_mqtt")
+    observer = ClientMiddleware(middleware, "replay_observer")
+    titanium_mqtt = TitaniumMqtt(mqtt_client)
+
+    delivered = [0]
+    delivered_lock = threading.Lock()
+
+    def on_report(status_info):
+        if not getattr(status_info["data"], "readings", None):
+            return
+        with delivered_lock:
+            delivered[0] += 1
+
+    def get_delivered() -> int:
+        with delivered_lock:
+            return delivered[0]
+
+    # Stage latencies come from the ingest traces, see support.ingest_latency
+    ingest_latency.reset()
+    status_pattern = ClientMiddleware.get_gateway_status_topic("*")
+    observer.add_subscribe_to_status(StatuSubscribers(on_report, status_pattern), status_pattern,
+                                     latency_stage=REPLAY_LATENCY_STAGE)
+    observer_thread = threading.Thread(target=observer.run_middleware_loop, daemon=True)
+    observer_thread.start()
+    titanium_mqtt.start_message_handling()
+
+    pacer = _Pacer(config.speed)
+    messages = 0
+    started_at = time.perf_counter()
+    for arrival_time, topic, payload in read_traffic(config.path):
+        pacer.wait(arrival_time)
+        # Same entry point as a message of the broker
+        titanium_mqtt.on_message(None, None, FakeMessage(topic, payload))
+        messages += 1
+    feed_elapsed = time.perf_counter() - started_at
+
+    _wait_for_drain(get_delivered, lambda: observer.get_queue_metrics()["depth"] == 0,
+                    config.drain_timeout)
+    elapsed = time.perf_counter() - started_at
+
+    titanium_mqtt.stop()
+    observer.stop()
+    observer_thread.join(timeout=5)
+
+    reports = get_delivered()
+    return {
+        "messages": messages,
+        "reportsDelivered": reports,
+        "elapsedSeconds": elapsed,
+        "feedRate": messages / feed_elapsed if feed_elapsed else 0.0,
+        "messagesPerSecond": messages / elapsed if elapsed else 0.0,
+        "reportsPerSecond": reports / elapsed if elapsed else 0.0,
+        "ingestFilter": titanium_mqtt.get_ingest_filter_stats(),
+        "stagesMs": ingest_latency.get_stats(),
+    }
+
+
+def run_replay(config: ReplayConfig) -> dict:
+    if config.target == ReplayTarget.TRANSLATOR:
+        results = replay_translator(config)
+    elif config.target == ReplayTarget.HANDLER:
+        results = replay_handler(config)
+    else:
+        raise ValueError(f"run_replay: unknown target {config.target}")
+
+    return create_result(asdict(config), results)
+
+
+def parse_args(argv=None) -> tuple[ReplayConfig, str | None]:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", help="recording written with MQTT_RECORD_FILE")
+    parser.add_argument("--target", choices=[ReplayTarget.HANDLER, ReplayTarget.TRANSLATOR],
+                        default=ReplayTarget.HANDLER)
+    parser.add_argument("--speed", type=float, default=0.0,
+                        help="1 for the recorded pace, N for N times faster, 0 for as fast as possible")
+    parser.add_argument("--drain-timeout", type=float, default=10.0)
+    add_output_argument(parser)
+    args = parser.parse_args(argv)
+    config = ReplayConfig(args.path, args.target, args.speed, args.drain_timeout)
+    return config, args.output
+
+
+def main(argv=None):
+    config, output = parse_args(argv)
+    return write_result(run_replay(config), output)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,16 +4,10 @@ class AlarmType:
     Equal = 2
 
 class Alarm:
-    id = 0
-    topic = ""
-    name = ""
-    threshold = 0
-    type = AlarmType.Higher
-    panel_id = 0
+    __slots__ = ("id", "topic", "name", "threshold", "type", "panel_id")
 
     def __init__(self, obj):
-        if "id" in obj:
-            self.id = obj["id"]
+        self.id = obj.get("id", 0)
         self.name = obj["name"]
         self.topic = obj["topic"]
         self.threshold = obj["threshold"]
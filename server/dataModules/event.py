@@ -1,19 +1,16 @@
 from datetime import datetime
 
 class EventModel:
-    event_id = 0 
-    alarm_id = -1
-    value = 0
-    panel_id = -1
-    name = ""
-    timestamp: datetime = datetime.now()
+    __slots__ = ("event_id", "alarm_id", "value", "panel_id", "name", "timestamp")
 
-    def __init__(self, alarm_id: int, panel_id: int, timestamp: datetime, value: int,  event_id = -1):
+    def __init__(self, alarm_id: int, panel_id: int, timestamp: datetime, value: int,  event_id = -1,
+                 name: str = ""):
         self.event_id = event_id
         self.alarm_id = alarm_id
         self.panel_id = panel_id
         self.timestamp = timestamp
         self.value = value
+        self.name = name
     
     def to_json(self):
         return {
@@ -29,23 +29,11 @@ class SensorTypes:
 
 
 class Panel:
-    id = None
-    name = ""
-    gateway = ""
-    topic = ""
-    color = ""
-    group_id = ""
-    indicator = ""
-    offset: float = None
-    gain: float = None
-    min_alarm: Alarm = None
-    max_alarm: Alarm = None
-    sensor_type = SensorTypes.Unknow
-    multiplier = 1
+    __slots__ = ("id", "name", "gateway", "topic", "color", "group_id", "indicator", "offset", "gain",
+                 "min_alarm", "max_alarm", "sensor_type", "multiplier")
 
     def __init__(self, obj):
-        if "id" in obj:
-            self.id = obj["id"]
+        self.id = obj.get("id")
         self.name = obj["name"]
         self.gateway = obj["gateway"]
         self.topic = obj["topic"]
@@ -70,9 +58,11 @@ class Panel:
         else:
             self.gain = 1
 
+        self.min_alarm = None
         if "minAlarm" in obj and "id" in obj["minAlarm"]:
             self.min_alarm = Alarm(obj["minAlarm"])
 
+        self.max_alarm = None
         if "maxAlarm" in obj and "id" in obj["maxAlarm"]:
             self.max_alarm = Alarm(obj["maxAlarm"])
         self.sensor_type = SensorTypes.GetType(obj["sensorType"])
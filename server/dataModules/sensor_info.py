@@ -2,9 +2,7 @@ from datetime import datetime
 
 
 class SensorInfo:
-    sensor_full_topic = ""
-    timestamp: datetime
-    value = 0
+    __slots__ = ("sensor_full_topic", "timestamp", "value")
 
     def __init__(self,
                  sensor_full_topic: str,
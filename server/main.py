@@ -1,17 +1,34 @@
 from apps.app_manager import AppManager
 from modules.modules_manager import ModulesManager
 from middleware.middleware import Middleware
+from middleware.shared_memory_ring import SharedMemoryRing
 from services.services_management import ServiceManager
 from support.logger import Logger
+from support.runtime_metrics import runtime_metrics
 from support.thread_monitor import thread_monitor
 
 import logging
+import multiprocessing
+import os
 
+# "threads" runs every manager in this process, "processes" forks one process per manager
+PROCESS_MODE = os.getenv('TITANIUM_PROCESS_MODE', 'threads')
+STATUS_RING_RECORD_SIZE = int(os.getenv('STATUS_RING_RECORD_SIZE', '16384'))
+STATUS_RING_RECORDS = int(os.getenv('STATUS_RING_RECORDS', '2048'))
 
-if __name__ == "__main__":
+MANAGER_CLASSES = (AppManager, ModulesManager, ServiceManager)
 
-    logger = Logger("app.log", logging.INFO)
-    logger.info("Starting IoCloud Datalogger system")
+
+def run_manager_process(manager_class, middleware):
+    manager = manager_class(middleware, use_multiprocessing=True)
+    # Each process logs the metrics of its own manager
+    runtime_metrics.start()
+    manager.run()
+    manager.wait()
+    runtime_metrics.stop()
+
+
+def run_threads(logger):
     middleware = Middleware()
 
     app_manager = AppManager(middleware)
@@ -22,6 +39,7 @@ if __name__ == "__main__":
 
     # Inicia monitoramento de threads
     thread_monitor.start_monitoring(interval=10)  # Monitora a cada 60 segundos
+    runtime_metrics.start()
 
     app_manager.run()
     modules_manager.run()
@@ -33,3 +51,49 @@ if __name__ == "__main__":
 
     # Para monitoramento
     thread_monitor.stop_monitoring()
+    runtime_metrics.stop()
+
+
+def run_processes(logger):
+    # Managers start threads while being built, so they are built in their own
+    # process. Everything shared is created here, before forking.
+    context = multiprocessing.get_context("fork")
+    sync_manager = context.Manager()
+    status_ring = SharedMemoryRing(
+        STATUS_RING_RECORD_SIZE, STATUS_RING_RECORDS)
+    middleware = Middleware(
+        sync_manager.dict(), sync_manager.dict(), status_ring)
+    for manager_class in MANAGER_CLASSES:
+        middleware.add_new_middleware_listener(
+            True, manager_class.LISTENER_NAME, manager_class.QUEUE_CAPACITY)
+        # Owners are known before any manager runs, so a command sent while its
+        # owner is still being built waits on the owner's queue instead of
+        # failing with UnknownCommandError
+        middleware.register_commands(
+            manager_class.LISTENER_NAME, manager_class.COMMANDS)
+
+    logger.info("Running IoCloud Datalogger system with one process per manager")
+    processes = [context.Process(target=run_manager_process, args=(manager_class, middleware),
+                                 name=manager_class.LISTENER_NAME)
+                 for manager_class in MANAGER_CLASSES]
+    for process in processes:
+        process.start()
+
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        status_ring.close()
+        status_ring.unlink()
+        sync_manager.shutdown()
+
+
+if __name__ == "__main__":
+
+    logger = Logger("app.log", logging.INFO)
+    logger.info("Starting IoCloud Datalogger system")
+
+    if PROCESS_MODE == "processes":
+        run_processes(logger)
+    else:
+        run_threads(logger)
@@ -1,23 +1,74 @@
+import asyncio
 from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
 import multiprocessing
+import os
+import pickle
+import queue
 import threading
-from time import sleep
+import time
 from typing import Any
-from middleware.middleware import Middleware
+import uuid
+from middleware.middleware import SHUTDOWN_MESSAGE, Middleware, UnknownCommandError
+from middleware.listener_queue import CommandOverloadPolicy, ListenerQueue, StatusOverloadPolicy
 from middleware.data_converter.data_converter import DataConverter
+from middleware.subscriber_dispatcher import DispatchMode, SubscriberDispatcher
 from middleware.subscriber_interface import SubscriberInterface
 from middleware.subscriber_manager import SubscriberManager
+from middleware.subscription_index import SubscriptionIndex
+from middleware.timer_wheel import TimerWheel
+from support.ingest_latency import IngestStage, ingest_latency
 from support.logger import Logger
 
+# Pending requests are answered with a timeout error after this many seconds
+COMMAND_TIMEOUT = float(os.getenv('MIDDLEWARE_COMMAND_TIMEOUT', '60'))
+# Workers of the pool shared by the subscriptions in DispatchMode.POOL
+DISPATCH_POOL_WORKERS = int(os.getenv('MIDDLEWARE_DISPATCH_POOL_WORKERS', '4'))
+# Ring writes do not wake the listener queue, processes poll the ring this often
+RING_POLL_INTERVAL = float(os.getenv('MIDDLEWARE_RING_POLL_INTERVAL', '0.005'))
+
+
+class CommandError(Exception):
+    """Raised by command futures when the command answers with an error"""
+
+    def __init__(self, answer: dict[str, Any]):
+        super().__init__(answer["data"])
+        self.answer = answer
+
+
+class CommandTimeoutError(CommandError):
+    pass
+
 
 class ClientMiddleware:
-    def __init__(self, middleware: Middleware, name: str):
+    def __init__(self, middleware: Middleware, name: str, use_multiprocessing: bool = False,
+                 queue_capacity: int = 0,
+                 status_policy: str = StatusOverloadPolicy.DROP_OLDEST,
+                 command_policy: str = CommandOverloadPolicy.BLOCK):
         self._logger = Logger()
         self._lock = threading.Lock()
+        # Held while statuses are handed to the subscribers, reentrant since
+        # inline subscribers run with it held and may subscribe again
+        self._dispatch_lock = threading.RLock()
         self._data_converter = DataConverter()
         self._subscribers: dict[str, SubscriberManager] = {}
-        self._transfer_queue:  multiprocessing.Queue = middleware.add_new_middleware_listener()
+        self._subscription_index = SubscriptionIndex()
+        if use_multiprocessing and middleware.has_listener(name):
+            # Declared by the parent process before forking this one
+            self._transfer_queue: queue.Queue | multiprocessing.Queue = middleware.get_listener_queue(
+                name)
+        else:
+            self._transfer_queue = middleware.add_new_middleware_listener(
+                use_multiprocessing, name, queue_capacity, status_policy, command_policy)
+        self._use_multiprocessing = use_multiprocessing
+        self._ring_reader = middleware.create_ring_reader() if use_multiprocessing else None
         self._request_queue: dict[str, tuple[Callable, Callable]] = {}
+        self._requests_lock = threading.Lock()
+        self._request_deadlines = TimerWheel()
+        self._answered_requests = 0
+        self._timed_out_requests = 0
+        self._dispatch_pool: ThreadPoolExecutor | None = None
+        self._serial_lanes: dict[str, ThreadPoolExecutor] = {}
         self._global_middleware = middleware
         self._commands_available: dict[str, Callable] = {}
         self._name = name
@@ -40,29 +91,180 @@ class ClientMiddleware:
 
     def add_commands(self, commands_available: dict[str, Callable[[dict], None]]):
         self._commands_available = self._commands_available | commands_available
+        self._global_middleware.register_commands(
+            self._name, commands_available.keys())
+
+    def add_subscribe_to_status(self, subscriber: SubscriberInterface, status_name, replay_last_value=False,
+                                dispatch_mode: str = DispatchMode.INLINE, latency_stage: str | None = None,
+                                serial_lane: str | None = None):
+        """
+        With replay_last_value the subscriber first receives the last
+        published value of every status matching status_name. The replay is
+        handed to its dispatcher under the lock status dispatch holds, so
+        every live status reaches it after the replayed values.
+
+        dispatch_mode selects where on_status runs (see DispatchMode), so a
+        slow subscriber does not delay the others of this client.
+
+        With latency_stage the end of every on_status of a traced batch is
+        recorded in support.ingest_latency under that name.
+
+        SERIAL subscriptions given the same serial_lane share one thread and
+        are called in order with each other (e.g. every topic of a websocket),
+        without serial_lane the subscription gets a thread of its own. A lane
+        lives until close_serial_lane() or the end of the middleware loop.
+        """
+        with self._dispatch_lock:
+            with self._lock:
+                if (not (status_name in self._subscribers)):
+                    self._subscribers[status_name] = SubscriberManager(subscriber)
+                    self._subscription_index.add(
+                        status_name, self._subscribers[status_name])
+
+                dispatcher = self._create_dispatcher(subscriber, dispatch_mode, latency_stage, serial_lane)
+                self._subscribers[status_name].add_subscriber(subscriber, dispatcher)
+
+            if replay_last_value:
+                self._replay_last_values(dispatcher, status_name)
+
+    def _create_dispatcher(self, subscriber: SubscriberInterface, dispatch_mode: str,
+                           latency_stage: str | None = None,
+                           serial_lane: str | None = None) -> SubscriberDispatcher:
+        if dispatch_mode == DispatchMode.SERIAL and serial_lane is not None:
+            if serial_lane not in self._serial_lanes:
+                self._serial_lanes[serial_lane] = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix=f"{self._name}-{serial_lane}")
+            return SubscriberDispatcher(subscriber, dispatch_mode, self._serial_lanes[serial_lane], latency_stage)
+
+        if dispatch_mode != DispatchMode.POOL:
+            return SubscriberDispatcher(subscriber, dispatch_mode, latency_stage=latency_stage)
+
+        if self._dispatch_pool is None:
+            self._dispatch_pool = ThreadPoolExecutor(
+                max_workers=DISPATCH_POOL_WORKERS, thread_name_prefix=f"{self._name}-dispatch")
+        return SubscriberDispatcher(subscriber, dispatch_mode, self._dispatch_pool, latency_stage)
 
-    def add_subscribe_to_status(self, subscriber: SubscriberInterface, status_name):
-        self._lock.acquire()
-        if (not (status_name in self._subscribers)):
-            self._subscribers[status_name] = SubscriberManager(subscriber)
+    def close_serial_lane(self, serial_lane: str):
+        """Stops the thread of a lane, statuses still queued on it are discarded"""
+        with self._lock:
+            executor = self._serial_lanes.pop(serial_lane, None)
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
 
-        self._subscribers[status_name].add_subscriber(subscriber)
-        self._lock.release()
+    def get_subscription_stats(self) -> dict[str, dict[str, dict]]:
+        """Handler latency of every subscription, by status name and subscriber id"""
+        with self._lock:
+            return {status_name: manager.get_stats()
+                    for status_name, manager in self._subscribers.items()}
+
+    def get_last_status(self, status_name: str):
+        return self._global_middleware.get_last_value(status_name)
+
+    def _replay_last_values(self, dispatcher: SubscriberDispatcher, status_name):
+        # Called with self._dispatch_lock held, see add_subscribe_to_status
+        cached_statuses = [{"name": name, "data": data}
+                           for name, data in self._global_middleware.get_last_values().items()]
+        for name, value in self._expand_statuses(cached_statuses):
+            if SubscriptionIndex.matches(status_name, name):
+                dispatcher.dispatch(name, value, status_name)
 
     def remove_subscribe_from_status(self, subscriber, status_name):
-        self._lock.acquire()
-        subscriber_id = subscriber.get_id()
-        if (not (status_name in self._subscribers)):
-            self._logger.info(
-                f"Middleware::add_subscribe_from_status-> Error, subscriber {subscriber_id} non existant")
-            return
+        with self._lock:
+            subscriber_id = subscriber.get_id()
+            if (not (status_name in self._subscribers)):
+                self._logger.info(
+                    f"Middleware::add_subscribe_from_status-> Error, subscriber {subscriber_id} non existant")
+                return
+
+            subscriber_manager = self._subscribers[status_name]
+            subscriber_manager.remove_subscriber(subscriber_id)
+            if not subscriber_manager.has_subscribers():
+                self._subscription_index.remove(status_name)
+                del self._subscribers[status_name]
+
+    def send_command(self, command_name, data, callback_handler=None, error_handler=None,
+                     timeout: float | None = None):
+        """
+        Sends a command to its owner. When a handler is given the request is
+        kept until the answer arrives or timeout (COMMAND_TIMEOUT by default)
+        expires, in which case error_handler receives an answer with
+        result False and "timedOut" set.
+        """
+        expects_answer = callback_handler is not None or error_handler is not None
+        request_id = str(uuid.uuid4())
+        if expects_answer:
+            # Registered before sending so an answer can never beat its callbacks
+            with self._requests_lock:
+                self._request_queue[request_id] = (
+                    callback_handler, error_handler)
+                self._request_deadlines.schedule(
+                    request_id, COMMAND_TIMEOUT if timeout is None else timeout)
+
+        try:
+            self._global_middleware.send_command(
+                command_name, data, self._name if expects_answer else None, request_id)
+        except UnknownCommandError as e:
+            self._logger.error(f"ClientMiddleware::send_command: {e}")
+            self._pop_request(request_id)
+            if error_handler:
+                error_handler({"name": "", "result": False, "data": str(e),
+                               "requestId": request_id, "isCommand": True})
+            return None
+
+        return request_id
+
+    def send_command_future(self, command_name, data, timeout: float | None = None) -> Future:
+        """
+        Same as send_command, but the answer resolves a Future instead of
+        calling handlers. Errors raise CommandError, deadlines
+        CommandTimeoutError.
+        """
+        future = Future()
 
-        self._subscribers[status_name].remove_subscriber(subscriber_id)
-        self._lock.release()
+        def on_answer(answer):
+            if not future.done():
+                future.set_result(answer)
 
-    def send_command(self, command_name, data, callback_handler=None, error_handler=None):
-        self._request_queue[self._global_middleware.send_command(
-            command_name, data)] = (callback_handler, error_handler)
+        def on_error(answer):
+            if future.done():
+                return
+            if answer.get("timedOut"):
+                future.set_exception(CommandTimeoutError(answer))
+            else:
+                future.set_exception(CommandError(answer))
+
+        self.send_command(command_name, data, on_answer, on_error, timeout)
+        return future
+
+    async def send_command_async(self, command_name, data, timeout: float | None = None):
+        return await asyncio.wrap_future(self.send_command_future(command_name, data, timeout))
+
+    def expire_requests(self):
+        with self._requests_lock:
+            expired = [(request_id, self._request_queue.pop(request_id))
+                       for request_id in self._request_deadlines.advance()]
+            self._timed_out_requests += len(expired)
+
+        for request_id, callbacks in expired:
+            self._global_middleware.cancel_pending_reply(request_id)
+            self._logger.warning(
+                f"ClientMiddleware::expire_requests: request {request_id} timed out")
+            if callbacks[1]:
+                callbacks[1]({"name": "", "result": False, "data": "Command timed out",
+                              "requestId": request_id, "isCommand": True, "timedOut": True})
+
+    def get_request_metrics(self) -> dict[str, int]:
+        with self._requests_lock:
+            return {
+                "pending": len(self._request_queue),
+                "answered": self._answered_requests,
+                "timedOut": self._timed_out_requests,
+            }
+
+    def _pop_request(self, request_id):
+        with self._requests_lock:
+            self._request_deadlines.cancel(request_id)
+            return self._request_queue.pop(request_id, None)
 
     def send_command_answear(self, result, data, request_id):
         self._global_middleware.send_command_answear(
@@ -73,59 +275,170 @@ class ClientMiddleware:
         if command_name in self._commands_available:
             self._commands_available[command_name](new_command)
 
-    def _check_if_subscribed(self, subscriber_status_name: str, status_name: str):
-        sub_info = subscriber_status_name.split('-')
-        status_info = status_name.split('-')
-
-        gateway_match = (sub_info[0] == '*') or (sub_info[0] == status_info[0])
-        topic_match = (sub_info[1] == '*') or (sub_info[1] == status_info[1])
-        indicator_match = (
-            sub_info[2] == '*') or (sub_info[2] == status_info[2])
-        return gateway_match and topic_match and indicator_match
-
     def send_status(self, topic: str, new_status):
         self._global_middleware.send_status(topic, new_status)
 
-    def send_status_array(self, status_list: list[Any]):
-        self._global_middleware.send_status_array(status_list)
+    def send_status_array(self, status_list: list[Any], trace: dict[str, float] | None = None):
+        if trace is None:
+            self._global_middleware.send_status_array(status_list)
+            return
+
+        trace = {**trace, "enqueued": time.monotonic()}
+        ingest_latency.record_interval(IngestStage.PUBLISH, trace, "translated", "enqueued")
+        self._global_middleware.send_status_array(status_list, trace)
 
 ############################################################################################################
 ################################# Middleware Update System #################################################
 
-    def run_middleware_update(self):
+    def set_wakeup_callback(self, callback: Callable[[], None]) -> bool:
+        """
+        Calls callback (from the publisher thread) when new messages arrive,
+        so event loops can schedule run_middleware_update instead of polling.
+        Only available for in-process listeners.
+        """
+        if not isinstance(self._transfer_queue, ListenerQueue):
+            return False
+        self._transfer_queue.set_wakeup_callback(callback)
+        return True
+
+    def get_queue_metrics(self) -> dict[str, int]:
+        return self._global_middleware.get_listener_metrics().get(self._name, {})
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Queue, command and subscription metrics of this client, see support.runtime_metrics"""
+        return {
+            "queue": self.get_queue_metrics(),
+            "requests": self.get_request_metrics(),
+            "subscriptions": self.get_subscription_stats(),
+        }
+
+    def stop(self):
+        self._transfer_queue.put(SHUTDOWN_MESSAGE)
+
+    def run_middleware_loop(self):
+        # Wakes up every tick to expire requests whose answer never came
+        while self.wait_middleware_update(self._request_deadlines.tick_seconds):
+            pass
+        self._close_dispatchers()
+
+    def _close_dispatchers(self):
+        with self._lock:
+            for manager in self._subscribers.values():
+                manager.close()
+            serial_lanes = list(self._serial_lanes.values())
+            self._serial_lanes.clear()
+        for executor in serial_lanes:
+            executor.shutdown(wait=False)
+        if self._dispatch_pool is not None:
+            self._dispatch_pool.shutdown(wait=False)
+
+    def wait_middleware_update(self, timeout=None) -> bool:
+        if self._ring_reader is not None:
+            timeout = RING_POLL_INTERVAL if timeout is None else min(
+                timeout, RING_POLL_INTERVAL)
+        try:
+            new_info = self._transfer_queue.get(timeout=timeout)
+        except queue.Empty:
+            self._drain_ring()
+            self.expire_requests()
+            return True
+
+        if not self._dispatch(new_info):
+            return False
+        return self.run_middleware_update()
+
+    def run_middleware_update(self) -> bool:
+        if isinstance(self._transfer_queue, ListenerQueue):
+            # Re-arm the wakeup before draining so nothing put meanwhile is missed
+            self._transfer_queue.clear_wakeup()
+
         while (not self._transfer_queue.empty()):
             new_info = self._transfer_queue.get()
-            if new_info["isCommand"]:
-                self._command_update(new_info)
-            else:
-                self._status_update(new_info)
-            # sleep(0.1)
+            if not self._dispatch(new_info):
+                return False
+        self._drain_ring()
+        self.expire_requests()
+        return True
 
-    def _command_update(self, new_command):
-        if new_command["requestId"] in self._request_queue and new_command["name"] == "":
-            command_id = new_command["requestId"]
-            callbacks = self._request_queue[command_id]
-            if new_command["result"]:
-                if callbacks[0]:
-                    callbacks[0](new_command)
-            else:
-                if callbacks[1]:
-                    callbacks[1](new_command)
-            del self._request_queue[command_id]
+    def _drain_ring(self):
+        if self._ring_reader is None:
+            return
+        for payload in self._ring_reader.read_available():
+            self._dispatch(pickle.loads(payload))
+
+    def _dispatch(self, new_info) -> bool:
+        if new_info.get("isShutdown"):
+            return False
+
+        if new_info["isCommand"]:
+            self._command_update(new_info)
+            return True
+
+        if self._use_multiprocessing:
+            # The cache of this process only sees what was published in it
+            self._global_middleware.update_last_values(new_info)
+        if "isBatch" in new_info:
+            trace = new_info.get("trace")
+            if trace is not None:
+                # Copied, in-process listeners share the envelope
+                trace = {**trace, "dequeued": time.monotonic()}
+                ingest_latency.record_interval(
+                    f"{IngestStage.QUEUE}.{self._name}", trace, "enqueued", "dequeued")
+            self._status_batch_update(new_info["statuses"], trace)
         else:
+            self._status_update(new_info)
+        return True
+
+    def _command_update(self, new_command):
+        if new_command["name"] != "":
             self.command_update(new_command)
+            return
+
+        callbacks = self._pop_request(new_command["requestId"])
+        if callbacks is None:
+            # Answer of a request that already timed out
+            return
+
+        with self._requests_lock:
+            self._answered_requests += 1
+        if new_command["result"]:
+            if callbacks[0]:
+                callbacks[0](new_command)
+        else:
+            if callbacks[1]:
+                callbacks[1](new_command)
 
     def _status_update(self, new_status):
-        status_name = new_status["name"]
-        data = new_status["data"]
-
-        generated_status: list[dict[str, Any]] = self._data_converter.convert_data(
-            status_name.split('-')[1], data)
-        for subscriber_status_name, subscriber in self._subscribers.items():
-            if self._check_if_subscribed(subscriber_status_name, status_name):
-                subscriber.send_status(status_name, data)
+        self._status_batch_update((new_status,))
+
+    def _expand_statuses(self, statuses) -> list[tuple[str, Any]]:
+        """Returns the (name, data) pairs of statuses plus the converted ones"""
+        pending_statuses = []
+        for new_status in statuses:
+            status_name = new_status["name"]
+            pending_statuses.append((status_name, new_status["data"]))
+
+            converter_topic = SubscriptionIndex.split_status_name(status_name)[1]
+            if not self._data_converter.has_converter(converter_topic):
+                continue
+
+            generated_status: list[dict[str, Any]] = self._data_converter.convert_data(
+                converter_topic, new_status["data"])
             if generated_status:
-                for status_gen in generated_status:
-                    if self._check_if_subscribed(subscriber_status_name, status_gen["name"]):
-                        subscriber.send_status(
-                            status_gen["name"], status_gen["value"])
+                pending_statuses += [(status_gen["name"], status_gen["value"])
+                                     for status_gen in generated_status]
+        return pending_statuses
+
+    def _status_batch_update(self, statuses, trace: dict[str, float] | None = None):
+        pending_statuses = self._expand_statuses(statuses)
+        with self._dispatch_lock:
+            with self._lock:
+                deliveries = [(name, value, self._subscription_index.match(name))
+                              for name, value in pending_statuses]
+
+            for name, value, subscribers in deliveries:
+                for subscriber in subscribers:
+                    if trace is None:
+                        subscriber.send_status(name, value)
+                    else:
+                        subscriber.send_status(name, value, trace)
@@ -1,14 +1,56 @@
 import importlib
 import os
+import pkgutil
+from typing import Any
+
+from support.logger import Logger
 
 current_folder = os.path.dirname(os.path.abspath(__file__))
 
+
 class DataConverter:
+    """
+    Registry of the status converters in this package, built once.
+
+    A converter lives in a module named after the topic it handles and is
+    the module name capitalized (e.g. current.Current), as before. It may
+    declare the topics it consumes through a `topics` class attribute.
+    Topics without a converter are remembered as None, so callers can skip
+    the conversion stage with a single dict lookup.
+    """
+
+    def __init__(self):
+        self._logger = Logger()
+        self._converters: dict[str, Any] = {}
+        self._load_converters()
+
+    def _load_converters(self):
+        for module_info in pkgutil.iter_modules([current_folder]):
+            module = importlib.import_module(
+                f".{module_info.name}", package="middleware.data_converter")
+            cls = getattr(module, module_info.name.capitalize(), None)
+            if cls is None or not hasattr(cls, "convert_in_new_status"):
+                continue
+
+            instance = cls()
+            for topic in getattr(cls, "topics", (module_info.name,)):
+                self._converters[topic] = instance
+
+    def has_converter(self, status_name) -> bool:
+        converter = self._converters.get(status_name)
+        if converter is None and status_name not in self._converters:
+            # Negative entry, this topic will not be looked up again
+            self._converters[status_name] = None
+        return converter is not None
+
     def convert_data(self, status_name, obj):
+        converter = self._converters.get(status_name)
+        if converter is None:
+            return None
+
         try:
-            module = importlib.import_module(f".{status_name}", package="middleware.data_converter")
-            cls = getattr(module, status_name.capitalize())
-            instance = cls()
-            return instance.convert_in_new_status(obj)
+            return converter.convert_in_new_status(obj)
         except Exception as e:
+            self._logger.error(
+                f"DataConverter::convert_data: Error converting {status_name} {e}")
             return None
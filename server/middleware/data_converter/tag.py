@@ -1,5 +1,7 @@
 
 class Tag:
+    topics = ("tag",)
+
     def convert_in_new_status(self, data):
         mp = {0x3ffcee10: "João Silva"}
         if data["value"] in mp:
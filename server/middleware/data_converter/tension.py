@@ -1,6 +1,8 @@
 from .power_report import PowerReport
 
 class Tension:
+    topics = ("tension",)
+
     def __init__(self):
         self.power_report = PowerReport()
     
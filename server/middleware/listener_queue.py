@@ -0,0 +1,265 @@
+from collections import deque
+from collections.abc import Callable
+import queue
+import threading
+import time
+
+
+# Commands served in a row while statuses wait before one status goes through
+STATUS_STARVATION_LIMIT = 16
+
+
+class Lane:
+    COMMAND = "command"
+    STATUS = "status"
+
+
+class StatusOverloadPolicy:
+    # Drop the oldest queued status to make room for the new one
+    DROP_OLDEST = "dropOldest"
+    # Replace the queued status with the same name, otherwise drop the oldest.
+    # Statuses inside queued batch envelopes are conflated one by one and a
+    # batch that still finds no room is merged into the newest queued batch
+    KEEP_LATEST = "keepLatest"
+
+
+class CommandOverloadPolicy:
+    # Wait for the consumer to make room
+    BLOCK = "block"
+    # Raise queue.Full to the publisher
+    RAISE = "raise"
+
+
+class ListenerQueue(queue.Queue):
+    """
+    In-process listener queue that can wake its consumer when data arrives.
+
+    The wakeup callback is coalesced: it fires once when the queue receives
+    data and is re-armed when the consumer calls clear_wakeup() before
+    draining, so a burst of puts schedules a single wakeup.
+
+    With a capacity (maxsize > 0) a full queue applies a policy per message
+    class. Statuses are never allowed to block the publisher: they are
+    dropped or conflated according to status_policy. Commands and answers
+    are never dropped: they first take the place of a queued status and,
+    when only commands are queued, block or raise according to
+    command_policy. Depth, high-water mark and drop counters are exposed
+    through get_metrics().
+
+    Messages are kept in two lanes: commands, answers and the shutdown
+    message in the command lane, statuses in the status lane. get() serves
+    the command lane first so a user command never waits behind a burst of
+    readings, but after starvation_limit commands in a row one waiting
+    status is served. Each lane reports its depth and the time messages
+    waited in it.
+    """
+
+    def __init__(self, maxsize: int = 0,
+                 status_policy: str = StatusOverloadPolicy.DROP_OLDEST,
+                 command_policy: str = CommandOverloadPolicy.BLOCK,
+                 starvation_limit: int = STATUS_STARVATION_LIMIT):
+        super().__init__(maxsize)
+        self._status_policy = status_policy
+        self._command_policy = command_policy
+        self._starvation_limit = starvation_limit
+        self._commands_in_row = 0
+        self._starvation_promotions = 0
+        self._lane_stats = {lane: {"dispatched": 0, "waitTotal": 0.0, "waitMax": 0.0}
+                            for lane in (Lane.COMMAND, Lane.STATUS)}
+        self._wakeup_lock = threading.Lock()
+        self._wakeup_callback: Callable[[], None] | None = None
+        self._wakeup_pending = False
+
+        self._high_water_mark = 0
+        self._enqueued = 0
+        self._dropped_statuses = 0
+        self._conflated_statuses = 0
+        self._rejected_commands = 0
+
+    def set_wakeup_callback(self, callback: Callable[[], None] | None):
+        with self._wakeup_lock:
+            self._wakeup_callback = callback
+            self._wakeup_pending = False
+        if callback and not self.empty():
+            self._notify()
+
+    def clear_wakeup(self):
+        with self._wakeup_lock:
+            self._wakeup_pending = False
+
+    def put(self, item, block=True, timeout=None):
+        with self.not_full:
+            if self.maxsize > 0 and self._qsize() >= self.maxsize:
+                if not self._make_room(item, block, timeout):
+                    return
+            self._put(item)
+            self._enqueued += 1
+            self._high_water_mark = max(self._high_water_mark, self._qsize())
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+        self._notify()
+
+    def get_metrics(self) -> dict[str, int]:
+        with self.mutex:
+            lanes = {}
+            for lane, lane_queue in ((Lane.COMMAND, self._command_lane), (Lane.STATUS, self._status_lane)):
+                stats = self._lane_stats[lane]
+                lanes[lane] = {
+                    "depth": len(lane_queue),
+                    "dispatched": stats["dispatched"],
+                    "waitMeanMs": stats["waitTotal"] / (stats["dispatched"] or 1) * 1000,
+                    "waitMaxMs": stats["waitMax"] * 1000,
+                }
+            return {
+                "depth": self._qsize(),
+                "capacity": self.maxsize,
+                "highWaterMark": self._high_water_mark,
+                "enqueued": self._enqueued,
+                "droppedStatuses": self._dropped_statuses,
+                "conflatedStatuses": self._conflated_statuses,
+                "rejectedCommands": self._rejected_commands,
+                "starvationPromotions": self._starvation_promotions,
+                "lanes": lanes,
+            }
+
+    @staticmethod
+    def _is_command(item) -> bool:
+        return item["isCommand"] or "isShutdown" in item
+
+    @staticmethod
+    def _status_count(item) -> int:
+        return len(item["statuses"]) if "isBatch" in item else 1
+
+    # queue.Queue storage hooks, called with the mutex held
+    def _init(self, maxsize):
+        self._command_lane: deque[tuple[dict, float]] = deque()
+        self._status_lane: deque[tuple[dict, float]] = deque()
+
+    def _qsize(self):
+        return len(self._command_lane) + len(self._status_lane)
+
+    def _put(self, item):
+        lane = self._command_lane if self._is_command(item) else self._status_lane
+        lane.append((item, time.perf_counter()))
+
+    def _get(self):
+        if self._command_lane and (not self._status_lane or self._commands_in_row < self._starvation_limit):
+            self._commands_in_row += 1
+            item, enqueued_at = self._command_lane.popleft()
+            lane = Lane.COMMAND
+        else:
+            if self._command_lane:
+                self._starvation_promotions += 1
+            self._commands_in_row = 0
+            item, enqueued_at = self._status_lane.popleft()
+            lane = Lane.STATUS
+
+        wait = time.perf_counter() - enqueued_at
+        stats = self._lane_stats[lane]
+        stats["dispatched"] += 1
+        stats["waitTotal"] += wait
+        stats["waitMax"] = max(stats["waitMax"], wait)
+        return item
+
+    def _make_room(self, item, block, timeout) -> bool:
+        """Called with the mutex held on a full queue, False drops the item"""
+        if not self._is_command(item):
+            if self._status_policy == StatusOverloadPolicy.KEEP_LATEST:
+                if self._conflate(item):
+                    return False
+                if self._qsize() < self.maxsize:
+                    # Every status of a queued message had a newer value in item
+                    return True
+                if self._merge_into_newest_batch(item):
+                    return False
+            if not self._drop_oldest_status():
+                # Only commands are queued, the new status is the one dropped
+                self._dropped_statuses += self._status_count(item)
+                return False
+            return True
+
+        if self._drop_oldest_status():
+            return True
+        if self._command_policy == CommandOverloadPolicy.RAISE or not block:
+            self._rejected_commands += 1
+            raise queue.Full
+
+        self._wait_not_full(timeout)
+        return True
+
+    def _conflate(self, item) -> bool:
+        """True when item took the place of a queued status with the same name"""
+        if "name" in item:
+            for index in range(len(self._status_lane) - 1, -1, -1):
+                queued, _ = self._status_lane[index]
+                if queued.get("name") == item["name"]:
+                    self._status_lane[index] = (item, time.perf_counter())
+                    self._conflated_statuses += 1
+                    return True
+            names = {item["name"]}
+        else:
+            names = {status["name"] for status in item["statuses"]}
+
+        # Queued statuses item has a newer value for are removed, messages are
+        # shared between listeners so batches are copied instead of edited
+        kept = deque()
+        for queued, enqueued_at in self._status_lane:
+            if "isBatch" in queued:
+                statuses = [status for status in queued["statuses"] if status["name"] not in names]
+                removed = len(queued["statuses"]) - len(statuses)
+                if removed:
+                    self._conflated_statuses += removed
+                    if not statuses:
+                        continue
+                    queued = {**queued, "statuses": statuses}
+            elif queued["name"] in names:
+                self._conflated_statuses += 1
+                continue
+            kept.append((queued, enqueued_at))
+        self._status_lane = kept
+        return False
+
+    def _merge_into_newest_batch(self, item) -> bool:
+        """
+        Appends the statuses of batch item to the newest queued batch, so a
+        full queue does not drop the other gateways of the oldest batch
+        """
+        if "isBatch" not in item or not self._status_lane:
+            return False
+        queued, enqueued_at = self._status_lane[-1]
+        if "isBatch" not in queued:
+            return False
+        self._status_lane[-1] = ({**item, "statuses": queued["statuses"] + item["statuses"]}, enqueued_at)
+        return True
+
+    def _drop_oldest_status(self) -> bool:
+        if not self._status_lane:
+            return False
+        dropped, _ = self._status_lane.popleft()
+        self._dropped_statuses += self._status_count(dropped)
+        return True
+
+    def _wait_not_full(self, timeout):
+        # Same wait loop as queue.Queue.put, the mutex is already held
+        if timeout is None:
+            while self._qsize() >= self.maxsize:
+                self.not_full.wait()
+            return
+
+        if timeout < 0:
+            raise ValueError("'timeout' must be a non-negative number")
+        endtime = time.monotonic() + timeout
+        while self._qsize() >= self.maxsize:
+            remaining = endtime - time.monotonic()
+            if remaining <= 0.0:
+                self._rejected_commands += 1
+                raise queue.Full
+            self.not_full.wait(remaining)
+
+    def _notify(self):
+        with self._wakeup_lock:
+            if self._wakeup_callback is None or self._wakeup_pending:
+                return
+            self._wakeup_pending = True
+            callback = self._wakeup_callback
+        callback()
@@ -1,43 +1,250 @@
+from collections.abc import MutableMapping
 import multiprocessing
-from multiprocessing.queues import Queue
+import pickle
+import queue
+import threading
 from typing import Any
 import uuid
+from middleware.listener_queue import CommandOverloadPolicy, ListenerQueue, StatusOverloadPolicy
+from middleware.shared_memory_ring import RingReader, SharedMemoryRing
 from support.logger import Logger
 
+# Put on a listener queue to make a blocking consumer leave its loop
+SHUTDOWN_MESSAGE = {"isCommand": False, "isShutdown": True}
+
+# Topic of the gateway reading reports ({gateway}-status-*), the statuses
+# carried by the shared-memory ring between processes
+RING_STATUS_TOPIC = "status"
+
+
+class UnknownCommandError(Exception):
+    pass
+
+
 class Middleware:
-    def __init__(self):
+    """
+    Status/command bus shared by every ClientMiddleware.
+
+    Listeners are in-process queues by default: each published message is
+    built once and the same object reference is handed to every listener,
+    with no pickling involved. Listeners that live in another process must
+    opt in to the multiprocessing transport. Messages are shared, so
+    listeners must treat them (and their data) as read-only.
+
+    Statuses are broadcast to every listener. Commands are delivered only to
+    the listener that registered the command name, and answers only to the
+    listener given as reply-to when the command was sent. In-process
+    listeners dispatch commands and answers ahead of queued statuses (see
+    ListenerQueue).
+
+    The last value published for each status name is kept, so a late
+    subscriber (a websocket that just connected, a service that just
+    subscribed) can start from the current value instead of waiting for the
+    next report.
+
+    For a deployment with one process per manager, the listeners are created
+    with the multiprocessing transport before forking, the command registry
+    and pending replies are shared mappings (e.g. multiprocessing.Manager
+    dicts) and gateway readings go through status_ring: each reading is
+    pickled once into shared memory and read by every process, while
+    commands, answers and the other statuses stay on the listener queues.
+    """
+
+    def __init__(self, command_owners: MutableMapping[str, str] | None = None,
+                 pending_replies: MutableMapping[str, str] | None = None,
+                 status_ring: SharedMemoryRing | None = None):
         self._logger = Logger()
-        self._subscriber_queues: list[Queue] = []
+        self._subscriber_queues: list[queue.Queue | multiprocessing.Queue] = []
+        self._listener_queues: dict[str, queue.Queue | multiprocessing.Queue] = {}
+        # Statuses dropped by this process on each full multiprocessing listener queue
+        self._process_queue_drops: dict[multiprocessing.Queue, int] = {}
+        self._drops_lock = threading.Lock()
+        self._command_owners = {} if command_owners is None else command_owners
+        self._pending_replies = {} if pending_replies is None else pending_replies
+        self._status_ring = status_ring
         self._request_queues = []
+        self._last_values_lock = threading.Lock()
+        self._last_values: dict[str, Any] = {}
+
+    @staticmethod
+    def _create_queue(use_multiprocessing: bool, capacity: int = 0,
+                      status_policy: str = StatusOverloadPolicy.DROP_OLDEST,
+                      command_policy: str = CommandOverloadPolicy.BLOCK):
+        if use_multiprocessing:
+            # Overload policies and priority lanes need to inspect the queue, only the capacity
+            # applies here: a full queue drops statuses (see _put_status) and blocks commands
+            return multiprocessing.Queue(capacity)
+        return ListenerQueue(capacity, status_policy, command_policy)
+
+    def add_new_middleware_listener(self, use_multiprocessing: bool = False, listener_id: str | None = None,
+                                    capacity: int = 0,
+                                    status_policy: str = StatusOverloadPolicy.DROP_OLDEST,
+                                    command_policy: str = CommandOverloadPolicy.BLOCK):
+        if listener_id is None:
+            listener_id = str(uuid.uuid4())
+        if listener_id in self._listener_queues:
+            raise ValueError(
+                f"Middleware::add_new_middleware_listener: listener {listener_id} already exists")
+
+        listener_queue = self._create_queue(
+            use_multiprocessing, capacity, status_policy, command_policy)
+        self._subscriber_queues.append(listener_queue)
+        self._listener_queues[listener_id] = listener_queue
+        if use_multiprocessing:
+            self._process_queue_drops[listener_queue] = 0
+        return listener_queue
+
+    def has_listener(self, listener_id: str) -> bool:
+        return listener_id in self._listener_queues
+
+    def get_listener_queue(self, listener_id: str):
+        return self._listener_queues[listener_id]
+
+    def create_ring_reader(self) -> RingReader | None:
+        if self._status_ring is None:
+            return None
+        return self._status_ring.create_reader()
+
+    def get_listener_metrics(self) -> dict[str, dict[str, int]]:
+        metrics = {}
+        for listener_id, listener_queue in self._listener_queues.items():
+            if isinstance(listener_queue, ListenerQueue):
+                metrics[listener_id] = listener_queue.get_metrics()
+            else:
+                try:
+                    metrics[listener_id] = {"depth": listener_queue.qsize()}
+                except NotImplementedError:
+                    metrics[listener_id] = {}
+                if listener_queue in self._process_queue_drops:
+                    with self._drops_lock:
+                        metrics[listener_id]["droppedStatuses"] = self._process_queue_drops[listener_queue]
+        return metrics
+
+    def register_commands(self, listener_id: str, command_names):
+        if listener_id not in self._listener_queues:
+            raise ValueError(
+                f"Middleware::register_commands: listener {listener_id} not found")
+
+        for command_name in command_names:
+            owner = self._command_owners.get(command_name)
+            if owner is not None and owner != listener_id:
+                self._logger.warning(
+                    f"Middleware::register_commands: command {command_name} moved from {owner} to {listener_id}")
+            self._command_owners[command_name] = listener_id
 
-    def add_new_middleware_listener(self):
-        queue = multiprocessing.Queue()
-        self._subscriber_queues.append(queue)
-        return queue
-    
-    def add_new_request_listener(self):
-        queue = multiprocessing.Queue()
-        self._request_queues.append(queue)
-        return queue
+    def add_new_request_listener(self, use_multiprocessing: bool = False):
+        listener_queue = self._create_queue(use_multiprocessing)
+        self._request_queues.append(listener_queue)
+        return listener_queue
+
+    def get_last_value(self, status_name: str):
+        with self._last_values_lock:
+            return self._last_values.get(status_name)
+
+    def get_last_values(self) -> dict[str, Any]:
+        with self._last_values_lock:
+            return self._last_values.copy()
+
+    def update_last_values(self, message: dict[str, Any]):
+        with self._last_values_lock:
+            if "isBatch" in message:
+                for status in message["statuses"]:
+                    self._last_values[status["name"]] = status["data"]
+            else:
+                self._last_values[message["name"]] = message["data"]
+
+    @staticmethod
+    def _is_ring_status(message: dict[str, Any]) -> bool:
+        if "isBatch" in message:
+            names = [status["name"] for status in message["statuses"]]
+        else:
+            names = [message["name"]]
+        return all(name.split('-')[1:2] == [RING_STATUS_TOPIC] for name in names)
+
+    def _write_to_ring(self, message: dict[str, Any]) -> list[dict[str, Any]]:
+        """Writes message to the ring and returns the parts that did not fit a record"""
+        if self._status_ring.write(pickle.dumps(message, protocol=pickle.HIGHEST_PROTOCOL)):
+            return []
+        if "isBatch" in message and len(message["statuses"]) > 1:
+            # Large batches are split until every half fits a record
+            middle = len(message["statuses"]) // 2
+            return (self._write_to_ring({**message, "statuses": message["statuses"][:middle]}) +
+                    self._write_to_ring({**message, "statuses": message["statuses"][middle:]}))
+        self._logger.warning(
+            "Middleware::_publish: status larger than a ring record, sent through the queues")
+        return [message]
+
+    def _put_status(self, listener_queue, message: dict[str, Any]):
+        if listener_queue not in self._process_queue_drops:
+            # ListenerQueue applies its status overload policy, it never blocks on statuses
+            listener_queue.put(message)
+            return
+
+        # A full queue of another process drops the status instead of blocking the publisher
+        try:
+            listener_queue.put_nowait(message)
+        except queue.Full:
+            dropped = len(message["statuses"]) if "isBatch" in message else 1
+            with self._drops_lock:
+                self._process_queue_drops[listener_queue] += dropped
+
+    def _publish(self, message: dict[str, Any]):
+        self.update_last_values(message)
+
+        if self._status_ring is None or not self._is_ring_status(message):
+            for listener_queue in self._subscriber_queues:
+                self._put_status(listener_queue, message)
+            return
+
+        # Listeners in other processes read it from the ring
+        not_on_ring = self._write_to_ring(message)
+        for listener_queue in self._subscriber_queues:
+            if isinstance(listener_queue, ListenerQueue):
+                listener_queue.put(message)
+            else:
+                for part in not_on_ring:
+                    self._put_status(listener_queue, part)
 
     def send_status(self, status_name, data):
-        for queue in self._subscriber_queues:
-            queue.put({"name": status_name, "data": data, "isCommand": False})
-    
-    def send_status_array(self, status_list: list[Any]):
-        new_status_list = [{"name": status["statusName"], "data": status["data"], "isCommand": False} for status in status_list]
-        for queue in self._subscriber_queues:
-            for status in new_status_list:
-                queue.put(status)
-    
-    def send_command(self, command_name, data):
-        request_id = str(uuid.uuid4())
-        for queue in self._subscriber_queues:
-            queue.put({"name": command_name, "data": data, "requestId": request_id, "isCommand": True})
-        
+        self._publish({"name": status_name, "data": data, "isCommand": False})
+
+    def send_status_array(self, status_list: list[Any], trace: dict[str, float] | None = None):
+        if not status_list:
+            return
+
+        # One envelope per listener instead of one put per status
+        message = {"statuses": [{"name": status["statusName"], "data": status["data"]}
+                                for status in status_list],
+                   "isBatch": True, "isCommand": False}
+        if trace is not None:
+            # Ingest latency stamps, see support.ingest_latency
+            message["trace"] = trace
+        self._publish(message)
+
+    def send_command(self, command_name, data, reply_to: str | None = None, request_id: str | None = None):
+        owner = self._command_owners.get(command_name)
+        if owner is None:
+            raise UnknownCommandError(
+                f"Middleware::send_command: no listener handles command {command_name}")
+
+        if request_id is None:
+            request_id = str(uuid.uuid4())
+        if reply_to is not None:
+            self._pending_replies[request_id] = reply_to
+
+        self._listener_queues[owner].put({"name": command_name, "data": data, "requestId": request_id,
+                                          "replyTo": reply_to, "isCommand": True})
+
         return request_id
-    
+
+    def cancel_pending_reply(self, request_id):
+        self._pending_replies.pop(request_id, None)
+
     def send_command_answear(self, command_name, result, data, request_id):
-        for queue in self._subscriber_queues:
-            queue.put({"name": command_name, "result": result, "data": data, "requestId": request_id, "isCommand": True})
-        
\ No newline at end of file
+        reply_to = self._pending_replies.pop(request_id, None)
+        if reply_to is None:
+            # Nobody is waiting for this answer (fire and forget command)
+            return
+
+        self._listener_queues[reply_to].put({"name": command_name, "result": result, "data": data,
+                                             "requestId": request_id, "isCommand": True})
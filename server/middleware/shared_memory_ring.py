@@ -0,0 +1,132 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import struct
+
+# Header: next sequence number to write
+_HEADER = struct.Struct("Q")
+_HEADER_SIZE = 64
+# Record: sequence number stored in the slot, payload length
+_RECORD_HEADER = struct.Struct("QI4x")
+# Sequence stamped on a slot while its payload is being rewritten
+_WRITING = 2 ** 64 - 1
+
+
+class SharedMemoryRing:
+    """
+    Fixed-record ring buffer in shared memory, one writer at a time and any
+    number of readers in any process.
+
+    Every record slot carries the sequence number of the payload it holds.
+    Writers stamp the slot as being written, copy the payload, stamp the
+    sequence and finally publish the new write sequence. Readers keep their
+    own cursor and check the slot sequence before and after copying, so a
+    payload overwritten while being read is detected and counted as an
+    overrun instead of being returned torn. A reader that falls more than
+    record_count records behind skips to the oldest record still available.
+
+    Payloads larger than record_size minus the record header are refused.
+    The ring must be created before the processes are forked.
+    """
+
+    def __init__(self, record_size: int = 16384, record_count: int = 2048):
+        if record_size <= _RECORD_HEADER.size:
+            raise ValueError(
+                f"SharedMemoryRing::__init__: record_size must be larger than {_RECORD_HEADER.size}")
+        self._record_size = record_size
+        self._record_count = record_count
+        self._write_lock = multiprocessing.Lock()
+        self._shared_memory = shared_memory.SharedMemory(
+            create=True, size=_HEADER_SIZE + record_size * record_count)
+        self._buffer = self._shared_memory.buf
+        _HEADER.pack_into(self._buffer, 0, 0)
+        for index in range(record_count):
+            _RECORD_HEADER.pack_into(
+                self._buffer, self._record_offset(index), _WRITING, 0)
+
+    @property
+    def max_payload_size(self) -> int:
+        return self._record_size - _RECORD_HEADER.size
+
+    @property
+    def record_count(self) -> int:
+        return self._record_count
+
+    def _record_offset(self, sequence: int) -> int:
+        return _HEADER_SIZE + (sequence % self._record_count) * self._record_size
+
+    def get_write_sequence(self) -> int:
+        return _HEADER.unpack_from(self._buffer, 0)[0]
+
+    def write(self, payload: bytes) -> bool:
+        if len(payload) > self.max_payload_size:
+            return False
+
+        with self._write_lock:
+            sequence = self.get_write_sequence()
+            offset = self._record_offset(sequence)
+            _RECORD_HEADER.pack_into(self._buffer, offset, _WRITING, 0)
+            payload_offset = offset + _RECORD_HEADER.size
+            self._buffer[payload_offset:payload_offset + len(payload)] = payload
+            _RECORD_HEADER.pack_into(
+                self._buffer, offset, sequence, len(payload))
+            _HEADER.pack_into(self._buffer, 0, sequence + 1)
+        return True
+
+    def read(self, sequence: int) -> bytes | None:
+        """Returns the payload of sequence, or None when it is not in the ring anymore"""
+        offset = self._record_offset(sequence)
+        stored_sequence, length = _RECORD_HEADER.unpack_from(
+            self._buffer, offset)
+        if stored_sequence != sequence:
+            return None
+
+        payload_offset = offset + _RECORD_HEADER.size
+        payload = bytes(self._buffer[payload_offset:payload_offset + length])
+        if _RECORD_HEADER.unpack_from(self._buffer, offset)[0] != sequence:
+            return None
+        return payload
+
+    def create_reader(self) -> "RingReader":
+        return RingReader(self)
+
+    def close(self):
+        self._buffer = None
+        self._shared_memory.close()
+
+    def unlink(self):
+        self._shared_memory.unlink()
+
+
+class RingReader:
+    """Cursor of one reader, starts at the records written after its creation"""
+
+    def __init__(self, ring: SharedMemoryRing):
+        self._ring = ring
+        self._cursor = ring.get_write_sequence()
+        self._overruns = 0
+
+    @property
+    def overruns(self) -> int:
+        return self._overruns
+
+    def lag(self) -> int:
+        return self._ring.get_write_sequence() - self._cursor
+
+    def read_available(self, max_records: int | None = None) -> list[bytes]:
+        write_sequence = self._ring.get_write_sequence()
+        if write_sequence - self._cursor > self._ring.record_count:
+            self._overruns += write_sequence - self._cursor - self._ring.record_count
+            self._cursor = write_sequence - self._ring.record_count
+        if max_records is not None:
+            write_sequence = min(write_sequence, self._cursor + max_records)
+
+        payloads = []
+        while self._cursor < write_sequence:
+            payload = self._ring.read(self._cursor)
+            if payload is None:
+                # Overwritten by a writer that lapped this reader
+                self._overruns += 1
+            else:
+                payloads.append(payload)
+            self._cursor += 1
+        return payloads
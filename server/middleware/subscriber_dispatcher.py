@@ -0,0 +1,117 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+import threading
+import time
+
+from middleware.subscriber_interface import SubscriberInterface
+from support.ingest_latency import ingest_latency
+from support.logger import Logger
+
+
+class DispatchMode:
+    # Called on the thread that drains the listener queue
+    INLINE = "inline"
+    # Called in order on a thread owned by the subscription
+    SERIAL = "serial"
+    # Called on the client shared pool, statuses may be handled out of order
+    POOL = "pool"
+
+
+class SubscriberDispatcher:
+    """
+    Delivers statuses to one subscriber according to its dispatch mode and
+    keeps its handler latency.
+
+    handlerTime is the time spent inside on_status, queueTime the time a
+    status waited for its executor (always zero inline). With latency_stage
+    the end of on_status is also recorded for traced batches.
+
+    An exception raised by on_status is logged and counted in errors in
+    every mode, inline included: it does not reach the thread draining the
+    listener queue, so the other subscribers and the next statuses are
+    still delivered.
+    """
+
+    def __init__(self, subscriber: SubscriberInterface, mode: str = DispatchMode.INLINE,
+                 executor: Executor | None = None, latency_stage: str | None = None):
+        self._logger = Logger()
+        self._subscriber = subscriber
+        self._mode = mode
+        self._latency_stage = latency_stage
+        self._owns_executor = False
+        if mode == DispatchMode.SERIAL and executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix=f"subscriber-{subscriber.get_id()}")
+            self._owns_executor = True
+        elif mode != DispatchMode.INLINE and executor is None:
+            raise ValueError(
+                f"SubscriberDispatcher::__init__: mode {mode} needs an executor")
+        self._executor = executor
+
+        self._stats_lock = threading.Lock()
+        self._calls = 0
+        self._errors = 0
+        self._handler_time_total = 0.0
+        self._handler_time_max = 0.0
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+
+    @property
+    def subscriber(self) -> SubscriberInterface:
+        return self._subscriber
+
+    @property
+    def mode(self) -> str:
+        return self._mode
+
+    def dispatch(self, status_name, data, sub_status_name, trace=None):
+        if self._latency_stage is None:
+            trace = None
+        if self._executor is None:
+            self._call(status_name, data, sub_status_name, None, trace)
+            return
+
+        try:
+            self._executor.submit(self._call, status_name, data,
+                                  sub_status_name, time.perf_counter(), trace)
+        except RuntimeError:
+            # Executor already shut down, the subscription is going away
+            pass
+
+    def _call(self, status_name, data, sub_status_name, submitted_at, trace=None):
+        started_at = time.perf_counter()
+        failed = False
+        try:
+            self._subscriber.on_status(status_name, data, sub_status_name)
+        except Exception as e:
+            failed = True
+            self._logger.error(
+                f"SubscriberDispatcher::_call: subscriber {self._subscriber.get_id()} failed on {status_name}: {e}")
+        handler_time = time.perf_counter() - started_at
+        if trace is not None:
+            ingest_latency.record_subscriber(self._latency_stage, trace)
+        queue_time = 0.0 if submitted_at is None else started_at - submitted_at
+
+        with self._stats_lock:
+            self._calls += 1
+            self._errors += failed
+            self._handler_time_total += handler_time
+            self._handler_time_max = max(self._handler_time_max, handler_time)
+            self._queue_time_total += queue_time
+            self._queue_time_max = max(self._queue_time_max, queue_time)
+
+    def get_stats(self) -> dict[str, float | int | str]:
+        with self._stats_lock:
+            calls = self._calls or 1
+            return {
+                "mode": self._mode,
+                "calls": self._calls,
+                "errors": self._errors,
+                "handlerTimeMeanMs": self._handler_time_total / calls * 1000,
+                "handlerTimeMaxMs": self._handler_time_max * 1000,
+                "queueTimeMeanMs": self._queue_time_total / calls * 1000,
+                "queueTimeMaxMs": self._queue_time_max * 1000,
+            }
+
+    def close(self, wait: bool = False):
+        if self._owns_executor:
+            self._executor.shutdown(wait=wait)
@@ -1,22 +1,37 @@
+from middleware.subscriber_dispatcher import SubscriberDispatcher
 from middleware.subscriber_interface import SubscriberInterface
 
 
 class SubscriberManager:
     def __init__(self, status):
         self._status_name = status._status
-        self._subscriber_map = {}
-    
-    def add_subscriber(self, subscriber: SubscriberInterface):
-        self._subscriber_map[subscriber.get_id()] = subscriber
+        self._subscriber_map: dict[str, SubscriberDispatcher] = {}
+
+    def add_subscriber(self, subscriber: SubscriberInterface, dispatcher: SubscriberDispatcher | None = None):
+        previous = self._subscriber_map.get(subscriber.get_id())
+        if previous is not None and previous is not dispatcher:
+            previous.close()
+        self._subscriber_map[subscriber.get_id()] = dispatcher or SubscriberDispatcher(subscriber)
 
     def remove_subscriber(self, subscriber_id):
         if(not (subscriber_id in self._subscriber_map)):
             print(f"Middleware::add_subscribe_from_status-> Error, subscriber {subscriber_id} non subscribing {self._status_name}")
             return
 
-        del self._subscriber_map[subscriber_id]
+        self._subscriber_map.pop(subscriber_id).close()
+
+    def has_subscribers(self):
+        return len(self._subscriber_map) > 0
+
+    def get_stats(self):
+        return {subscriber_id: dispatcher.get_stats()
+                for subscriber_id, dispatcher in list(self._subscriber_map.items())}
+
+    def close(self):
+        for dispatcher in self._subscriber_map.values():
+            dispatcher.close()
 
-    def send_status(self, status_name, data):
-        for subscriber_id in self._subscriber_map:
-            subscriber = self._subscriber_map[subscriber_id]
-            subscriber.on_status(status_name, data, self._status_name)
+    def send_status(self, status_name, data, trace=None):
+        # Copied so a subscription changing from another thread cannot break the loop
+        for dispatcher in list(self._subscriber_map.values()):
+            dispatcher.dispatch(status_name, data, self._status_name, trace)
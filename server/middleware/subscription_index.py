@@ -0,0 +1,98 @@
+from typing import Any
+
+WILDCARD = "*"
+MAX_MATCH_CACHE_SIZE = 4096
+
+# Every combination of wildcard levels for gateway-topic-indicator names
+_ALL_MASKS = [(gateway, topic, indicator)
+              for gateway in (False, True)
+              for topic in (False, True)
+              for indicator in (False, True)]
+
+
+class SubscriptionIndex:
+    """
+    Precompiled index of status subscriptions.
+
+    Subscription names follow the gateway-topic-indicator pattern, where any
+    level can be '*'. Patterns are kept pre-split in a dict and grouped by
+    wildcard mask, so matching a status costs one dict lookup per mask in use
+    (at most eight) regardless of how many subscriptions are registered.
+    Resolved matches are cached per status name until the index changes.
+    """
+
+    def __init__(self):
+        self._patterns: dict[tuple[str, str, str], Any] = {}
+        self._mask_count: dict[tuple[bool, bool, bool], int] = {}
+        self._active_masks: list[tuple[bool, bool, bool]] = []
+        self._match_cache: dict[str, tuple[Any, ...]] = {}
+
+    @staticmethod
+    def split_status_name(status_name: str) -> tuple[str, str, str]:
+        parts = status_name.split('-')
+        parts += [""] * (3 - len(parts))
+        return parts[0], parts[1], parts[2]
+
+    @staticmethod
+    def matches(pattern_name: str, status_name: str) -> bool:
+        return all(pattern_level in (WILDCARD, status_level)
+                   for pattern_level, status_level in zip(SubscriptionIndex.split_status_name(pattern_name),
+                                                          SubscriptionIndex.split_status_name(status_name)))
+
+    @staticmethod
+    def _get_mask(pattern_key: tuple[str, str, str]):
+        return tuple(level == WILDCARD for level in pattern_key)
+
+    def __len__(self):
+        return len(self._patterns)
+
+    def __contains__(self, pattern_name: str):
+        return self.split_status_name(pattern_name) in self._patterns
+
+    def add(self, pattern_name: str, value: Any):
+        pattern_key = self.split_status_name(pattern_name)
+        if pattern_key not in self._patterns:
+            mask = self._get_mask(pattern_key)
+            self._mask_count[mask] = self._mask_count.get(mask, 0) + 1
+            self._refresh_masks()
+        self._patterns[pattern_key] = value
+        self._match_cache.clear()
+
+    def remove(self, pattern_name: str):
+        pattern_key = self.split_status_name(pattern_name)
+        if pattern_key not in self._patterns:
+            return
+
+        del self._patterns[pattern_key]
+        mask = self._get_mask(pattern_key)
+        self._mask_count[mask] -= 1
+        if self._mask_count[mask] == 0:
+            del self._mask_count[mask]
+        self._refresh_masks()
+        self._match_cache.clear()
+
+    def match(self, status_name: str) -> tuple[Any, ...]:
+        cached = self._match_cache.get(status_name)
+        if cached is not None:
+            return cached
+
+        gateway, topic, indicator = self.split_status_name(status_name)
+        # Published names may carry '*' themselves (e.g. "gw-status-*"), so
+        # different masks can resolve to the same pattern
+        matched_keys = {}
+        for gateway_mask, topic_mask, indicator_mask in self._active_masks:
+            pattern_key = (WILDCARD if gateway_mask else gateway,
+                           WILDCARD if topic_mask else topic,
+                           WILDCARD if indicator_mask else indicator)
+            if pattern_key in self._patterns:
+                matched_keys[pattern_key] = self._patterns[pattern_key]
+
+        result = tuple(matched_keys.values())
+        if len(self._match_cache) >= MAX_MATCH_CACHE_SIZE:
+            self._match_cache.clear()
+        self._match_cache[status_name] = result
+        return result
+
+    def _refresh_masks(self):
+        self._active_masks = [
+            mask for mask in _ALL_MASKS if mask in self._mask_count]
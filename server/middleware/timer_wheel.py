@@ -0,0 +1,75 @@
+import time
+from collections.abc import Hashable
+
+DEFAULT_TICK_SECONDS = 0.5
+DEFAULT_WHEEL_SLOTS = 512
+
+
+class TimerWheel:
+    """
+    Hashed timing wheel for request deadlines.
+
+    Each key is hashed into the slot of its deadline tick, so scheduling and
+    cancelling are O(1) and advancing only visits the slots of the ticks that
+    elapsed. Deadlines further than one revolution stay in their slot until
+    their tick comes. Deadlines have tick resolution: a key expires on the
+    first advance at or after its deadline, rounded up to the next tick.
+
+    Not thread safe, callers hold their own lock.
+    """
+
+    def __init__(self, tick_seconds: float = DEFAULT_TICK_SECONDS, slots: int = DEFAULT_WHEEL_SLOTS,
+                 now: float | None = None):
+        self._tick_seconds = tick_seconds
+        self._slots: list[dict[Hashable, int]] = [{} for _ in range(slots)]
+        self._deadlines: dict[Hashable, int] = {}
+        self._current_tick = self._to_tick(time.monotonic() if now is None else now)
+
+    @property
+    def tick_seconds(self) -> float:
+        return self._tick_seconds
+
+    def _to_tick(self, timestamp: float) -> int:
+        return int(timestamp // self._tick_seconds)
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, key: Hashable):
+        return key in self._deadlines
+
+    def schedule(self, key: Hashable, timeout: float, now: float | None = None):
+        self.cancel(key)
+        now = time.monotonic() if now is None else now
+        # Rounded up so a key never expires before its timeout
+        deadline_tick = max(-int(-(now + timeout) // self._tick_seconds),
+                            self._current_tick + 1)
+        self._deadlines[key] = deadline_tick
+        self._slots[deadline_tick % len(self._slots)][key] = deadline_tick
+
+    def cancel(self, key: Hashable) -> bool:
+        deadline_tick = self._deadlines.pop(key, None)
+        if deadline_tick is None:
+            return False
+        del self._slots[deadline_tick % len(self._slots)][key]
+        return True
+
+    def advance(self, now: float | None = None) -> list[Hashable]:
+        """Moves the wheel to now and returns the keys that expired"""
+        target_tick = self._to_tick(time.monotonic() if now is None else now)
+        if target_tick <= self._current_tick or not self._deadlines:
+            self._current_tick = max(self._current_tick, target_tick)
+            return []
+
+        # After a long idle period every slot is visited once, not every tick
+        elapsed_ticks = min(target_tick - self._current_tick, len(self._slots))
+        expired = []
+        for tick in range(target_tick - elapsed_ticks + 1, target_tick + 1):
+            slot = self._slots[tick % len(self._slots)]
+            for key in [key for key, deadline_tick in slot.items() if deadline_tick <= target_tick]:
+                del slot[key]
+                del self._deadlines[key]
+                expired.append(key)
+
+        self._current_tick = target_tick
+        return expired
@@ -1,17 +1,29 @@
+import os
 from threading import Thread
-from time import sleep
 from middleware.client_middleware import ClientMiddleware
 from support.logger import Logger
+from support.runtime_metrics import runtime_metrics
 from .titanium_mqtt.mqtt import TitaniumMqtt
+from .titanium_mqtt.mqtt_commands import MqttCommands
+
+MODULES_MANAGER_QUEUE_CAPACITY = int(
+    os.getenv('MODULES_MANAGER_QUEUE_CAPACITY', '10000'))
+
 
 class ModulesManager:
-    _finish = False
-    def __init__(self, middleware):
+    LISTENER_NAME = "modules_manager"
+    QUEUE_CAPACITY = MODULES_MANAGER_QUEUE_CAPACITY
+    # Registered by the parent process before forking, see main.run_processes
+    COMMANDS = (MqttCommands.CALIBRATION, MqttCommands.SYSTEM_STATUS_REQUEST)
+
+    def __init__(self, middleware, use_multiprocessing=False):
         self._logger = Logger()
-        self._client_middleware = ClientMiddleware(middleware, "modules_manager")
+        self._client_middleware = ClientMiddleware(middleware, self.LISTENER_NAME, use_multiprocessing,
+                                                   queue_capacity=self.QUEUE_CAPACITY)
         self._titanium_mqtt = TitaniumMqtt(self._client_middleware)
         self._middleware = middleware
         self._command_handler_thread = Thread(target = self.threaded_function)
+        runtime_metrics.add_source(self.LISTENER_NAME, self.get_metrics)
     
     def run(self):
         self._logger.info("Modules Manager start")
@@ -19,12 +31,21 @@ class ModulesManager:
         self._command_handler_thread.start()
 
     def join(self):
-        self._finish = True
         self._titanium_mqtt.stop()
+        self._client_middleware.stop()
         self._command_handler_thread.join()
 
+    def wait(self):
+        self._command_handler_thread.join()
+
+    def get_metrics(self):
+        return {
+            **self._client_middleware.get_metrics(),
+            "translation": self._titanium_mqtt.get_translation_stats(),
+            "ingestFilter": self._titanium_mqtt.get_ingest_filter_stats(),
+            "ingestMembers": self._titanium_mqtt.get_ingest_stats(),
+        }
+
     def threaded_function(self):
-        while not self._finish:
-            self._client_middleware.run_middleware_update()
-            sleep(0.1)
+        self._client_middleware.run_middleware_loop()
 
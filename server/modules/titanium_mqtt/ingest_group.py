@@ -0,0 +1,192 @@
+import multiprocessing
+import queue
+import threading
+import time
+from typing import Any, Callable
+
+from support.logger import Logger
+
+
+class IngestMode:
+    THREADS = "threads"
+    PROCESSES = "processes"
+
+
+# Messages a worker process forwards per put on the shared queue
+_FORWARD_BATCH_SIZE = 256
+
+
+def get_shared_subscription(topic_filter: str, group: str) -> str:
+    return f"$share/{group}/{topic_filter}"
+
+
+def _run_member_process(index: int, client_factory: Callable[[], Any], host: str, port: int,
+                        topics: list[tuple[str, int]], outbox, stop_event):
+    """
+    Worker process: one MQTT connection whose messages are forwarded to the
+    parent in batches of (topic, payload, received_at).
+    """
+    logger = Logger()
+    received = queue.Queue()
+
+    def on_connect(client, _userdata, _flags, _rc):
+        client.subscribe(topics)
+
+    def on_message(_client, _userdata, msg):
+        received.put((msg.topic, msg.payload, time.monotonic()))
+
+    client = client_factory()
+    client.on_connect = on_connect
+    client.on_message = on_message
+    try:
+        # connect_async leaves the first connection and every reconnect to the loop thread
+        client.connect_async(host, port, 60)
+        client.loop_start()
+    except Exception as e:
+        logger.error(f"MqttIngestGroup::_run_member_process: member {index} failed to start: {e}")
+        return
+
+    while True:
+        try:
+            batch = [received.get(timeout=0.1)]
+        except queue.Empty:
+            if stop_event.is_set():
+                break
+            continue
+        while len(batch) < _FORWARD_BATCH_SIZE:
+            try:
+                batch.append(received.get_nowait())
+            except queue.Empty:
+                break
+        outbox.put((index, batch))
+
+    client.loop_stop()
+    client.disconnect()
+
+
+class MqttIngestGroup:
+    """
+    Extra MQTT connections joining the shared subscription of TitaniumMqtt,
+    so the broker spreads the gateway traffic over several network loops.
+
+    In thread mode every member is a client of this process whose messages
+    go straight to on_message. In process mode every member runs in a
+    spawned process and forwards what it receives to a collector thread of
+    this process, which hands it to on_received(topic, payload, received_at).
+    Processes are spawned, not forked, since the group starts while the
+    server already runs other threads, so client_factory must be picklable
+    (e.g. paho.mqtt.client.Client).
+
+    Messages of one connection keep their order up to on_received, so the
+    order of a gateway is kept as long as the broker sends the gateway to a
+    single member (hash by topic or client, e.g. EMQX hash_topic). With a
+    round robin broker the reports of one gateway may be reordered between
+    connections, see MQTT_REORDER_TOLERANCE.
+    """
+
+    def __init__(self, client_factory: Callable[[], Any], topics: list[tuple[str, int]],
+                 on_message: Callable[[Any, Any, Any], None],
+                 on_received: Callable[[str, bytes, float], None],
+                 members: int = 1, mode: str = IngestMode.THREADS,
+                 host: str = "localhost", port: int = 1883):
+        if members < 1:
+            raise ValueError(
+                "MqttIngestGroup::__init__: at least one member is needed")
+        if mode not in (IngestMode.THREADS, IngestMode.PROCESSES):
+            raise ValueError(
+                f"MqttIngestGroup::__init__: unknown mode {mode}")
+        self._logger = Logger()
+        self._client_factory = client_factory
+        self._topics = topics
+        self._on_message = on_message
+        self._on_received = on_received
+        self._members_count = members
+        self._mode = mode
+        self._host = host
+        self._port = port
+
+        self._clients = []
+        self._processes = []
+        self._outbox = None
+        self._stop_event = None
+        self._collector = None
+        self._stats_lock = threading.Lock()
+        self._received = [0] * members
+
+    @property
+    def members(self) -> int:
+        return self._members_count
+
+    def start(self):
+        if self._mode == IngestMode.PROCESSES:
+            # A fork would copy locks held by the other threads of this process
+            context = multiprocessing.get_context("spawn")
+            self._outbox = context.Queue()
+            self._stop_event = context.Event()
+            for index in range(self._members_count):
+                process = context.Process(
+                    target=_run_member_process, daemon=True, name=f"mqtt-ingest-{index}",
+                    args=(index, self._client_factory, self._host, self._port, self._topics,
+                          self._outbox, self._stop_event))
+                self._processes.append(process)
+                process.start()
+            self._collector = threading.Thread(
+                target=self._collect, daemon=True, name="mqtt-ingest-collector")
+            self._collector.start()
+            return
+
+        for index in range(self._members_count):
+            client = self._client_factory()
+            client.on_connect = self._on_member_connect
+            client.on_message = self._create_member_callback(index)
+            client.connect_async(self._host, self._port, 60)
+            client.loop_start()
+            self._clients.append(client)
+
+    def _on_member_connect(self, client, _userdata, _flags, rc):
+        self._logger.info(f"MqttIngestGroup: member connected with result code {rc}")
+        client.subscribe(self._topics)
+
+    def _create_member_callback(self, index: int):
+        def on_message(client, userdata, msg):
+            with self._stats_lock:
+                self._received[index] += 1
+            self._on_message(client, userdata, msg)
+        return on_message
+
+    def _collect(self):
+        while True:
+            item = self._outbox.get()
+            if item is None:
+                break
+            index, batch = item
+            with self._stats_lock:
+                self._received[index] += len(batch)
+            for topic, payload, received_at in batch:
+                try:
+                    self._on_received(topic, payload, received_at)
+                except Exception as e:
+                    self._logger.error(
+                        f"MqttIngestGroup::_collect: failed to queue {topic} from member {index}: {e}")
+
+    def get_stats(self) -> list[dict[str, int | str]]:
+        with self._stats_lock:
+            return [{"member": index, "mode": self._mode, "received": received}
+                    for index, received in enumerate(self._received)]
+
+    def stop(self, timeout: float = 5.0):
+        for client in self._clients:
+            client.loop_stop()
+            client.disconnect()
+        self._clients = []
+
+        if self._stop_event is not None:
+            self._stop_event.set()
+        for process in self._processes:
+            # Members flush what they received before exiting
+            process.join(timeout)
+        self._processes = []
+        if self._collector is not None:
+            self._outbox.put(None)
+            self._collector.join(timeout)
+            self._collector = None
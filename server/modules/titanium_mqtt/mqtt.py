@@ -3,13 +3,18 @@ import threading
 import queue
 import os
 import time
-from typing import Any
+from typing import Any, Callable
 import paho.mqtt.client as mqtt
 
+from modules.titanium_mqtt.ingest_group import IngestMode, MqttIngestGroup, get_shared_subscription
+from modules.titanium_mqtt.report_deduplicator import ReportDeduplicator
+from modules.titanium_mqtt.traffic_recorder import Compression, TrafficRecorder
+from modules.titanium_mqtt.translation_pool import TranslationMode, TranslationWorkerPool
 from modules.titanium_mqtt.translators.io_cloud_api import IoCloudApiTranslator
 from modules.titanium_mqtt.translators.payload_model import MqttErrorModel, MqttPayloadModel
 from middleware.client_middleware import ClientMiddleware
 from modules.titanium_mqtt.mqtt_commands import MqttCommands
+from support.ingest_latency import IngestStage, ingest_latency
 from support.logger import Logger
 from .mqtt_helper import MqttHelper
 
@@ -25,13 +30,46 @@ GATEWAY_CONFIG_DIR = "titaniumGatewaysConfigs"
 # Get MQTT connection details from environment variables
 MQTT_SERVER = os.getenv('MQTT_HOST', 'localhost')
 MQTT_PORT = int(os.getenv('MQTT_PORT', '1883'))
+# Most messages translated and published as one batch per wakeup
+MQTT_BATCH_SIZE = int(os.getenv('MQTT_BATCH_SIZE', '256'))
+# 0 translates on the message handler thread, more shards the gateways between workers
+MQTT_TRANSLATION_WORKERS = int(os.getenv('MQTT_TRANSLATION_WORKERS', '0'))
+MQTT_TRANSLATION_MODE = os.getenv('MQTT_TRANSLATION_MODE', TranslationMode.THREADS)
+# Reports remembered per gateway to drop retransmissions, 0 disables the filter
+MQTT_DEDUP_WINDOW = int(os.getenv('MQTT_DEDUP_WINDOW', '64'))
+# Seconds a report may be older than the newest one of its gateway and still be accepted
+MQTT_REORDER_TOLERANCE = float(os.getenv('MQTT_REORDER_TOLERANCE', '0'))
+# Seconds behind the newest report after which the gateway clock is considered reset
+MQTT_CLOCK_RESET = float(os.getenv('MQTT_CLOCK_RESET', '3600'))
+# Records every received message to this file when set, see benchmarks.mqtt_replay
+MQTT_RECORD_FILE = os.getenv('MQTT_RECORD_FILE', '')
+MQTT_RECORD_COMPRESSION = os.getenv('MQTT_RECORD_COMPRESSION', Compression.NONE)
+# Connections sharing the subscription through $share/<MQTT_SHARE_GROUP>/, 1 keeps a plain subscription
+MQTT_INGEST_CLIENTS = int(os.getenv('MQTT_INGEST_CLIENTS', '1'))
+MQTT_INGEST_MODE = os.getenv('MQTT_INGEST_MODE', IngestMode.THREADS)
+MQTT_SHARE_GROUP = os.getenv('MQTT_SHARE_GROUP', 'titanium')
+
+# Put on the read queue by stop() to wake the handler thread
+_STOP_READING = object()
+
+
+class _ReceivedMessage:
+    __slots__ = ("topic", "payload", "received_at")
+
+    def __init__(self, topic: str, payload: bytes, received_at: float | None):
+        self.topic = topic
+        self.payload = payload
+        self.received_at = received_at
 
 
 class TitaniumMqtt:
     _client: mqtt.Client
 
-    def __init__(self, middleware: ClientMiddleware):
+    def __init__(self, middleware: ClientMiddleware, client_factory: Callable[[], mqtt.Client] = mqtt.Client,
+                 ingest_clients: int = MQTT_INGEST_CLIENTS):
         self._logger = Logger()
+        # Builds the paho client, replaced by a broker stand-in in load tests
+        self._client_factory = client_factory
         self._subscribe_topic_list = SUBSCRIBE_TOPIC_LIST
         self._publish_topics_list = PUBLISH_TOPIC_LIST
         self._last_system_request_time = 0
@@ -45,7 +83,29 @@ class TitaniumMqtt:
         self._translator.initialize()
         self.initialize_commands()
 
+        self._client = None
         self._read_queue = queue.Queue()
+        self._recorder = None
+        if MQTT_RECORD_FILE:
+            self._recorder = TrafficRecorder(
+                MQTT_RECORD_FILE, MQTT_RECORD_COMPRESSION)
+        self._batch_size = max(1, MQTT_BATCH_SIZE)
+        self._deduplicator = None
+        if MQTT_DEDUP_WINDOW > 0:
+            self._deduplicator = ReportDeduplicator(
+                MQTT_DEDUP_WINDOW, MQTT_REORDER_TOLERANCE, MQTT_CLOCK_RESET)
+        self._ingest_group = None
+        if ingest_clients > 1:
+            self._subscribe_topic_list = [(get_shared_subscription(topic, MQTT_SHARE_GROUP), qos)
+                                          for topic, qos in SUBSCRIBE_TOPIC_LIST]
+            # The main client is the first member of the group
+            self._ingest_group = MqttIngestGroup(
+                client_factory, self._subscribe_topic_list, self.on_message, self._receive,
+                ingest_clients - 1, MQTT_INGEST_MODE, MQTT_SERVER, MQTT_PORT)
+        self._translation_pool = None
+        if MQTT_TRANSLATION_WORKERS > 0:
+            self._translation_pool = TranslationWorkerPool(
+                IoCloudApiTranslator, self._publish_translated, MQTT_TRANSLATION_WORKERS, MQTT_TRANSLATION_MODE)
 
         self._command_handler = threading.Thread(
             target=self.handle_incoming_messages, daemon=True
@@ -62,6 +122,8 @@ class TitaniumMqtt:
     def calibrate_command(self, command):
         command_data = command["data"]
         self._translator.update_calibration(command_data)
+        if self._translation_pool is not None:
+            self._translation_pool.update_calibration(command_data)
 
         # if not self._client or not self._client.is_connected():
         #     self._middleware.send_command_answear(
@@ -83,6 +145,9 @@ class TitaniumMqtt:
         #     True, "sucess", command["requestId"])
 
     def send_system_request(self):
+        if self._client is None:
+            # Replaying without a broker
+            return
         topic = "iocloud/request/all/command"
         payload = {
             "command": 2,
@@ -113,8 +178,15 @@ class TitaniumMqtt:
             self.try_reconnect()
 
     def on_message(self, _c, _u, msg):
-        self._logger.debug(f"Received message: {msg.topic} {msg.payload}")
-        self._read_queue.put(msg)
+        self._receive(msg.topic, msg.payload, time.monotonic() if ingest_latency.enabled else None)
+
+    def _receive(self, topic: str, payload: bytes, received_at: float | None):
+        """Queues a message of any connection, from its network thread or the ingest collector"""
+        self._logger.debug(f"Received message: {topic} {payload}")
+        if self._recorder is not None:
+            self._recorder.record(topic, payload)
+        # paho messages are slotted, the arrival stamp travels in a message of ours
+        self._read_queue.put(_ReceivedMessage(topic, payload, received_at))
 
     def try_reconnect(self):
         """Attempt to reconnect with exponential backoff"""
@@ -134,7 +206,9 @@ class TitaniumMqtt:
                 continue
 
     def run(self):
-        self._client = mqtt.Client()
+        if self._ingest_group is not None:
+            self._ingest_group.start()
+        self._client = self._client_factory()
 
         user_data = {}
         user_data["subscribe_topics"] = self._subscribe_topic_list
@@ -146,44 +220,135 @@ class TitaniumMqtt:
         self._client.on_message = self.on_message
         try:
             self._client.connect(MQTT_SERVER, MQTT_PORT, 60)
-            self._messages_handler.start()
+            self.start_message_handling()
             self._client.loop_start()
         except Exception as e:
             self._logger.error(f"Error Connecting to Mqtt: {e}")
             # Start background reconnection attempts
             threading.Thread(target=self.try_reconnect, daemon=True).start()
 
+    def start_message_handling(self):
+        """Starts translating what arrives on the read queue, with or without a broker"""
+        if self._translation_pool is not None:
+            self._translation_pool.start()
+        self._messages_handler.start()
+
     def execute(self, command: Any):
         topic = self.get_topic_from_command(command.name)
         self._client.publish(topic, command.message)
 
     def handle_incoming_messages(self):
         while not self._end_thread:
+            messages = self._read_batch()
+            try:
+                self._handle_batch(messages)
+            except Exception as e:
+                # A failed batch is lost, the thread keeps serving the next ones
+                self._logger.error(
+                    f"Mqtt.handle_incoming_messages: Error handling {len(messages)} messages {e}"
+                )
+
+    def _handle_batch(self, messages: list[Any]):
+        if self._deduplicator is not None:
+            messages = [msg for msg in messages
+                        if self._deduplicator.accept_message(msg.topic, msg.payload)]
+            if not messages:
+                return
+        trace = ingest_latency.start_trace(messages)
+        if self._translation_pool is not None:
+            self._translation_pool.submit(messages, trace)
+            return
+        translated = self._translate_batch(messages)
+        if trace is not None:
+            trace["translated"] = time.monotonic()
+        self._publish_translated(translated, trace)
+
+    def _read_batch(self) -> list[Any]:
+        # Bloqueia até a primeira mensagem e depois esvazia a fila sem esperar
+        msg = self._read_queue.get()
+        messages = []
+        while msg is not _STOP_READING:
+            messages.append(msg)
+            if len(messages) >= self._batch_size:
+                break
             try:
                 msg = self._read_queue.get_nowait()
+            except queue.Empty:
+                break
+        return messages
+
+    def _translate_batch(self, messages: list[Any]) -> list[MqttPayloadModel]:
+        translated = []
+        for msg in messages:
+            try:
                 mqtt_message = self._translator.translate_incoming_message(
                     msg.topic, msg.payload
                 )
+                if mqtt_message:
+                    translated.append(mqtt_message)
+            except Exception as e:
+                self._logger.error(
+                    f"Mqtt.handle_incoming_messages: Error Parsing messages {e}"
+                )
+        return translated
 
+    def _publish_translated(self, translated: list[MqttPayloadModel], trace: dict[str, float] | None = None):
+        if trace is not None:
+            ingest_latency.record_interval(IngestStage.TRANSLATE, trace, "received", "translated")
+        statuses = []
+        for mqtt_message in translated:
+            try:
                 if isinstance(mqtt_message.data, MqttErrorModel) and mqtt_message.data.full_topic == "gateway-unknown-error":
                     if time.time() - self._last_system_request_time > 30:  # 1 minute
                         self.send_system_request()
                         self._last_system_request_time = time.time()
-                elif mqtt_message:
-                    self._middleware.send_status(
-                        mqtt_message.data.full_topic, mqtt_message.data)
-            except queue.Empty:
-                pass
+                else:
+                    statuses.append({"statusName": mqtt_message.data.full_topic,
+                                     "data": mqtt_message.data})
             except Exception as e:
                 self._logger.error(
                     f"Mqtt.handle_incoming_messages: Error Parsing messages {e}"
                 )
 
+        if not statuses:
+            return
+        try:
+            self._middleware.send_status_array(statuses, trace)
+        except Exception as e:
+            self._logger.error(
+                f"Mqtt.handle_incoming_messages: Error publishing messages {e}"
+            )
+
+    def get_ingest_filter_stats(self) -> dict[str, int]:
+        if self._deduplicator is None:
+            return {}
+        return self._deduplicator.get_stats()
+
+    def get_ingest_stats(self) -> list[dict[str, int | str]]:
+        """Messages received by the extra connections of the shared subscription"""
+        if self._ingest_group is None:
+            return []
+        return self._ingest_group.get_stats()
+
+    def get_translation_stats(self) -> list[dict[str, float | int]]:
+        if self._translation_pool is None:
+            return []
+        return self._translation_pool.get_stats()
+
     def stop(self):
         self._end_thread = True
-        self._client.loop_stop()
-        self._client.disconnect()
-        self._messages_handler.join()
+        self._read_queue.put(_STOP_READING)
+        if self._client is not None:
+            self._client.loop_stop()
+            self._client.disconnect()
+        if self._ingest_group is not None:
+            self._ingest_group.stop()
+        if self._messages_handler.is_alive():
+            self._messages_handler.join()
+        if self._translation_pool is not None:
+            self._translation_pool.stop()
+        if self._recorder is not None:
+            self._recorder.close()
 
     def get_topic_from_command(self, command):
         if command in self._publish_topics_list:
@@ -0,0 +1,109 @@
+from collections import deque
+import re
+import threading
+
+from modules.titanium_mqtt.translation_pool import get_gateway_from_topic
+from modules.titanium_mqtt.translators.payload_model import MqttActions
+
+# Only the top-level timestamp is read, the rest of the report is not decoded
+_TIMESTAMP = re.compile(rb'"timestamp"\s*:\s*(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)')
+
+
+def extract_report_timestamp(payload: bytes) -> float | None:
+    match = _TIMESTAMP.search(payload)
+    return float(match.group(1)) if match else None
+
+
+class _GatewayWindow:
+    def __init__(self, size: int):
+        self.watermark = None
+        self.order = deque()
+        self.keys = set()
+        self.size = size
+
+    def add(self, key):
+        self.order.append(key)
+        self.keys.add(key)
+        if len(self.order) > self.size:
+            self.keys.discard(self.order.popleft())
+
+
+class ReportDeduplicator:
+    """
+    Drops gateway reports that were already seen or that are older than what
+    the gateway already sent, before they are translated.
+
+    Every gateway keeps a watermark, the newest report timestamp accepted.
+    Reports older than watermark - tolerance are stale. Reports within that
+    tolerance are accepted unless the same (timestamp, payload) is in the
+    gateway window of the last window_size reports, which catches the
+    retransmissions after a reconnect. A report more than clock_reset seconds
+    behind the watermark means the gateway clock was reset: the watermark
+    restarts from it instead of dropping the gateway forever.
+
+    Messages that are not reports, or whose timestamp cannot be read, are
+    always accepted and left to the translator.
+    """
+
+    def __init__(self, window_size: int = 64, tolerance: float = 0.0, clock_reset: float = 3600.0):
+        self._window_size = window_size
+        self._tolerance = tolerance
+        self._clock_reset = clock_reset
+        self._gateways: dict[str, _GatewayWindow] = {}
+        self._lock = threading.Lock()
+        self._accepted = 0
+        self._duplicates = 0
+        self._stale = 0
+        self._watermark_resets = 0
+
+    def accept_message(self, topic: str, payload: bytes) -> bool:
+        if topic.rsplit("/", 1)[-1] != MqttActions.REPORT.value:
+            return True
+        timestamp = extract_report_timestamp(payload)
+        if timestamp is None or timestamp <= 0:
+            # Invalid timestamps are reported by the translator
+            return True
+        return self.accept(get_gateway_from_topic(topic), timestamp, payload)
+
+    def accept(self, gateway: str, timestamp: float, payload: bytes) -> bool:
+        with self._lock:
+            window = self._gateways.get(gateway)
+            if window is None:
+                window = _GatewayWindow(self._window_size)
+                self._gateways[gateway] = window
+
+            watermark = window.watermark
+            if watermark is not None and timestamp < watermark - self._clock_reset:
+                window.watermark = None
+                window.order.clear()
+                window.keys.clear()
+                self._watermark_resets += 1
+            elif watermark is not None and timestamp < watermark - self._tolerance:
+                self._stale += 1
+                return False
+
+            key = (timestamp, hash(payload))
+            if key in window.keys:
+                self._duplicates += 1
+                return False
+
+            window.add(key)
+            if window.watermark is None or timestamp > window.watermark:
+                window.watermark = timestamp
+            self._accepted += 1
+            return True
+
+    def get_watermark(self, gateway: str) -> float | None:
+        with self._lock:
+            window = self._gateways.get(gateway)
+            return window.watermark if window else None
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "accepted": self._accepted,
+                "duplicates": self._duplicates,
+                "stale": self._stale,
+                "watermarkResets": self._watermark_resets,
+                "gateways": len(self._gateways),
+            }
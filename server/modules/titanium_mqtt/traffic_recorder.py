@@ -0,0 +1,95 @@
+"""
+Recording of the raw MQTT traffic, to replay production load offline.
+
+File layout: the RECORD_MAGIC header, then one frame per message: arrival
+time (epoch float64), topic length (uint16) and payload length (uint32),
+little endian, followed by the topic (utf-8) and the payload bytes. With gzip
+compression the same stream is gzip compressed; reopening a recording
+appends a gzip member, which readers see as one stream.
+"""
+import gzip
+import os
+import struct
+import threading
+import time
+from typing import Iterator
+
+RECORD_MAGIC = b"TMQR\x01"
+_FRAME = struct.Struct("<dHI")
+_GZIP_MAGIC = b"\x1f\x8b"
+
+
+class Compression:
+    NONE = "none"
+    GZIP = "gzip"
+
+
+class TrafficRecorder:
+    """Appends messages to a recording, safe to call from the MQTT network thread"""
+
+    def __init__(self, path: str, compression: str = Compression.NONE):
+        if compression not in (Compression.NONE, Compression.GZIP):
+            raise ValueError(
+                f"TrafficRecorder::__init__: unknown compression {compression}")
+        self._path = path
+        self._lock = threading.Lock()
+        self._frames = 0
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        if compression == Compression.GZIP:
+            self._file = gzip.open(path, "ab")
+        else:
+            self._file = open(path, "ab")
+        if is_new:
+            self._file.write(RECORD_MAGIC)
+
+    @property
+    def frames(self) -> int:
+        return self._frames
+
+    def record(self, topic: str, payload: bytes, arrival_time: float | None = None):
+        encoded_topic = topic.encode()
+        frame = _FRAME.pack(time.time() if arrival_time is None else arrival_time,
+                            len(encoded_topic), len(payload))
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.write(frame + encoded_topic + payload)
+            self._frames += 1
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def read_traffic(path: str) -> Iterator[tuple[float, str, bytes]]:
+    """
+    Yields (arrival_time, topic, payload) in recording order. A frame cut
+    short by a crash while recording ends the recording.
+    """
+    with open(path, "rb") as raw_file:
+        compressed = raw_file.read(2) == _GZIP_MAGIC
+
+    opener = gzip.open if compressed else open
+    with opener(path, "rb") as record_file:
+        if record_file.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+            raise ValueError(f"read_traffic: {path} is not a traffic recording")
+        while True:
+            try:
+                header = record_file.read(_FRAME.size)
+                if len(header) < _FRAME.size:
+                    return
+                arrival_time, topic_length, payload_length = _FRAME.unpack(header)
+                body = record_file.read(topic_length + payload_length)
+            except EOFError:
+                # gzip stream without its end marker
+                return
+            if len(body) < topic_length + payload_length:
+                return
+            yield arrival_time, body[:topic_length].decode(), body[topic_length:]
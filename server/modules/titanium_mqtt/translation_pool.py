@@ -0,0 +1,219 @@
+from functools import partial
+import multiprocessing
+import queue
+import threading
+import time
+import zlib
+from typing import Any, Callable
+
+from modules.titanium_mqtt.translators.payload_model import MqttPayloadModel
+from modules.titanium_mqtt.translators.translator_model import PayloadTranslator
+from support.logger import Logger
+
+
+class TranslationMode:
+    THREADS = "threads"
+    PROCESSES = "processes"
+
+
+# Item kinds on a worker inbox
+_MESSAGES = "messages"
+_CALIBRATION = "calibration"
+
+
+def get_gateway_from_topic(topic: str) -> str:
+    # iocloud/response/<gateway>/...
+    parts = topic.split("/")
+    return parts[2] if len(parts) > 2 else topic
+
+
+def _run_worker(index: int, translator_factory: Callable[[], PayloadTranslator], inbox, report):
+    """
+    Worker loop, shared by threads and processes. Calibration updates travel
+    on the same inbox as messages so they apply in order with them.
+    """
+    logger = Logger()
+    translator = translator_factory()
+    translator.initialize()
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+
+        kind, body, trace = item
+        if kind == _CALIBRATION:
+            translator.update_calibration(body)
+            continue
+
+        translated = []
+        errors = 0
+        for topic, payload in body:
+            try:
+                mqtt_message = translator.translate_incoming_message(
+                    topic, payload)
+                if mqtt_message:
+                    translated.append(mqtt_message)
+            except Exception as e:
+                errors += 1
+                logger.error(
+                    f"TranslationWorkerPool::_run_worker: worker {index} failed to translate {topic}: {e}")
+        if trace is not None:
+            trace = {**trace, "translated": time.monotonic()}
+        report(index, translated, len(body), errors, trace)
+
+
+def _put_result(results, index, translated, processed, errors, trace):
+    """Worker process report, sent back to the collector thread of the pool"""
+    results.put((index, translated, processed, errors, trace))
+
+
+class TranslationWorkerPool:
+    """
+    Translates MQTT messages on N workers sharded by the gateway in the topic.
+
+    Every gateway always lands on the same worker, so its messages are
+    translated and published in arrival order while different gateways are
+    translated in parallel. Threads share the GIL and only help when the
+    translation releases it, processes scale with the cores. Processes are
+    spawned, not forked, because the pool starts once the server already
+    runs other threads: translator_factory must be picklable (a class or a
+    module level function).
+
+    on_translated is called with the translated messages of one batch of one
+    worker and the ingest trace of the batch (see support.ingest_latency),
+    from the worker thread or, in process mode, from the thread that collects
+    the worker results.
+    """
+
+    def __init__(self, translator_factory: Callable[[], PayloadTranslator],
+                 on_translated: Callable[[list[MqttPayloadModel], dict[str, float] | None], None],
+                 workers: int = 2, mode: str = TranslationMode.THREADS):
+        if workers < 1:
+            raise ValueError(
+                "TranslationWorkerPool::__init__: at least one worker is needed")
+        if mode not in (TranslationMode.THREADS, TranslationMode.PROCESSES):
+            raise ValueError(
+                f"TranslationWorkerPool::__init__: unknown mode {mode}")
+
+        self._logger = Logger()
+        self._translator_factory = translator_factory
+        self._on_translated = on_translated
+        self._mode = mode
+        self._workers_count = workers
+        self._workers = []
+        self._inboxes = []
+        self._results = None
+        self._collector = None
+        self._started_at = None
+
+        self._stats_lock = threading.Lock()
+        self._submitted = [0] * workers
+        self._translated = [0] * workers
+        self._errors = [0] * workers
+        self._batches = [0] * workers
+        self._gateways: list[set[str]] = [set() for _ in range(workers)]
+
+    @property
+    def workers(self) -> int:
+        return self._workers_count
+
+    def get_worker_index(self, gateway: str) -> int:
+        # crc32 instead of hash() so a gateway keeps its worker between runs
+        return zlib.crc32(gateway.encode()) % self._workers_count
+
+    def start(self):
+        self._started_at = time.perf_counter()
+        if self._mode == TranslationMode.PROCESSES:
+            # A fork would copy locks held by the other threads of this process
+            context = multiprocessing.get_context("spawn")
+            self._results = context.Queue()
+            for index in range(self._workers_count):
+                inbox = context.Queue()
+                worker = context.Process(target=_run_worker, daemon=True, name=f"mqtt-translation-{index}",
+                                         args=(index, self._translator_factory, inbox,
+                                               partial(_put_result, self._results)))
+                self._inboxes.append(inbox)
+                self._workers.append(worker)
+            self._collector = threading.Thread(
+                target=self._collect_results, daemon=True, name="mqtt-translation-results")
+            self._collector.start()
+        else:
+            for index in range(self._workers_count):
+                inbox = queue.Queue()
+                worker = threading.Thread(target=_run_worker, daemon=True, name=f"mqtt-translation-{index}",
+                                          args=(index, self._translator_factory, inbox, self._on_worker_batch))
+                self._inboxes.append(inbox)
+                self._workers.append(worker)
+
+        for worker in self._workers:
+            worker.start()
+
+    def _collect_results(self):
+        while True:
+            result = self._results.get()
+            if result is None:
+                break
+            self._on_worker_batch(*result)
+
+    def _on_worker_batch(self, index: int, translated: list[MqttPayloadModel], processed: int, errors: int,
+                         trace: dict[str, float] | None = None):
+        with self._stats_lock:
+            self._translated[index] += processed - errors
+            self._errors[index] += errors
+            self._batches[index] += 1
+
+        if translated:
+            try:
+                self._on_translated(translated, trace)
+            except Exception as e:
+                self._logger.error(
+                    f"TranslationWorkerPool::_on_worker_batch: worker {index} failed to publish: {e}")
+
+    def submit(self, messages: list[Any], trace: dict[str, float] | None = None):
+        """
+        Splits messages (anything with topic and payload) between the
+        workers, keeping their order. Every shard carries trace.
+        """
+        shards: dict[int, list[tuple[str, bytes]]] = {}
+        gateways: dict[int, set[str]] = {}
+        for msg in messages:
+            gateway = get_gateway_from_topic(msg.topic)
+            index = self.get_worker_index(gateway)
+            shards.setdefault(index, []).append((msg.topic, msg.payload))
+            gateways.setdefault(index, set()).add(gateway)
+
+        with self._stats_lock:
+            for index, shard in shards.items():
+                self._submitted[index] += len(shard)
+                self._gateways[index].update(gateways[index])
+        for index, shard in shards.items():
+            self._inboxes[index].put((_MESSAGES, shard, trace))
+
+    def update_calibration(self, calibration_info: list[Any]):
+        for inbox in self._inboxes:
+            inbox.put((_CALIBRATION, calibration_info, None))
+
+    def get_stats(self) -> list[dict[str, float | int]]:
+        elapsed = time.perf_counter() - self._started_at if self._started_at else 0.0
+        with self._stats_lock:
+            return [{
+                "worker": index,
+                "depth": self._submitted[index] - self._translated[index] - self._errors[index],
+                "submitted": self._submitted[index],
+                "translated": self._translated[index],
+                "errors": self._errors[index],
+                "batches": self._batches[index],
+                "gateways": len(self._gateways[index]),
+                "messagesPerSecond": self._translated[index] / elapsed if elapsed else 0.0,
+            } for index in range(self._workers_count)]
+
+    def stop(self, timeout: float | None = None):
+        """Translates what was already submitted and stops the workers"""
+        for inbox in self._inboxes:
+            inbox.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        if self._collector is not None:
+            # Workers flushed their results before exiting
+            self._results.put(None)
+            self._collector.join(timeout)
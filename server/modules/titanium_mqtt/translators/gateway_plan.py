@@ -0,0 +1,64 @@
+import sys
+from typing import Any
+
+from modules.titanium_mqtt.mqtt_helper import MqttHelper
+
+
+class SensorKind:
+    # Kinds the report translation needs to tell apart, the others are just readings
+    POWER_FACTOR = "powerFactor"
+    CURRENT = "current"
+    TENSION = "tension"
+
+
+class GatewayTranslationPlan:
+    """
+    Everything a gateway report needs per sensor index, compiled once from
+    the gateway system message and the calibration: the full topic of the
+    reading (interned), its sensor kind, gain and offset.
+
+    Indexes without configuration have configured False; configured indexes
+    whose unit was not recognized have a None topic.
+    """
+
+    def __init__(self, gateway: str, sensor_types: dict[str, str | None],
+                 calibration: dict[str, dict[str, float]]):
+        self.gateway = gateway
+        self.status_topic = sys.intern(
+            MqttHelper.get_topic_from_mosquitto_obj_report(gateway, "status", "*"))
+
+        indexes = {}
+        for index_str, sensor_type in sensor_types.items():
+            try:
+                indexes[int(index_str)] = (index_str, sensor_type)
+            except ValueError:
+                continue
+        size = max(indexes) + 1 if indexes else 0
+
+        self.configured = [False] * size
+        self.topics: list[str | None] = [None] * size
+        self.kinds: list[str | None] = [None] * size
+        self.gains = [1] * size
+        self.offsets = [0] * size
+        # Array form of the plan, built on first use by the vectorized calibration
+        self.vectors = None
+        for index, (index_str, sensor_type) in indexes.items():
+            self.configured[index] = True
+            if sensor_type is None:
+                continue
+            self.topics[index] = sys.intern(MqttHelper.get_topic_from_mosquitto_obj_report(
+                gateway, sensor_type, index_str))
+            self.kinds[index] = sensor_type
+            sensor_calibration = calibration.get(f"{gateway}_{index_str}")
+            if sensor_calibration is not None:
+                self.gains[index] = sensor_calibration["gain"]
+                self.offsets[index] = sensor_calibration["offset"]
+
+    def __len__(self):
+        return len(self.configured)
+
+    def is_configured(self, index: int) -> bool:
+        return index < len(self.configured) and self.configured[index]
+
+    def calibrate(self, index: int, value: Any):
+        return value * self.gains[index] + self.offsets[index]
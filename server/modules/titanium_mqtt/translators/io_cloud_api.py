@@ -1,6 +1,9 @@
 from datetime import datetime
 from typing import Any
+from modules.titanium_mqtt.translators.gateway_plan import GatewayTranslationPlan, SensorKind
+from modules.titanium_mqtt.translators.payload_decoder import ReportColumns, create_payload_decoder
 from modules.titanium_mqtt.translators.translator_model import PayloadTranslator
+from modules.titanium_mqtt.translators.vectorized_calibration import NUMPY_AVAILABLE, calibrate_report
 from modules.titanium_mqtt.translators.payload_model import (
     MqttActions,
     MqttCallibrationModel,
@@ -14,7 +17,12 @@ from modules.titanium_mqtt.translators.payload_model import (
 )
 from modules.titanium_mqtt.mqtt_helper import MqttHelper
 from support.logger import Logger
-import json
+import os
+
+# Calibrates whole reports with NumPy when it is installed. Off by default:
+# below a few hundred sensors per report the scalar plan is faster, see
+# benchmarks.calibration_benchmark
+VECTORIZED_CALIBRATION = os.getenv('MQTT_VECTORIZED_CALIBRATION', 'false').lower() == 'true'
 
 # topic: iocloud/response/1C69209DFC08/sensor/report
 # payload: {timestamp, readings: [{value, active}]}
@@ -25,8 +33,27 @@ class IoCloudApiTranslator(PayloadTranslator):
     _gateways_mapping: dict[str, dict[str, str]]
     _calibration_mapping: dict[str, {"gain": float, "offset": float}] = {}
 
+    def __init__(self):
+        # Compiled from _gateways_mapping and _calibration_mapping, see _compile_plan
+        self._plans: dict[str, GatewayTranslationPlan] = {}
+        self._vectorized = VECTORIZED_CALIBRATION and NUMPY_AVAILABLE
+        self._decoder = create_payload_decoder()
+
     def initialize(self):
         self._gateways_mapping = {}
+        self._plans = {}
+
+    def _compile_plan(self, gateway: str) -> GatewayTranslationPlan:
+        plan = GatewayTranslationPlan(
+            gateway, self._gateways_mapping[gateway], self._calibration_mapping)
+        self._plans[gateway] = plan
+        return plan
+
+    def _get_plan(self, gateway: str) -> GatewayTranslationPlan | None:
+        plan = self._plans.get(gateway)
+        if plan is None and gateway in self._gateways_mapping:
+            plan = self._compile_plan(gateway)
+        return plan
 
     def _is_valid_action(self, value: str) -> bool:
         return value in (action.value for action in MqttActions)
@@ -84,58 +111,49 @@ class IoCloudApiTranslator(PayloadTranslator):
         return type_of_sensor
 
     def _create_reading(self, gateway, timestamp, reading_json, index_obj):
-        reading: MqttReadingModel = MqttReadingModel()
-        type_of_sensor = ""
-
         index = index_obj["current_index"]
         index_obj["current_index"] += 1
 
-        index_str = str(index)
-
-        if gateway not in self._gateways_mapping:
+        plan = self._get_plan(gateway)
+        if plan is None:
             self.logger.error(
                 f"IoCloudApiTranslator::_create_reading: gateway {gateway} not found in mapping"
             )
             return None
+        return self._create_planned_reading(
+            plan, index, timestamp, reading_json["value"], reading_json["active"])
 
-        if index_str not in self._gateways_mapping[gateway]:
+    def _create_planned_reading(self, plan: GatewayTranslationPlan, index: int, timestamp, value, active):
+        if not plan.is_configured(index):
             self.logger.error(
-                f"IoCloudApiTranslator::_create_reading: gateway {gateway} dont have config for sensor {index_str}"
+                f"IoCloudApiTranslator::_create_reading: gateway {plan.gateway} dont have config for sensor {index}"
             )
             return None
 
-        type_of_sensor = self._gateways_mapping[gateway][index_str]
-        if (type_of_sensor == None):
+        full_topic = plan.topics[index]
+        if full_topic is None:
             return None
 
-        reading.full_topic = MqttHelper.get_topic_from_mosquitto_obj_report(
-            gateway, type_of_sensor, str(index)
-        )
-
-        offset = 0
-        gain = 1
-        calibration_key = f"{gateway}_{index_str}"
-        if calibration_key in self._calibration_mapping:
-            offset = self._calibration_mapping[calibration_key]["offset"]
-            gain = self._calibration_mapping[calibration_key]["gain"]
-
-        reading.value = reading_json["value"] * gain + offset
-        reading.timestamp = timestamp
-        reading.is_active = reading_json["active"]
-        return reading
+        return MqttReadingModel(full_topic, value * plan.gains[index] + plan.offsets[index],
+                                timestamp, active)
 
     def _read_sensor_report_message(self, gateway: str, message_json: Any):
+        # Decoders hand reports over as columns, other callers the decoded JSON
+        if isinstance(message_json, ReportColumns):
+            columns = message_json
+        else:
+            columns = ReportColumns.from_message(message_json)
 
-        if message_json["timestamp"] is None or message_json["timestamp"] == 0:
+        if columns.timestamp is None or columns.timestamp == 0:
             self.logger.error(
                 "IoCloudApiTranslator::_read_sensor_report_message: timestamp is invalid"
             )
             return []
 
-        timestamp = datetime.fromtimestamp(message_json["timestamp"])
-        index_obj = {"current_index": 0}
+        timestamp = datetime.fromtimestamp(columns.timestamp)
 
-        if gateway not in self._gateways_mapping:
+        plan = self._get_plan(gateway)
+        if plan is None:
             self.logger.error(
                 f"IoCloudApiTranslator::_read_sensor_report_message: gateway {gateway} not found in gateways mapping"
             )
@@ -145,27 +163,37 @@ class IoCloudApiTranslator(PayloadTranslator):
             error.message = f"Gateway {gateway} not found in gateways mapping"
             return error
 
-        gateway_reading = MqttGatewayReadingModel()
-        gateway_reading.full_topic = MqttHelper.get_topic_from_mosquitto_obj_report(
-            gateway, "status", "*"
-        )
+        if self._vectorized:
+            gateway_reading, unconfigured = calibrate_report(
+                plan, timestamp, columns)
+            if gateway_reading is not None:
+                if unconfigured:
+                    self.logger.error(
+                        f"IoCloudApiTranslator::_read_sensor_report_message: gateway {gateway} dont have config for sensors {unconfigured}"
+                    )
+                return gateway_reading
+
+        gateway_reading = MqttGatewayReadingModel(plan.status_topic)
         power_factor_reading = None
         current_reading = None
         tension_reading = None
-        for raw_reading in message_json["sensors"]:
-            reading = self._create_reading(
-                gateway, timestamp, raw_reading, index_obj)
+        kinds = plan.kinds
+        readings = gateway_reading.readings
+        for index, (value, active) in enumerate(zip(columns.values, columns.active)):
+            reading = self._create_planned_reading(
+                plan, index, timestamp, value, active)
             if reading is None:
                 continue
 
-            if ("powerFactor" in reading.full_topic):
+            kind = kinds[index]
+            if kind == SensorKind.POWER_FACTOR:
                 power_factor_reading = reading
-            elif ("current" in reading.full_topic):
+            elif kind == SensorKind.CURRENT:
                 current_reading = reading
-            elif ("tension" in reading.full_topic):
+            elif kind == SensorKind.TENSION:
                 tension_reading = reading
 
-            gateway_reading.readings.append(reading)
+            readings.append(reading)
 
         if (power_factor_reading is not None and
             current_reading is not None and
@@ -203,6 +231,8 @@ class IoCloudApiTranslator(PayloadTranslator):
             system_panel.gateway = message_json["device_id"]
             panels.append(system_panel)
 
+        self._compile_plan(message_json["device_id"])
+
         system_module = MqttSystemModel()
         system_module.gateway = system
         system_module.panels = panels
@@ -218,6 +248,10 @@ class IoCloudApiTranslator(PayloadTranslator):
                 "offset": calibration['offset']
             }
 
+        for gateway in {calibration['gateway'] for calibration in calibration_info}:
+            if gateway in self._gateways_mapping:
+                self._compile_plan(gateway)
+
     def translate_incoming_message(self, topic: str, payload):
         out_payload = MqttPayloadModel()
 
@@ -232,8 +266,6 @@ class IoCloudApiTranslator(PayloadTranslator):
             return None
 
         out_payload.action = action_str
-        decoded_message = payload.decode("utf-8")
-        message_json = json.loads(decoded_message)
 
         if action_str == MqttActions.REPORT.value:
             if not len(msg_split) == 5:
@@ -241,9 +273,12 @@ class IoCloudApiTranslator(PayloadTranslator):
                     f"IoCloudApiTranslator::translate_payload: mqtt topic {topic} not valid"
                 )
             out_payload.data = self._read_sensor_report_message(
-                msg_split[2], message_json
+                msg_split[2], self._decoder.decode_report(payload)
             )
-        elif action_str == MqttActions.COMMAND.value:
+            return out_payload
+
+        message_json = self._decoder.loads(payload)
+        if action_str == MqttActions.COMMAND.value:
             if not len(msg_split) == 4:
                 self.logger.error(
                     f"IoCloudApiTranslator::translate_payload: mqtt topic {topic} not valid"
@@ -0,0 +1,118 @@
+"""
+JSON decoding of the MQTT payloads.
+
+Every decoder parses the bytes payload directly, without decoding it to str
+first. The fastest parser installed is picked: msgspec (which also decodes
+reports straight into typed structs, with no dict per reading), then orjson,
+then the standard library. MQTT_JSON_DECODER forces one of them.
+"""
+import json
+import os
+from typing import Any
+
+from support.logger import Logger
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# auto, msgspec, orjson or json
+MQTT_JSON_DECODER = os.getenv('MQTT_JSON_DECODER', 'auto')
+
+
+class ReportColumns:
+    """Timestamp and per-sensor value and active columns of a sensor report"""
+
+    def __init__(self, timestamp: Any, values: list[Any], active: list[Any]):
+        self.timestamp = timestamp
+        self.values = values
+        self.active = active
+
+    def __len__(self):
+        return len(self.values)
+
+    @staticmethod
+    def from_message(message_json: dict[str, Any]) -> "ReportColumns":
+        sensors = message_json["sensors"]
+        return ReportColumns(message_json["timestamp"],
+                             [sensor["value"] for sensor in sensors],
+                             [sensor["active"] for sensor in sensors])
+
+
+class PayloadDecoder:
+    name = "json"
+
+    def loads(self, payload: bytes) -> Any:
+        # json.loads detects the encoding of bytes itself
+        return json.loads(payload)
+
+    def decode_report(self, payload: bytes) -> ReportColumns:
+        return ReportColumns.from_message(self.loads(payload))
+
+
+class OrjsonPayloadDecoder(PayloadDecoder):
+    name = "orjson"
+
+    def loads(self, payload: bytes) -> Any:
+        return orjson.loads(payload)
+
+
+if msgspec is not None:
+    class _SensorReading(msgspec.Struct, gc=False):
+        value: int | float
+        active: bool
+
+    class _SensorReport(msgspec.Struct, gc=False):
+        timestamp: int | float | None
+        sensors: list[_SensorReading]
+
+
+class MsgspecPayloadDecoder(PayloadDecoder):
+    """Decodes reports against their fixed shape, other payloads as plain JSON"""
+
+    name = "msgspec"
+
+    def __init__(self):
+        self._report_decoder = msgspec.json.Decoder(_SensorReport)
+
+    def loads(self, payload: bytes) -> Any:
+        return msgspec.json.decode(payload)
+
+    def decode_report(self, payload: bytes) -> ReportColumns:
+        try:
+            report = self._report_decoder.decode(payload)
+        except msgspec.ValidationError:
+            # Not the usual shape, the generic path reports what is wrong with it
+            return super().decode_report(payload)
+        sensors = report.sensors
+        return ReportColumns(report.timestamp,
+                             [sensor.value for sensor in sensors],
+                             [sensor.active for sensor in sensors])
+
+
+def get_available_decoders() -> dict[str, type[PayloadDecoder]]:
+    decoders = {}
+    if msgspec is not None:
+        decoders[MsgspecPayloadDecoder.name] = MsgspecPayloadDecoder
+    if orjson is not None:
+        decoders[OrjsonPayloadDecoder.name] = OrjsonPayloadDecoder
+    decoders[PayloadDecoder.name] = PayloadDecoder
+    return decoders
+
+
+def create_payload_decoder(name: str = MQTT_JSON_DECODER) -> PayloadDecoder:
+    decoders = get_available_decoders()
+    if name == "auto":
+        # Fastest first
+        return next(iter(decoders.values()))()
+    if name not in decoders:
+        Logger().warning(
+            f"payload_decoder::create_payload_decoder: decoder {name} not installed, using {PayloadDecoder.name}")
+        return PayloadDecoder()
+    return decoders[name]()
@@ -1,5 +1,8 @@
 from abc import ABC, abstractmethod
+import array
 import datetime
+import struct
+import sys
 from enum import Enum
 from typing import Any
 
@@ -12,6 +15,9 @@ class MqttActions(Enum):
 
 
 class MqttDataModel(ABC):
+    # Lets the hot-path models below be fully slotted
+    __slots__ = ()
+
     @abstractmethod
     def to_dict(self) -> dict[str:Any]:
         pass
@@ -87,11 +93,20 @@ class MqttCallibrationModel(MqttDataModel):
 
 
 class MqttReadingModel(MqttDataModel):
-    full_topic: str = ""
+    __slots__ = ("full_topic", "value", "timestamp", "is_active")
+
+    full_topic: str
     value: Any
-    timestamp: datetime.date
+    timestamp: datetime.datetime
     is_active: bool
 
+    def __init__(self, full_topic: str = "", value: Any = None,
+                 timestamp: datetime.datetime | None = None, is_active: bool = False):
+        self.full_topic = full_topic
+        self.value = value
+        self.timestamp = timestamp
+        self.is_active = is_active
+
     def to_dict(self):
         return {
             "value": self.value,
@@ -101,20 +116,272 @@ class MqttReadingModel(MqttDataModel):
         }
 
 class MqttGatewayReadingModel(MqttDataModel):
-    full_topic: str = ""
-    readings: list[MqttReadingModel] = []
+    __slots__ = ("full_topic", "readings")
 
-    def __init__(self):
-        self.readings = []
-        self.full_topic = ""
+    full_topic: str
+    readings: list[MqttReadingModel]
+
+    def __init__(self, full_topic: str = "", readings: list[MqttReadingModel] | None = None):
+        self.full_topic = full_topic
+        self.readings = [] if readings is None else readings
 
     def to_dict(self):
         return {
             "readings": [reading.to_dict() for reading in self.readings]
         }
 
+    def __reduce_ex__(self, protocol):
+        # Crossing a process boundary (multiprocessing queues, status ring)
+        # sends the packed report instead of the object graph
+        payload = PackedGatewayReading.pack(self)
+        if payload is None:
+            return super().__reduce_ex__(protocol)
+        return (PackedGatewayReading, (payload,))
+
+
+class PackedGatewayReading(MqttGatewayReadingModel):
+    """
+    Gateway report in a compact binary form.
+
+    Layout (little endian): header with the report timestamp (epoch float64),
+    the number of readings, the gateway id length and the number of sensor
+    types; the gateway id; the sensor type names; then one packed array per
+    field: indicator ids (uint16), type codes (uint8), values (8 bytes each),
+    an active bitmask and an integer bitmask telling which values are int64
+    rather than float64. Arrays are decoded on first access and readings are
+    only rebuilt as objects when asked for, to_dict() reads the arrays
+    directly.
+
+    Only reports that come back unchanged are packed: values must be int or
+    float, active flags bool and the timestamp naive, anything else is
+    pickled as objects.
+    """
+
+    __slots__ = ("_payload", "_count", "_timestamp", "gateway", "_types", "_arrays_offset",
+                 "_indicator_ids", "_type_codes", "_values", "_active", "_readings")
+
+    _VALUE_SIZE = 8
+
+    _HEADER = struct.Struct("<dIHB")
+
+    def __init__(self, payload: bytes):
+        self._payload = payload
+        timestamp, self._count, gateway_length, type_count = self._HEADER.unpack_from(
+            payload, 0)
+        self._timestamp = datetime.datetime.fromtimestamp(timestamp)
+        offset = self._HEADER.size
+        self.gateway = payload[offset:offset + gateway_length].decode()
+        offset += gateway_length
+
+        self._types = []
+        for _ in range(type_count):
+            length = payload[offset]
+            self._types.append(payload[offset + 1:offset + 1 + length].decode())
+            offset += 1 + length
+        self._arrays_offset = offset
+
+        self.full_topic = f"{self.gateway}-status-*"
+        self._indicator_ids = None
+        self._type_codes = None
+        self._values = None
+        self._active = None
+        self._readings = None
+
+    @staticmethod
+    def pack(report: MqttGatewayReadingModel) -> bytes | None:
+        """Returns the packed report, None when it does not fit the format"""
+        if isinstance(report, PackedGatewayReading):
+            return report._payload
+
+        gateway = report.full_topic.split('-')[0]
+        readings = report.readings
+        if not readings:
+            return None
+        timestamp = readings[0].timestamp
+        type_codes: dict[str, int] = {}
+        indicator_ids = array.array("H")
+        codes = array.array("B")
+        # Floats and ints share the value column, the integer mask tells them apart
+        values = bytearray(PackedGatewayReading._VALUE_SIZE * len(readings))
+        float_values = memoryview(values).cast("d")
+        int_values = memoryview(values).cast("q")
+        active = bytearray((len(readings) + 7) // 8)
+        integral = bytearray((len(readings) + 7) // 8)
+        try:
+            epoch = timestamp.timestamp()
+            if timestamp.tzinfo is not None or datetime.datetime.fromtimestamp(epoch) != timestamp:
+                return None
+            for index, reading in enumerate(readings):
+                reading_gateway, sensor_type, indicator = reading.full_topic.rsplit('-', 2)
+                if (reading_gateway != gateway or reading.timestamp != timestamp
+                        or str(int(indicator)) != indicator or type(reading.is_active) is not bool):
+                    return None
+                indicator_ids.append(int(indicator))
+                codes.append(type_codes.setdefault(sensor_type, len(type_codes)))
+                value = reading.value
+                if type(value) is float:
+                    float_values[index] = value
+                elif type(value) is int:
+                    int_values[index] = value
+                    integral[index // 8] |= 1 << (index % 8)
+                else:
+                    return None
+                if reading.is_active:
+                    active[index // 8] |= 1 << (index % 8)
+            encoded_gateway = gateway.encode()
+            parts = [PackedGatewayReading._HEADER.pack(epoch, len(readings),
+                                                       len(encoded_gateway), len(type_codes)),
+                     encoded_gateway]
+            for sensor_type in type_codes:
+                encoded_type = sensor_type.encode()
+                parts += [bytes((len(encoded_type),)), encoded_type]
+        except (AttributeError, TypeError, ValueError, OverflowError, struct.error):
+            return None
+        finally:
+            float_values.release()
+            int_values.release()
+
+        if sys.byteorder != "little":
+            indicator_ids.byteswap()
+            swapped = array.array("q")
+            swapped.frombytes(values)
+            swapped.byteswap()
+            values = swapped.tobytes()
+        parts += [indicator_ids.tobytes(), codes.tobytes(), bytes(values), bytes(active), bytes(integral)]
+        return b"".join(parts)
+
+    def __reduce_ex__(self, protocol):
+        return (PackedGatewayReading, (self._payload,))
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def timestamp(self) -> datetime.datetime:
+        return self._timestamp
+
+    def _decode_arrays(self):
+        offset = self._arrays_offset
+        indicator_ids = array.array("H")
+        indicator_ids.frombytes(self._payload[offset:offset + 2 * self._count])
+        offset += 2 * self._count
+        type_codes = self._payload[offset:offset + self._count]
+        offset += self._count
+        value_bytes = self._payload[offset:offset + self._VALUE_SIZE * self._count]
+        offset += self._VALUE_SIZE * self._count
+        values = array.array("d")
+        values.frombytes(value_bytes)
+        if sys.byteorder != "little":
+            indicator_ids.byteswap()
+            values.byteswap()
+        mask_size = (self._count + 7) // 8
+        self._active = self._payload[offset:offset + mask_size]
+        offset += mask_size
+        integral = self._payload[offset:offset + mask_size]
+        if any(integral):
+            int_values = array.array("q")
+            int_values.frombytes(value_bytes)
+            if sys.byteorder != "little":
+                int_values.byteswap()
+            values = [int_values[index] if integral[index // 8] & (1 << (index % 8)) else value
+                      for index, value in enumerate(values)]
+        self._type_codes = type_codes
+        self._values = values
+        self._indicator_ids = indicator_ids
+
+    @property
+    def indicator_ids(self) -> array.array:
+        if self._indicator_ids is None:
+            self._decode_arrays()
+        return self._indicator_ids
+
+    @property
+    def values(self) -> array.array | list[int | float]:
+        if self._indicator_ids is None:
+            self._decode_arrays()
+        return self._values
+
+    def is_active(self, index: int) -> bool:
+        if self._indicator_ids is None:
+            self._decode_arrays()
+        return bool(self._active[index // 8] & (1 << (index % 8)))
+
+    def get_full_topic(self, index: int) -> str:
+        if self._indicator_ids is None:
+            self._decode_arrays()
+        return f"{self.gateway}-{self._types[self._type_codes[index]]}-{self._indicator_ids[index]}"
+
+    @property
+    def readings(self) -> list[MqttReadingModel]:
+        if self._readings is None:
+            readings = []
+            for index in range(self._count):
+                readings.append(MqttReadingModel(self.get_full_topic(index), self.values[index],
+                                                 self._timestamp, self.is_active(index)))
+            self._readings = readings
+        return self._readings
+
+    def to_dict(self):
+        timestamp = self._timestamp.isoformat()
+        return {
+            "readings": [{
+                "value": self.values[index],
+                "timestamp": timestamp,
+                "subStatusName": self.get_full_topic(index),
+                "isActive": self.is_active(index),
+            } for index in range(self._count)]
+        }
+
+
+class ColumnarGatewayReading(MqttGatewayReadingModel):
+    """
+    Gateway report kept as parallel columns (topics, values, active flags)
+    sharing one timestamp, as produced by the vectorized calibration.
+    Reading objects are only built when asked for.
+    """
+
+    __slots__ = ("timestamp", "topics", "values", "active", "_readings")
+
+    def __init__(self, full_topic: str, timestamp: datetime.datetime, topics: list[str],
+                 values: list[float], active: list[bool]):
+        self.full_topic = full_topic
+        self.timestamp = timestamp
+        self.topics = topics
+        self.values = values
+        self.active = active
+        self._readings = None
+
+    def __len__(self):
+        return len(self.topics)
+
+    @property
+    def readings(self) -> list[MqttReadingModel]:
+        if self._readings is None:
+            timestamp = self.timestamp
+            self._readings = [MqttReadingModel(full_topic, value, timestamp, is_active)
+                              for full_topic, value, is_active in zip(self.topics, self.values, self.active)]
+        return self._readings
+
+    def to_dict(self):
+        timestamp = self.timestamp.isoformat()
+        return {
+            "readings": [{
+                "value": value,
+                "timestamp": timestamp,
+                "subStatusName": full_topic,
+                "isActive": is_active,
+            } for full_topic, value, is_active in zip(self.topics, self.values, self.active)]
+        }
+
 
 class MqttPayloadModel:
-    gateway: str = ""
-    data: list[MqttDataModel] = []
-    action: MqttActions = MqttActions.REPORT
+    __slots__ = ("gateway", "data", "action")
+
+    gateway: str
+    data: list[MqttDataModel]
+    action: MqttActions
+
+    def __init__(self, gateway: str = "", data: Any = None, action: MqttActions = MqttActions.REPORT):
+        self.gateway = gateway
+        self.data = [] if data is None else data
+        self.action = action
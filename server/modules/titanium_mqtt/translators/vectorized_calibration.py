@@ -0,0 +1,123 @@
+"""
+Optional NumPy path of the report translation: a whole gateway report is
+calibrated in a few array operations instead of one Python step per
+reading, with the same readings as the scalar path. Without NumPy
+installed NUMPY_AVAILABLE is False and the translator keeps its scalar path.
+"""
+import datetime
+
+from modules.titanium_mqtt.translators.gateway_plan import GatewayTranslationPlan, SensorKind
+from modules.titanium_mqtt.translators.payload_decoder import ReportColumns
+from modules.titanium_mqtt.translators.payload_model import ColumnarGatewayReading
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    np = None
+    NUMPY_AVAILABLE = False
+
+
+class PlanVectors:
+    """Arrays of one GatewayTranslationPlan, rebuilt with the plan"""
+
+    def __init__(self, plan: GatewayTranslationPlan):
+        self.gains = np.array(plan.gains, dtype=np.float64)
+        self.offsets = np.array(plan.offsets, dtype=np.float64)
+        # Integer calibrations keep integer readings integers, as in the scalar path
+        self.integral = np.array(
+            [isinstance(gain, int) and isinstance(offset, int)
+             for gain, offset in zip(plan.gains, plan.offsets)], dtype=bool)
+        self.int_gains = np.array(
+            [gain if integral else 0 for gain, integral in zip(plan.gains, self.integral)], dtype=np.int64)
+        self.int_offsets = np.array(
+            [offset if integral else 0 for offset, integral in zip(plan.offsets, self.integral)], dtype=np.int64)
+        self.configured = np.array(plan.configured, dtype=bool)
+        self.translatable = np.array(
+            [topic is not None for topic in plan.topics], dtype=bool)
+        self.topics = np.array(plan.topics, dtype=object)
+        kinds = plan.kinds
+        self.power_factor = np.array(
+            [kind == SensorKind.POWER_FACTOR for kind in kinds], dtype=bool)
+        self.current = np.array(
+            [kind == SensorKind.CURRENT for kind in kinds], dtype=bool)
+        self.tension = np.array(
+            [kind == SensorKind.TENSION for kind in kinds], dtype=bool)
+
+
+def get_plan_vectors(plan: GatewayTranslationPlan) -> PlanVectors:
+    # Cached on the plan itself, a new plan is compiled when the calibration changes
+    if plan.vectors is None:
+        plan.vectors = PlanVectors(plan)
+    return plan.vectors
+
+
+def _last_index(mask) -> int | None:
+    positions = np.flatnonzero(mask)
+    return int(positions[-1]) if positions.size else None
+
+
+def calibrate_report(plan: GatewayTranslationPlan, timestamp: datetime.datetime,
+                     columns: ReportColumns) -> tuple[ColumnarGatewayReading | None, list[int]]:
+    """
+    Returns the calibrated report and the sensor indexes without configuration.
+    The report is None when its values are not all numbers, the scalar path
+    then handles it.
+
+    Readings match the scalar path: non finite values are kept, an integer
+    value with an integer gain and offset stays an integer and the active
+    flags are passed through untouched.
+    """
+    count = len(columns)
+    try:
+        raw_values = np.array(columns.values)
+    except (TypeError, ValueError):
+        return None, []
+    # Strings, None, integers beyond int64 and other objects are left to the scalar path
+    if raw_values.dtype.kind not in "bif" or raw_values.shape != (count,):
+        return None, []
+    if raw_values.dtype.kind in "bi":
+        # All integer report, the exact values are kept for the integer arithmetic
+        raw_ints = raw_values
+        is_int = np.ones(count, dtype=bool)
+    else:
+        raw_ints = None
+        is_int = np.fromiter((isinstance(value, int) for value in columns.values), dtype=bool, count=count)
+    raw_values = raw_values.astype(np.float64, copy=False)
+
+    vectors = get_plan_vectors(plan)
+    planned = min(count, len(plan))
+    configured = np.zeros(count, dtype=bool)
+    configured[:planned] = vectors.configured[:planned]
+    unconfigured = np.flatnonzero(~configured).tolist()
+
+    keep = np.zeros(count, dtype=bool)
+    keep[:planned] = vectors.translatable[:planned]
+    indexes = np.flatnonzero(keep)
+
+    with np.errstate(invalid="ignore", over="ignore"):
+        values = raw_values[indexes] * vectors.gains[indexes] + vectors.offsets[indexes]
+
+    exact = is_int[indexes] & vectors.integral[indexes]
+    if exact.any():
+        selected = indexes[exact]
+        source = raw_values if raw_ints is None else raw_ints
+        exact_values = (source[selected].astype(np.int64) * vectors.int_gains[selected] +
+                        vectors.int_offsets[selected])
+        # Object array, so tolist() hands out ints and floats like the scalar path
+        values = values.astype(object)
+        values[exact] = exact_values.astype(object)
+    result = values.tolist()
+
+    # Same rule as the scalar path, power factor is 100 when there is no current
+    power_factor = _last_index(vectors.power_factor[indexes])
+    current = _last_index(vectors.current[indexes])
+    tension = _last_index(vectors.tension[indexes])
+    if (power_factor is not None and current is not None and tension is not None and
+            result[current] < 0.1 and result[tension] != 0):
+        result[power_factor] = 100
+
+    active = columns.active
+    report = ColumnarGatewayReading(plan.status_topic, timestamp, vectors.topics[indexes].tolist(),
+                                    result, [active[index] for index in indexes.tolist()])
+    return report, unconfigured
@@ -80,8 +80,8 @@ class AlarmManager(ServiceInterface):
                             evt = EventModel(alarm.id,
                                              alarm.panel_id,
                                              data["timestamp"],
-                                             data["value"])
-                            evt.name = alarm.name
+                                             data["value"],
+                                             name=alarm.name)
                             events_to_add.append(evt)
                 except KeyboardInterrupt:
                     break
@@ -162,7 +162,7 @@ class AlarmManager(ServiceInterface):
             self._status_subscribers[gateway_topic] = StatuSubscribers(
                 self.add_check_status, gateway_topic)
             self._middleware.add_subscribe_to_status(
-                self._status_subscribers[gateway_topic], gateway_topic)
+                self._status_subscribers[gateway_topic], gateway_topic, latency_stage="alarm")
             self._subscriptions_add += 1
 
             self._alarms_info[gateway_topic] = []
@@ -2,10 +2,12 @@ import json
 import os
 import threading
 from datetime import datetime, timedelta
+from typing import Any
 from middleware.client_middleware import ClientMiddleware
 
 from dataModules.panel import Panel
 from middleware.status_subscriber import StatuSubscribers
+from middleware.subscriber_dispatcher import DispatchMode
 from dataModules.alarm import Alarm, AlarmType
 from modules.titanium_mqtt.mqtt_commands import MqttCommands
 from dataModules.panel_group import PanelGroup
@@ -25,6 +27,9 @@ DB_NAME = "titanium_server_db.db"
 
 
 class ConfigHandler(ServiceInterface):
+    # Every calibration subscription writes to the database on this one thread
+    CALIBRATION_LANE = "calibration"
+
     _panel_groups: dict[int, PanelGroup] = {}
     _status_subscribers = {}
     _panel_groups_lock: threading.Lock = None
@@ -139,8 +144,10 @@ class ConfigHandler(ServiceInterface):
                 ),
                 topic,
             )
+            # Calibration updates write to the database, keep them off the service thread
             self._middleware.add_subscribe_to_status(
-                self._status_subscribers[topic], topic
+                self._status_subscribers[topic], topic, dispatch_mode=DispatchMode.SERIAL,
+                serial_lane=self.CALIBRATION_LANE
             )
 
     def _find_panel_from_id(self, panel_id):
@@ -356,21 +363,32 @@ class ConfigHandler(ServiceInterface):
 
         return (topic_to_name, topic_to_type)
 
+    def _get_last_readings(self, gateway) -> dict[str, Any]:
+        last_report = self._middleware.get_last_status(
+            ClientMiddleware.get_gateway_status_topic(gateway))
+        if last_report is None:
+            return {}
+        return {reading.full_topic: reading for reading in last_report.readings}
+
     def create_object_from_panels_info(self, calibrate_update=False):
         obj = {}
         current_time = datetime.now()
 
+        # Readings of the last report of each gateway, from the middleware cache
+        last_readings: dict[str, dict[str, Any]] = {}
+
         with self._panel_groups_lock:
             for group in self._panel_groups.values():
                 panels_with_last_values = []
                 for panel in group.panels:
                     panel_json = panel.to_json()
 
-                    # Get the last value/active status from sensor data storage
+                    if panel.gateway not in last_readings:
+                        last_readings[panel.gateway] = self._get_last_readings(
+                            panel.gateway)
                     topic = ClientMiddleware.get_status_topic(
                         panel.gateway, panel.topic, panel.indicator)
-                    last_status = self._sensor_data_storage.get_last_status_for_topic(
-                        topic)
+                    last_status = last_readings[panel.gateway].get(topic)
 
                     if last_status:
                         if hasattr(last_status, 'value'):
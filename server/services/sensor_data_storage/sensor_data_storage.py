@@ -251,7 +251,8 @@ class SensorDataStorage(ServiceInterface):
             self._gateway_status_subscribers[gateway_topic]['subscriber'] = StatuSubscribers(
                 self.add_sensors_to_data_queue, gateway_topic)
             self._middleware.add_subscribe_to_status(
-                self._gateway_status_subscribers[gateway_topic]['subscriber'], gateway_topic)
+                self._gateway_status_subscribers[gateway_topic]['subscriber'], gateway_topic,
+                latency_stage="storage")
 
         topic = ClientMiddleware.get_status_topic(
             gateway, status_name, indicator)
@@ -1,6 +1,6 @@
 from threading import Thread
-from time import sleep
 import asyncio
+import os
 
 from services.gateway_manager.gateway_manager import GatewayManager
 from services.alarm_manager.alarm_manager import AlarmManager
@@ -9,16 +9,43 @@ from services.report_generator.report_generator import ReportGenerator
 
 from .config_handler.config_handler import ConfigHandler
 from support.logger import Logger
+from support.runtime_metrics import runtime_metrics
 
 from middleware.client_middleware import ClientMiddleware
 
 from .config_storage.config_storage import ConfigStorage
+from .config_storage.config_storage_commands import ConfigStorageCommand
+from .config_handler.config_handler_command import ConfigHandlerCommands
+from services.alarm_manager.alarm_manager_commands import AlarmManagerCommands
+from services.gateway_manager.gateway_manager_commands import GatewayManagerCommands
+from services.report_generator.report_generator_commands import ReportGeneratorCommands
+from services.sensor_data_storage.sensor_data_storage_commands import SensorDataStorageCommands
+
+SERVICE_MANAGER_QUEUE_CAPACITY = int(
+    os.getenv('SERVICE_MANAGER_QUEUE_CAPACITY', '50000'))
 
 
 class ServiceManager:
-    def __init__(self, middleware):
+    LISTENER_NAME = "service_manager"
+    QUEUE_CAPACITY = SERVICE_MANAGER_QUEUE_CAPACITY
+    # Registered by the parent process before forking, see main.run_processes
+    COMMANDS = (
+        ConfigStorageCommand.GET_ALARM_INFO, ConfigStorageCommand.GET_EVENTS_LIST,
+        SensorDataStorageCommands.ADD_SENSOR_INFO, SensorDataStorageCommands.READ_SENSOR_INFO,
+        SensorDataStorageCommands.ERASE_SENSOR_INFO,
+        AlarmManagerCommands.REMOVE_ALARM, AlarmManagerCommands.ADD_ALARM, AlarmManagerCommands.GET_ALARMS,
+        AlarmManagerCommands.REMOVE_ALL_EVENTS,
+        ConfigHandlerCommands.ADD_PANEL, ConfigHandlerCommands.REMOVE_PANEL, ConfigHandlerCommands.GET_PANEL_LIST,
+        ConfigHandlerCommands.UPDATE_PANEL_FUNCTIONALITIES, ConfigHandlerCommands.ADD_PANEL_GROUP,
+        ConfigHandlerCommands.REMOVE_PANEL_GROUP, ConfigHandlerCommands.UPDATE_PANEL_GROUP,
+        ReportGeneratorCommands.GENERATE_REPORT,
+        GatewayManagerCommands.REQUEST_UPDATE_GATEWAYS, GatewayManagerCommands.GET_GATEWAYS,
+    )
+
+    def __init__(self, middleware, use_multiprocessing=False):
         self._logger = Logger()
-        self._middleware = ClientMiddleware(middleware, "service_manager")
+        self._middleware = ClientMiddleware(middleware, self.LISTENER_NAME, use_multiprocessing,
+                                            queue_capacity=self.QUEUE_CAPACITY)
 
         self._config_storage = ConfigStorage(self._middleware)
         self._sensor_data_storage = SensorDataStorage(self._middleware)
@@ -30,17 +57,19 @@ class ServiceManager:
             self._middleware, self._sensor_data_storage, self._config_handler)
         self._gateway_manager = GatewayManager(self._middleware)
 
-        self._status_saver_thread = Thread(
-            target=self.threaded_function, args=(10, ))
+        self._status_saver_thread = Thread(target=self.threaded_function)
+        runtime_metrics.add_source(self.LISTENER_NAME, self._middleware.get_metrics)
 
     def run(self):
         self._logger.info("Service Manager started")
-        self._status_saver_thread.run()
+        self._status_saver_thread.start()
 
-    def threaded_function(self, args):
-        while True:
-            self._middleware.run_middleware_update()
-            sleep(0.1)
+    def threaded_function(self):
+        self._middleware.run_middleware_loop()
 
     def join(self):
+        self._middleware.stop()
+        self._status_saver_thread.join()
+
+    def wait(self):
         self._status_saver_thread.join()
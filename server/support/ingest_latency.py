@@ -0,0 +1,102 @@
+"""
+Where the time of a reading goes, from MQTT arrival to storage and the UI.
+
+Every batch of readings carries a trace, a dict of time.monotonic() stamps:
+
+    received    on_message, the oldest message of the batch
+    translated  after translate_incoming_message
+    enqueued    handed to the middleware (ClientMiddleware.send_status_array)
+    dequeued    taken from the listener queue by a ClientMiddleware
+
+and subscriptions declared with a latency_stage record when their callback
+is done. Each stage is aggregated in a LatencyHistogram of this process: in
+process mode every process keeps the stages it runs.
+"""
+import os
+import threading
+import time
+
+from support.latency_histogram import LatencyHistogram
+
+INGEST_LATENCY_TRACKING = os.getenv('INGEST_LATENCY_TRACKING', 'true').lower() == 'true'
+
+
+class IngestStage:
+    # received -> translated
+    TRANSLATE = "translate"
+    # translated -> enqueued
+    PUBLISH = "publish"
+    # enqueued -> dequeued, one per listener: "queue.<listener>"
+    QUEUE = "queue"
+    # dequeued -> callback done, one per subscriber stage: "subscriber.<stage>"
+    SUBSCRIBER = "subscriber"
+    # received -> callback done, one per subscriber stage: "endToEnd.<stage>"
+    END_TO_END = "endToEnd"
+
+
+class IngestLatencyTracker:
+    def __init__(self, enabled: bool = INGEST_LATENCY_TRACKING):
+        self._enabled = enabled
+        self._lock = threading.Lock()
+        self._histograms: dict[str, LatencyHistogram] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    def set_enabled(self, enabled: bool):
+        self._enabled = enabled
+
+    def start_trace(self, messages) -> dict[str, float] | None:
+        """Trace of a batch of MQTT messages stamped by on_message, None when there is nothing to trace"""
+        if not self._enabled:
+            return None
+        stamps = [received_at for received_at in (getattr(msg, "received_at", None) for msg in messages)
+                  if received_at is not None]
+        if not stamps:
+            return None
+        return {"received": min(stamps)}
+
+    def record(self, stage: str, latency: float):
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, LatencyHistogram())
+        histogram.record(latency)
+
+    def record_interval(self, stage: str, trace: dict[str, float], start: str, end: str):
+        """Records trace[end] - trace[start] when the trace has both stamps"""
+        started_at = trace.get(start)
+        ended_at = trace.get(end)
+        if started_at is not None and ended_at is not None:
+            self.record(stage, ended_at - started_at)
+
+    def record_subscriber(self, subscriber_stage: str, trace: dict[str, float]):
+        """Stamps the end of a subscriber callback"""
+        done_at = time.monotonic()
+        if "dequeued" in trace:
+            self.record(f"{IngestStage.SUBSCRIBER}.{subscriber_stage}", done_at - trace["dequeued"])
+        if "received" in trace:
+            self.record(f"{IngestStage.END_TO_END}.{subscriber_stage}", done_at - trace["received"])
+
+    def get_histogram(self, stage: str) -> LatencyHistogram | None:
+        return self._histograms.get(stage)
+
+    def get_percentile(self, stage: str, percentile: float) -> float | None:
+        """Latency of stage in seconds at percentile (0 to 100), None if it was never recorded"""
+        histogram = self._histograms.get(stage)
+        return histogram.get_value_at_percentile(percentile) if histogram else None
+
+    def get_stats(self) -> dict[str, dict[str, float | int]]:
+        """Latencies in milliseconds by stage"""
+        with self._lock:
+            histograms = dict(self._histograms)
+        return {stage: histogram.get_stats() for stage, histogram in sorted(histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+
+# Instância global, compartilhada pelos módulos deste processo
+ingest_latency = IngestLatencyTracker()
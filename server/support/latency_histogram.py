@@ -0,0 +1,114 @@
+import threading
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory latency histogram in the style of HdrHistogram.
+
+    Latencies are counted in microseconds on log-linear buckets: every power
+    of two is split in 2 ** (precision_bits - 1) linear steps, so a value is
+    reported with a relative error below 2 ** (1 - precision_bits) (1.6% with
+    the default 7 bits) up to max_latency seconds. Longer latencies are
+    counted in the last bucket. Recording is O(1) and the memory does not
+    grow with the number of samples.
+    """
+
+    def __init__(self, max_latency: float = 3600.0, precision_bits: int = 7):
+        if precision_bits < 2:
+            raise ValueError(
+                "LatencyHistogram::__init__: at least 2 precision bits are needed")
+        self._precision_bits = precision_bits
+        self._sub_bucket_count = 1 << precision_bits
+        self._half_count = self._sub_bucket_count >> 1
+        self._max_value = max(int(max_latency * 1e6), self._sub_bucket_count)
+        self._counts = [0] * (self._index_of(self._max_value) + 1)
+        self._lock = threading.Lock()
+        self._total = 0
+        self._sum = 0
+        self._min = 0
+        self._max = 0
+
+    def _index_of(self, value: int) -> int:
+        if value < self._sub_bucket_count:
+            return value
+        shift = value.bit_length() - self._precision_bits
+        return self._sub_bucket_count + (shift - 1) * self._half_count + (value >> shift) - self._half_count
+
+    def _highest_value_at(self, index: int) -> int:
+        """Highest value counted in the bucket at index"""
+        if index < self._sub_bucket_count:
+            return index
+        shift = (index - self._sub_bucket_count) // self._half_count + 1
+        sub_bucket = (index - self._sub_bucket_count) % self._half_count + self._half_count
+        return ((sub_bucket + 1) << shift) - 1
+
+    def record(self, latency: float):
+        """Counts a latency given in seconds"""
+        value = min(max(int(latency * 1e6), 0), self._max_value)
+        index = self._index_of(value)
+        with self._lock:
+            self._counts[index] += 1
+            if self._total == 0 or value < self._min:
+                self._min = value
+            if value > self._max:
+                self._max = value
+            self._total += 1
+            self._sum += value
+
+    @property
+    def count(self) -> int:
+        return self._total
+
+    def get_value_at_percentile(self, percentile: float) -> float:
+        """Latency in seconds below which percentile (0 to 100) of the samples fall"""
+        with self._lock:
+            return self._value_at_percentile(percentile) / 1e6
+
+    def _value_at_percentile(self, percentile: float) -> int:
+        if self._total == 0:
+            return 0
+        wanted = max(1, -(-self._total * min(max(percentile, 0.0), 100.0) // 100))
+        seen = 0
+        for index, count in enumerate(self._counts):
+            seen += count
+            if seen >= wanted:
+                return min(self._highest_value_at(index), self._max)
+        return self._max
+
+    def merge(self, other: "LatencyHistogram"):
+        if len(other._counts) != len(self._counts):
+            raise ValueError(
+                "LatencyHistogram::merge: histograms have different ranges")
+        with other._lock:
+            counts = list(other._counts)
+            total, total_sum = other._total, other._sum
+            other_min, other_max = other._min, other._max
+        if total == 0:
+            return
+        with self._lock:
+            for index, count in enumerate(counts):
+                self._counts[index] += count
+            self._min = other_min if self._total == 0 else min(self._min, other_min)
+            self._max = max(self._max, other_max)
+            self._total += total
+            self._sum += total_sum
+
+    def reset(self):
+        with self._lock:
+            self._counts = [0] * len(self._counts)
+            self._total = self._sum = self._min = self._max = 0
+
+    def get_stats(self) -> dict[str, float | int]:
+        """Count and latencies in milliseconds"""
+        with self._lock:
+            total = self._total
+            return {
+                "count": total,
+                "min": self._min / 1000,
+                "mean": (self._sum / total / 1000) if total else 0.0,
+                "p50": self._value_at_percentile(50) / 1000,
+                "p90": self._value_at_percentile(90) / 1000,
+                "p99": self._value_at_percentile(99) / 1000,
+                "p999": self._value_at_percentile(99.9) / 1000,
+                "max": self._max / 1000,
+            }
@@ -0,0 +1,78 @@
+"""
+Runtime metrics of this process, logged as one JSON line every
+RUNTIME_METRICS_INTERVAL seconds.
+
+Every manager adds a source with the metrics it owns (listener queue depth
+and drops, pending and timed out commands, subscriber handler latency,
+translation workers, ingest filter) and the ingest latency percentiles of
+support.ingest_latency are always included. main starts the reporter once
+per process, so in process mode each manager process logs its own line.
+"""
+from collections.abc import Callable
+import json
+import os
+import threading
+from typing import Any
+
+from support.ingest_latency import ingest_latency
+from support.logger import Logger
+
+# Seconds between two metrics lines, 0 disables them
+RUNTIME_METRICS_INTERVAL = float(os.getenv('RUNTIME_METRICS_INTERVAL', '60'))
+
+
+class RuntimeMetricsReporter:
+    def __init__(self):
+        self._logger = Logger()
+        self._lock = threading.Lock()
+        self._sources: dict[str, Callable[[], Any]] = {
+            "ingestLatencyMs": ingest_latency.get_stats}
+        self._stop_event = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def add_source(self, name: str, get_metrics: Callable[[], Any]):
+        with self._lock:
+            self._sources[name] = get_metrics
+
+    def remove_source(self, name: str):
+        with self._lock:
+            self._sources.pop(name, None)
+
+    def get_metrics(self) -> dict[str, Any]:
+        with self._lock:
+            sources = dict(self._sources)
+
+        metrics = {}
+        for name, get_metrics in sources.items():
+            try:
+                metrics[name] = get_metrics()
+            except Exception as e:
+                self._logger.error(
+                    f"RuntimeMetricsReporter::get_metrics: source {name} failed: {e}")
+        return metrics
+
+    def log_metrics(self):
+        self._logger.info(
+            f"RuntimeMetrics: {json.dumps(self.get_metrics(), sort_keys=True, default=str)}")
+
+    def start(self, interval: float = RUNTIME_METRICS_INTERVAL):
+        if interval <= 0 or self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(interval,), daemon=True, name="RuntimeMetrics")
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _run(self, interval: float):
+        while not self._stop_event.wait(interval):
+            self.log_metrics()
+
+
+# Instância global, compartilhada pelos módulos deste processo
+runtime_metrics = RuntimeMetricsReporter()
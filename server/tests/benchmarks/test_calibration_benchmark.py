@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from benchmarks.calibration_benchmark import create_report, create_translator, main, run_benchmark
+from modules.titanium_mqtt.translators.io_cloud_api import VECTORIZED_CALIBRATION
+
+
+class TestCalibrationBenchmark:
+    """Smoke test of the calibration benchmark"""
+
+    def test_scalar_path_is_the_default(self):
+        """Test the NumPy path is only used when asked for"""
+        assert not VECTORIZED_CALIBRATION
+
+    def test_both_paths_translate_the_same_report(self):
+        """Test the measured translators produce the same readings"""
+        pytest.importorskip("numpy")
+        report = create_report(26, 1)
+
+        scalar = create_translator(26, False)._read_sensor_report_message("benchGw", report)
+        vectorized = create_translator(26, True)._read_sensor_report_message("benchGw", report)
+
+        assert len(scalar.readings) == 26
+        assert vectorized.to_dict() == scalar.to_dict()
+
+    def test_measures_every_size(self):
+        """Test every report size gets a scalar time"""
+        results = run_benchmark([8, 26], reports=20)["results"]
+
+        assert list(results) == ["8", "26"]
+        for result in results.values():
+            assert result["scalarUs"] > 0
+
+    def test_main_writes_json(self, tmp_path):
+        """Test the command line writes a machine-readable result"""
+        output = tmp_path / "calibration.json"
+
+        main(["--sizes", "4", "--reports", "10", "--output", str(output)])
+
+        assert list(json.loads(output.read_text())["results"]) == ["4"]
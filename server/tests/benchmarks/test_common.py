@@ -0,0 +1,34 @@
+import json
+
+from benchmarks.common import create_result, latency_summary, percentile, write_result
+
+
+class TestBenchmarkCommon:
+    """Test the helpers shared by the benchmark scripts"""
+
+    def test_percentile(self):
+        """Test the nearest-rank percentile"""
+        values = [float(value) for value in range(100)]
+
+        assert percentile(values, 0.5) == 50.0
+        assert percentile(values, 0.99) == 99.0
+        assert percentile([], 0.5) == 0.0
+
+    def test_latency_summary(self):
+        """Test durations in seconds are summarized in milliseconds"""
+        summary = latency_summary([0.003, 0.001, 0.002])
+
+        assert summary == {"count": 3, "p50": 2.0, "p99": 3.0, "max": 3.0}
+        assert latency_summary([]) == {"count": 0, "p50": 0.0, "p99": 0.0, "max": 0.0}
+
+    def test_write_result(self, tmp_path, capsys):
+        """Test a result is printed and written with its environment"""
+        output = tmp_path / "result.json"
+        result = create_result({"runs": 1}, {"rate": 2.0})
+
+        assert write_result(result, str(output)) is result
+
+        written = json.loads(output.read_text())
+        assert written == json.loads(capsys.readouterr().out)
+        assert set(written["environment"]) == {"python", "implementation", "platform"}
+        assert written["results"] == {"rate": 2.0}
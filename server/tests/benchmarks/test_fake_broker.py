@@ -0,0 +1,168 @@
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from benchmarks.fake_broker import FakeBroker, FakeMqttClient, SharedStrategy
+from modules.titanium_mqtt.mqtt import TitaniumMqtt
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+def _collecting_client(broker, topic_filter):
+    received = []
+    done = threading.Event()
+    client = FakeMqttClient(broker, "collector")
+
+    def on_message(_client, _userdata, msg):
+        received.append((msg.topic, msg.payload))
+        done.set()
+
+    client.on_message = on_message
+    client.connect()
+    client.subscribe(topic_filter)
+    client.loop_start()
+    return client, received, done
+
+
+class TestFakeBroker:
+    """Test suite for the in-process broker stand-in"""
+
+    def test_routes_by_topic_filter(self):
+        """Test messages only reach clients whose filter matches, wildcards included"""
+        broker = FakeBroker()
+        response_client, responses, _ = _collecting_client(broker, "iocloud/response/#")
+        request_client, requests, _ = _collecting_client(broker, "iocloud/request/+/command")
+        publisher = FakeMqttClient(broker)
+
+        publisher.publish("iocloud/response/gw1/sensor/report", b"report")
+        publisher.publish("iocloud/request/all/command", "request")
+        assert _wait_for(lambda: len(responses) == 1 and len(requests) == 1)
+
+        assert responses == [("iocloud/response/gw1/sensor/report", b"report")]
+        assert requests == [("iocloud/request/all/command", b"request")]
+        assert broker.get_stats()["delivered"] == 2
+        response_client.loop_stop()
+        request_client.loop_stop()
+
+    def test_subscribe_accepts_paho_topic_list(self):
+        """Test the (filter, qos) list TitaniumMqtt passes to subscribe"""
+        broker = FakeBroker()
+        client, received, done = _collecting_client(broker, [("a/#", 0), ("b/#", 0)])
+
+        FakeMqttClient(broker).publish("b/1", b"x")
+
+        assert done.wait(5)
+        assert received == [("b/1", b"x")]
+        client.loop_stop()
+
+    def test_connect_and_disconnect_callbacks(self):
+        """Test connect calls on_connect and disconnect drops the subscriptions"""
+        broker = FakeBroker()
+        client = FakeMqttClient(broker)
+        client.on_connect = MagicMock()
+        client.on_disconnect = MagicMock()
+        client.user_data_set({"key": 1})
+
+        client.connect("localhost", 1883, 60)
+        client.subscribe("a/#")
+        client.disconnect()
+
+        client.on_connect.assert_called_once_with(client, {"key": 1}, {}, 0)
+        client.on_disconnect.assert_called_once_with(client, {"key": 1}, 0)
+        assert not client.is_connected()
+        assert broker.get_stats()["subscriptions"] == 0
+
+
+class TestTitaniumMqttOverFakeBroker:
+    """TitaniumMqtt with the broker stand-in injected as its client factory"""
+
+    @pytest.fixture
+    def titanium_mqtt(self):
+        with patch("modules.titanium_mqtt.mqtt.Logger"):
+            middleware = MagicMock()
+            broker = FakeBroker()
+            titanium_mqtt = TitaniumMqtt(middleware, broker.create_client_factory())
+            yield titanium_mqtt, middleware, broker
+            titanium_mqtt.stop()
+
+    def test_run_subscribes_and_receives(self, titanium_mqtt):
+        """Test run() connects through the factory and consumes what the broker routes"""
+        titanium_mqtt, middleware, broker = titanium_mqtt
+        titanium_mqtt._translator = MagicMock()
+        data = MagicMock()
+        data.full_topic = "gw1-status-*"
+        titanium_mqtt._translator.translate_incoming_message.return_value = MagicMock(data=data)
+
+        titanium_mqtt.run()
+        assert isinstance(titanium_mqtt._client, FakeMqttClient)
+        FakeMqttClient(broker).publish("iocloud/response/gw1/command", b"{}")
+
+        assert _wait_for(lambda: middleware.send_status_array.called)
+        titanium_mqtt._translator.translate_incoming_message.assert_called_with(
+            "iocloud/response/gw1/command", b"{}")
+
+    def test_system_request_reaches_gateways(self, titanium_mqtt):
+        """Test send_system_request publishes on the broadcast command topic"""
+        titanium_mqtt, _, broker = titanium_mqtt
+        gateway, received, done = _collecting_client(broker, "iocloud/request/#")
+
+        titanium_mqtt.run()
+        titanium_mqtt.send_system_request()
+
+        assert done.wait(5)
+        assert received[0][0] == "iocloud/request/all/command"
+        gateway.loop_stop()
+
+
+class TestFakeBrokerSharedSubscriptions:
+    """Test $share/<group>/ subscriptions of the broker stand-in"""
+
+    @staticmethod
+    def _members(broker, count):
+        members = []
+        for _ in range(count):
+            client, received, _ = _collecting_client(broker, "$share/group/iocloud/response/#")
+            members.append((client, received))
+        return members
+
+    def test_hash_topic_keeps_a_topic_on_one_member(self):
+        """Test each message goes to a single member, always the same one for a topic"""
+        broker = FakeBroker(SharedStrategy.HASH_TOPIC)
+        members = self._members(broker, 3)
+        publisher = FakeMqttClient(broker)
+        for _ in range(5):
+            for gateway in range(12):
+                publisher.publish(f"iocloud/response/gw{gateway}/sensor/report", b"{}")
+
+        assert _wait_for(lambda: sum(len(received) for _, received in members) == 60)
+        topics_by_member = [{topic for topic, _ in received} for _, received in members]
+        assert sum(len(topics) for topics in topics_by_member) == 12
+        for client, _ in members:
+            client.loop_stop()
+
+    def test_round_robin_spreads_every_message(self):
+        """Test round robin alternates the members, also for one topic"""
+        broker = FakeBroker(SharedStrategy.ROUND_ROBIN)
+        members = self._members(broker, 2)
+        publisher = FakeMqttClient(broker)
+        for _ in range(4):
+            publisher.publish("iocloud/response/gw1/sensor/report", b"{}")
+
+        assert _wait_for(lambda: [len(received) for _, received in members] == [2, 2])
+        assert broker.get_stats()["sharedSubscriptions"] == 2
+        for client, _ in members:
+            client.loop_stop()
+
+    def test_unknown_strategy(self):
+        """Test the shared strategy is validated"""
+        with pytest.raises(ValueError):
+            FakeBroker("random")
@@ -0,0 +1,137 @@
+import json
+import time
+
+import pytest
+
+from benchmarks.fake_broker import FakeBroker, FakeMqttClient
+from benchmarks.gateway_simulator import (
+    BASE_SENSORS,
+    GatewaySimulator,
+    SimulatorConfig,
+    create_system_message,
+    main,
+    run_capacity_test,
+)
+from modules.titanium_mqtt.translators.io_cloud_api import IoCloudApiTranslator
+from modules.titanium_mqtt.translators.payload_model import MqttSystemModel
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+@pytest.fixture
+def broker_with_listener():
+    broker = FakeBroker()
+    received = []
+    listener = FakeMqttClient(broker, "listener")
+    listener.on_message = lambda _c, _u, msg: received.append((msg.topic, json.loads(msg.payload)))
+    listener.connect()
+    listener.subscribe("iocloud/response/#")
+    listener.loop_start()
+    yield broker, received
+    listener.loop_stop()
+
+
+class TestGatewaySimulator:
+    """Test suite for the virtual gateways"""
+
+    def test_system_message_is_understood_by_translator(self):
+        """Test the simulated system message configures every sensor"""
+        translator = IoCloudApiTranslator()
+        translator.initialize()
+        payload = json.dumps(create_system_message("SIM000001")).encode()
+
+        result = translator.translate_incoming_message("iocloud/response/SIM000001/command", payload)
+
+        assert isinstance(result.data, MqttSystemModel)
+        assert len(result.data.panels) == len(BASE_SENSORS)
+
+    def test_answers_broadcast_system_request(self, broker_with_listener):
+        """Test a request to all makes every gateway send its system message"""
+        broker, received = broker_with_listener
+        simulator = GatewaySimulator(FakeMqttClient(broker), SimulatorConfig(gateways=3, intervals=[60]))
+        simulator.start()
+
+        FakeMqttClient(broker).publish("iocloud/request/all/command", json.dumps({"command": 2}))
+        assert _wait_for(lambda: len(received) == 3)
+        simulator.stop()
+
+        assert sorted(topic for topic, _ in received) == [
+            f"iocloud/response/{gateway}/command" for gateway in simulator.gateways]
+        assert all(message["command_index"] == 2 for _, message in received)
+        assert simulator.get_stats()["systemRequests"] == 1
+
+    def test_answers_single_gateway_request(self, broker_with_listener):
+        """Test a request to one gateway is only answered by that gateway"""
+        broker, received = broker_with_listener
+        simulator = GatewaySimulator(FakeMqttClient(broker), SimulatorConfig(gateways=3, intervals=[60]))
+        simulator.start()
+        gateway = simulator.gateways[1]
+
+        FakeMqttClient(broker).publish(f"iocloud/request/{gateway}/command", json.dumps({"command": 2}))
+        assert _wait_for(lambda: len(received) == 1)
+        simulator.stop()
+
+        assert received[0][1]["device_id"] == gateway
+
+    def test_reports_follow_schedules(self, broker_with_listener):
+        """Test every gateway reports on its own interval"""
+        broker, received = broker_with_listener
+        simulator = GatewaySimulator(FakeMqttClient(broker),
+                                     SimulatorConfig(gateways=2, intervals=[0.02, 0.2]))
+        simulator.start()
+        time.sleep(0.5)
+        simulator.stop()
+
+        counts = {}
+        for topic, report in received:
+            counts[topic.split("/")[2]] = counts.get(topic.split("/")[2], 0) + 1
+            assert len(report["sensors"]) == len(BASE_SENSORS)
+        fast, slow = simulator.gateways
+        assert counts[fast] > 3 * counts[slow] >= 3
+
+    def test_rejects_invalid_interval(self):
+        """Test intervals must be positive"""
+        with pytest.raises(ValueError):
+            GatewaySimulator(FakeMqttClient(FakeBroker()), SimulatorConfig(intervals=[0]))
+
+
+class TestCapacityTest:
+    """End to end: simulator, fake broker, TitaniumMqtt and the middleware"""
+
+    def test_unknown_gateways_get_configured_and_reports_delivered(self):
+        """Test the first reports trigger the system request and later reports are delivered"""
+        results = run_capacity_test(SimulatorConfig(gateways=20, intervals=[0.05]), duration=1.0,
+                                    drain_timeout=5)["results"]
+
+        assert results["simulator"]["systemRequests"] == 1
+        assert results["simulator"]["systemMessagesSent"] == 20
+        assert results["gatewaysDelivered"] == 20
+        assert 0 < results["reportsDelivered"] <= results["reportsSent"]
+        assert results["latencyMs"]["count"] == results["reportsDelivered"]
+        # System messages are not counted as reports
+        assert results["stagesMs"]["endToEnd.observer"]["count"] == results["reportsDelivered"]
+
+    def test_shared_subscription_keeps_gateway_order(self):
+        """Test several TitaniumMqtt connections deliver every gateway in order"""
+        results = run_capacity_test(SimulatorConfig(gateways=20, intervals=[0.02]), duration=1.0,
+                                    drain_timeout=5, ingest_clients=3)["results"]
+
+        assert results["gatewaysDelivered"] == 20
+        assert results["outOfOrder"] == 0
+        assert len(results["ingestMembers"]) == 2
+        assert all(member["received"] > 0 for member in results["ingestMembers"])
+
+    def test_main_writes_json(self, tmp_path):
+        """Test the command line writes a machine-readable result"""
+        output = tmp_path / "capacity.json"
+
+        main(["--gateways", "2", "--intervals", "0.1", "--duration", "0.3", "--output", str(output)])
+
+        assert json.loads(output.read_text())["config"]["gateways"] == 2
@@ -0,0 +1,37 @@
+import json
+
+from benchmarks.middleware_benchmark import BenchmarkConfig, main, run_benchmark, subscription_patterns
+
+
+class TestMiddlewareBenchmark:
+    """Smoke test of the middleware benchmark"""
+
+    def test_subscription_patterns(self):
+        """Test subscribers are split between wildcard and exact patterns"""
+        patterns = subscription_patterns(BenchmarkConfig(
+            subscribers=4, wildcard_ratio=0.5, gateways=2))
+
+        assert patterns == ["*-status-*", "*-*-*",
+                            "gw0-status-*", "gw1-status-*"]
+
+    def test_short_run_delivers_everything(self):
+        """Test a short paced run delivers every report to every matching subscriber"""
+        result = run_benchmark(BenchmarkConfig(listeners=2, subscribers=4, gateways=2,
+                                               readings_per_report=4, rate=200, duration=0.2))
+
+        results = result["results"]
+        assert results["published"] > 0
+        assert results["delivered"] == results["expectedDeliveries"]
+        assert results["latencyMs"]["p50"] <= results["latencyMs"]["p99"]
+        assert set(results["listeners"]) == {"listener-0", "listener-1"}
+
+    def test_main_writes_json(self, tmp_path):
+        """Test the command line writes a machine-readable result"""
+        output = tmp_path / "result.json"
+
+        main(["--listeners", "1", "--subscribers", "1", "--duration", "0.1",
+              "--rate", "100", "--trace-memory", "--output", str(output)])
+
+        result = json.loads(output.read_text())
+        assert result["config"]["listeners"] == 1
+        assert result["results"]["memoryPerListenerBytes"] > 0
@@ -0,0 +1,38 @@
+import json
+
+from benchmarks.model_benchmark import MODELS, dict_twin, main, run_benchmark
+
+
+class TestModelBenchmark:
+    """Smoke test of the data model benchmark"""
+
+    def test_models_are_slotted(self):
+        """Test the measured models keep no instance __dict__"""
+        for model, arguments in MODELS.values():
+            assert not hasattr(model(*arguments()), "__dict__")
+
+    def test_dict_twin_behaves_like_the_model(self):
+        """Test the twin builds the same object with a __dict__"""
+        model, arguments = MODELS["EventModel"]
+        twin = dict_twin(model)
+
+        instance = twin(*arguments())
+        assert hasattr(instance, "__dict__")
+        assert instance.to_json() == model(*arguments()).to_json()
+
+    def test_slotted_models_use_less_memory(self):
+        """Test every slotted model is smaller than its __dict__ twin"""
+        results = run_benchmark(instances=2000)["results"]
+
+        assert set(results) == set(MODELS)
+        for result in results.values():
+            assert result["slotted"]["bytesPerInstance"] < result["dict"]["bytesPerInstance"]
+            assert result["slotted"]["instancesPerSecond"] > 0
+
+    def test_main_writes_json(self, tmp_path):
+        """Test the command line writes a machine-readable result"""
+        output = tmp_path / "models.json"
+
+        main(["--instances", "100", "--models", "MqttReadingModel", "--output", str(output)])
+
+        assert list(json.loads(output.read_text())["results"]) == ["MqttReadingModel"]
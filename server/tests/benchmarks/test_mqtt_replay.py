@@ -0,0 +1,67 @@
+import json
+
+from benchmarks.mqtt_replay import ReplayConfig, ReplayTarget, main, run_replay
+from modules.titanium_mqtt.traffic_recorder import TrafficRecorder
+
+SYSTEM_MESSAGE = {"command_index": 2, "device_id": "replayGw", "ip_address": "10.0.0.1", "uptime": 1,
+                  "sensors": [{"index": 0, "unit": "°C", "state": 0, "gain": 1, "offset": 0},
+                              {"index": 1, "unit": "V", "state": 0, "gain": 1, "offset": 0}]}
+
+
+def _record(path, reports=20, duplicates=0):
+    recorder = TrafficRecorder(str(path))
+    recorder.record("iocloud/response/replayGw/command", json.dumps(SYSTEM_MESSAGE).encode(), 1000.0)
+    for index in range(reports):
+        payload = json.dumps({"timestamp": 1000000000 + index,
+                              "sensors": [{"value": index, "active": True},
+                                          {"value": 220, "active": True}]}).encode()
+        recorder.record("iocloud/response/replayGw/sensor/report", payload, 1000.0 + index * 0.001)
+        if index < duplicates:
+            recorder.record("iocloud/response/replayGw/sensor/report", payload, 1000.0 + index * 0.001)
+    recorder.close()
+    return str(path)
+
+
+class TestMqttReplay:
+    """Smoke test of the MQTT replay driver"""
+
+    def test_translator_target(self, tmp_path):
+        """Test every recorded message is translated"""
+        path = _record(tmp_path / "traffic.rec")
+
+        results = run_replay(ReplayConfig(path, ReplayTarget.TRANSLATOR))["results"]
+
+        assert results["messages"] == 21
+        assert results["errors"] == 0
+        assert results["stagesMs"]["translate"]["count"] == 21
+
+    def test_handler_target_delivers_reports(self, tmp_path):
+        """Test reports fed through the handler reach a subscriber once"""
+        path = _record(tmp_path / "traffic.rec", duplicates=5)
+
+        results = run_replay(ReplayConfig(path, ReplayTarget.HANDLER, drain_timeout=5))["results"]
+
+        assert results["messages"] == 26
+        assert results["reportsDelivered"] == 20
+        assert results["ingestFilter"]["duplicates"] == 5
+        # Traced per delivered status, the gateway status of the system message included
+        assert results["stagesMs"]["endToEnd.replay"]["count"] == 21
+        assert results["stagesMs"]["translate"]["count"] >= 1
+
+    def test_paced_replay(self, tmp_path):
+        """Test the recorded pace is followed at the requested speed"""
+        path = _record(tmp_path / "traffic.rec", reports=5)
+
+        results = run_replay(ReplayConfig(path, ReplayTarget.TRANSLATOR, speed=0.1))["results"]
+
+        # 4 ms of traffic at a tenth of the speed
+        assert results["elapsedSeconds"] >= 0.04
+
+    def test_main_writes_json(self, tmp_path):
+        """Test the command line writes a machine-readable result"""
+        path = _record(tmp_path / "traffic.rec", reports=2)
+        output = tmp_path / "replay.json"
+
+        main([path, "--target", "translator", "--output", str(output)])
+
+        assert json.loads(output.read_text())["results"]["messages"] == 3
@@ -2,11 +2,17 @@ import pytest
 from unittest.mock import MagicMock, patch, call
 import multiprocessing
 import threading
+import time
+import asyncio
 from collections.abc import Callable
 
-from middleware.client_middleware import ClientMiddleware
+from middleware.client_middleware import ClientMiddleware, CommandError, CommandTimeoutError
+from middleware.middleware import SHUTDOWN_MESSAGE, Middleware, UnknownCommandError
+from middleware.shared_memory_ring import SharedMemoryRing
 from middleware.subscriber_interface import SubscriberInterface
+from middleware.subscriber_dispatcher import DispatchMode
 from middleware.subscriber_manager import SubscriberManager
+from middleware.status_subscriber import StatuSubscribers
 
 
 @pytest.fixture
@@ -88,6 +94,8 @@ class TestCommandManagement:
         client_middleware.add_commands(commands)
 
         assert client_middleware._commands_available == commands
+        client_middleware._global_middleware.register_commands.assert_called_once_with(
+            "test_client", commands.keys())
 
     def test_add_commands_merge_existing(self, client_middleware):
         """Test adding commands merges with existing commands"""
@@ -134,9 +142,12 @@ class TestSubscriptionManagement:
             # Check that SubscriberManager was created
             mock_subscriber_manager_class.assert_called_once_with(
                 mock_subscriber)
-            # Check that subscriber was added
-            mock_subscriber_manager.add_subscriber.assert_called_once_with(
-                mock_subscriber)
+            # Check that subscriber was added with an inline dispatcher
+            mock_subscriber_manager.add_subscriber.assert_called_once()
+            subscriber, dispatcher = mock_subscriber_manager.add_subscriber.call_args[0]
+            assert subscriber is mock_subscriber
+            assert dispatcher.subscriber is mock_subscriber
+            assert dispatcher.mode == DispatchMode.INLINE
             # Check that subscriber manager was stored
             assert status_name in client_middleware._subscribers
 
@@ -149,8 +160,8 @@ class TestSubscriptionManagement:
         client_middleware.add_subscribe_to_status(mock_subscriber, status_name)
 
         # Check that existing subscriber manager was used
-        mock_subscriber_manager.add_subscriber.assert_called_once_with(
-            mock_subscriber)
+        mock_subscriber_manager.add_subscriber.assert_called_once()
+        assert mock_subscriber_manager.add_subscriber.call_args[0][0] is mock_subscriber
 
     def test_remove_subscribe_from_status_existing(self, client_middleware, mock_subscriber):
         """Test removing subscription from existing status"""
@@ -164,6 +175,27 @@ class TestSubscriptionManagement:
         mock_subscriber_manager.remove_subscriber.assert_called_once_with(
             "test_subscriber_id")
 
+    def test_add_subscribe_to_status_indexes_subscription(self, client_middleware):
+        """Test that a new subscription is reachable through the index"""
+        subscriber = StatuSubscribers(MagicMock(), "gateway1-*-*")
+
+        client_middleware.add_subscribe_to_status(subscriber, "gateway1-*-*")
+
+        assert client_middleware._subscription_index.match("gateway1-sensor1-temp") == (
+            client_middleware._subscribers["gateway1-*-*"],)
+
+    def test_remove_last_subscriber_drops_subscription(self, client_middleware):
+        """Test that removing the last subscriber removes the status from the index"""
+        subscriber = StatuSubscribers(MagicMock(), "gateway1-*-*")
+        client_middleware.add_subscribe_to_status(subscriber, "gateway1-*-*")
+
+        client_middleware.remove_subscribe_from_status(
+            subscriber, "gateway1-*-*")
+
+        assert "gateway1-*-*" not in client_middleware._subscribers
+        assert client_middleware._subscription_index.match(
+            "gateway1-sensor1-temp") == ()
+
     def test_remove_subscribe_from_status_nonexistent(self, client_middleware, mock_subscriber):
         """Test removing subscription from non-existent status"""
         status_name = "nonexistent_status"
@@ -187,19 +219,59 @@ class TestCommandSending:
         callback = MagicMock()
         error_handler = MagicMock()
 
-        client_middleware._global_middleware.send_command.return_value = "request_id_123"
-
-        client_middleware.send_command(
+        request_id = client_middleware.send_command(
             command_name, data, callback, error_handler)
 
-        # Check that global middleware was called
+        # Check that global middleware was called with the client as reply-to
         client_middleware._global_middleware.send_command.assert_called_once_with(
-            command_name, data
+            command_name, data, "test_client", request_id
         )
         # Check that callbacks were stored
-        assert client_middleware._request_queue["request_id_123"] == (
+        assert client_middleware._request_queue[request_id] == (
             callback, error_handler)
 
+    def test_send_command_without_callbacks(self, client_middleware):
+        """Test fire and forget commands do not ask for an answer"""
+        request_id = client_middleware.send_command("test_command", {})
+
+        client_middleware._global_middleware.send_command.assert_called_once_with(
+            "test_command", {}, None, request_id
+        )
+        assert request_id not in client_middleware._request_queue
+
+    def test_send_unknown_command_calls_error_handler(self, client_middleware):
+        """Test unknown commands fail fast through the error handler"""
+        client_middleware._global_middleware.send_command.side_effect = UnknownCommandError(
+            "no listener handles command test_command")
+        callback = MagicMock()
+        error_handler = MagicMock()
+
+        request_id = client_middleware.send_command(
+            "test_command", {}, callback, error_handler)
+
+        assert request_id is None
+        callback.assert_not_called()
+        error_handler.assert_called_once()
+        assert error_handler.call_args[0][0]["result"] is False
+        assert client_middleware._request_queue == {}
+
+    def test_send_command_round_trip(self):
+        """Test a command reaches its owner and the answer its requester"""
+        middleware = Middleware()
+        owner = ClientMiddleware(middleware, "owner")
+        requester = ClientMiddleware(middleware, "requester")
+        owner.add_commands({"double": lambda command: owner.send_command_answear(
+            True, command["data"] * 2, command["requestId"])})
+        callback = MagicMock()
+
+        requester.send_command("double", 21, callback)
+        owner.run_middleware_update()
+        requester.run_middleware_update()
+
+        callback.assert_called_once()
+        assert callback.call_args[0][0]["data"] == 42
+        assert requester._request_queue == {}
+
     def test_send_command_answear(self, client_middleware):
         """Test sending command answer"""
         result = True
@@ -237,64 +309,6 @@ class TestStatusSending:
             status_list)
 
 
-class TestSubscriptionMatching:
-    """Test subscription matching logic"""
-
-    def test_check_if_subscribed_exact_match(self, client_middleware):
-        """Test exact subscription match"""
-        subscriber_status_name = "gateway1-sensor1-temp"
-        status_name = "gateway1-sensor1-temp"
-
-        result = client_middleware._check_if_subscribed(
-            subscriber_status_name, status_name)
-        assert result is True
-
-    def test_check_if_subscribed_wildcard_gateway(self, client_middleware):
-        """Test subscription match with wildcard gateway"""
-        subscriber_status_name = "*-sensor1-temp"
-        status_name = "gateway1-sensor1-temp"
-
-        result = client_middleware._check_if_subscribed(
-            subscriber_status_name, status_name)
-        assert result is True
-
-    def test_check_if_subscribed_wildcard_topic(self, client_middleware):
-        """Test subscription match with wildcard topic"""
-        subscriber_status_name = "gateway1-*-temp"
-        status_name = "gateway1-sensor1-temp"
-
-        result = client_middleware._check_if_subscribed(
-            subscriber_status_name, status_name)
-        assert result is True
-
-    def test_check_if_subscribed_wildcard_indicator(self, client_middleware):
-        """Test subscription match with wildcard indicator"""
-        subscriber_status_name = "gateway1-sensor1-*"
-        status_name = "gateway1-sensor1-temp"
-
-        result = client_middleware._check_if_subscribed(
-            subscriber_status_name, status_name)
-        assert result is True
-
-    def test_check_if_subscribed_no_match(self, client_middleware):
-        """Test subscription with no match"""
-        subscriber_status_name = "gateway1-sensor1-temp"
-        status_name = "gateway2-sensor2-humidity"
-
-        result = client_middleware._check_if_subscribed(
-            subscriber_status_name, status_name)
-        assert result is False
-
-    def test_check_if_subscribed_partial_wildcard_match(self, client_middleware):
-        """Test subscription match with partial wildcards"""
-        subscriber_status_name = "*-*-*"
-        status_name = "gateway1-sensor1-temp"
-
-        result = client_middleware._check_if_subscribed(
-            subscriber_status_name, status_name)
-        assert result is True
-
-
 class TestMiddlewareUpdateSystem:
     """Test middleware update system"""
 
@@ -338,6 +352,24 @@ class TestMiddlewareUpdateSystem:
             client_middleware.run_middleware_update()
             mock_status_update.assert_called_once_with(status_data)
 
+    def test_run_middleware_update_status_batch(self):
+        """Test a batch envelope is unpacked and dispatched locally"""
+        client = ClientMiddleware(Middleware(), "test_client")
+        subscriber_manager = MagicMock()
+        client._subscription_index.add("gateway1-*-*", subscriber_manager)
+
+        client.send_status_array([
+            {"statusName": "gateway1-sensor1-temp", "data": 1},
+            {"statusName": "gateway2-sensor1-temp", "data": 2},
+            {"statusName": "gateway1-sensor2-temp", "data": 3}
+        ])
+        client.run_middleware_update()
+
+        assert subscriber_manager.send_status.call_args_list == [
+            call("gateway1-sensor1-temp", 1),
+            call("gateway1-sensor2-temp", 3)
+        ]
+
     def test_run_middleware_update_empty_queue(self, client_middleware):
         """Test run_middleware_update with empty queue"""
         with patch.object(client_middleware, '_command_update') as mock_command_update, \
@@ -421,15 +453,18 @@ class TestMiddlewareUpdateSystem:
         # Setup mock subscribers
         mock_subscriber1 = MagicMock()
         mock_subscriber2 = MagicMock()
-        client_middleware._subscribers["gateway1-*-*"] = mock_subscriber1
-        client_middleware._subscribers["gateway2-*-*"] = mock_subscriber2
+        client_middleware._subscription_index.add(
+            "gateway1-*-*", mock_subscriber1)
+        client_middleware._subscription_index.add(
+            "gateway2-*-*", mock_subscriber2)
 
         status_data = {
             "name": "gateway1-sensor1-temp",
             "data": {"value": 25.5}
         }
 
-        with patch.object(client_middleware._data_converter, 'convert_data') as mock_convert:
+        with patch.object(client_middleware._data_converter, 'has_converter', return_value=True), \
+                patch.object(client_middleware._data_converter, 'convert_data') as mock_convert:
             # Generate a status that follows the gateway-topic-indicator pattern
             mock_convert.return_value = [
                 {"name": "gateway1-generated-temp", "value": 30.0}]
@@ -449,7 +484,8 @@ class TestMiddlewareUpdateSystem:
         """Test status update with no matching subscribers"""
         # Setup mock subscribers that don't match
         mock_subscriber = MagicMock()
-        client_middleware._subscribers["gateway2-*-*"] = mock_subscriber
+        client_middleware._subscription_index.add(
+            "gateway2-*-*", mock_subscriber)
 
         status_data = {
             "name": "gateway1-sensor1-temp",
@@ -465,6 +501,478 @@ class TestMiddlewareUpdateSystem:
             mock_subscriber.send_status.assert_not_called()
 
 
+class TestEventDrivenUpdate:
+    """Test blocking consumption and wakeups"""
+
+    def test_wait_middleware_update_dispatches_and_drains(self):
+        """Test a blocking wait dispatches every queued message"""
+        client = ClientMiddleware(Middleware(), "test_client")
+        with patch.object(client, '_status_update') as mock_status_update:
+            client.send_status("gateway1-sensor1-temp", 1)
+            client.send_status("gateway1-sensor1-temp", 2)
+
+            assert client.wait_middleware_update(timeout=1) is True
+            assert mock_status_update.call_count == 2
+
+    def test_wait_middleware_update_timeout(self):
+        """Test the wait returns when nothing arrives before the timeout"""
+        client = ClientMiddleware(Middleware(), "test_client")
+        assert client.wait_middleware_update(timeout=0.01) is True
+
+    def test_stop_ends_middleware_loop(self):
+        """Test the shutdown sentinel makes the blocking loop return"""
+        client = ClientMiddleware(Middleware(), "test_client")
+        loop_thread = threading.Thread(target=client.run_middleware_loop)
+        loop_thread.start()
+
+        client.stop()
+        loop_thread.join(timeout=2)
+
+        assert not loop_thread.is_alive()
+
+    def test_set_wakeup_callback_in_process(self):
+        """Test published messages wake in-process consumers"""
+        callback = MagicMock()
+        client = ClientMiddleware(Middleware(), "test_client")
+
+        assert client.set_wakeup_callback(callback) is True
+        client.send_status("gateway1-sensor1-temp", 1)
+
+        callback.assert_called_once()
+
+    def test_set_wakeup_callback_multiprocessing_unsupported(self, client_middleware):
+        """Test wakeups are refused for listeners in another process"""
+        assert client_middleware.set_wakeup_callback(MagicMock()) is False
+
+
+class TestDataConversionStage:
+    """Test the converter stage of status dispatch"""
+
+    def test_status_without_converter_skips_conversion(self, client_middleware):
+        """Test topics with no converter never reach convert_data"""
+        status_data = {"name": "gateway1-status-*", "data": {"value": 1}}
+
+        with patch.object(client_middleware._data_converter, 'convert_data') as mock_convert:
+            client_middleware._status_update(status_data)
+            mock_convert.assert_not_called()
+
+
+class TestLastValueReplay:
+    """Test replaying cached statuses to late subscribers"""
+
+    def test_replay_last_value_on_subscribe(self):
+        """Test a replaying subscriber receives the current value of matching statuses"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        middleware.send_status("gateway1-status-*", {"value": 1})
+        middleware.send_status("gateway1-status-*", {"value": 2})
+        middleware.send_status("gateway2-status-*", {"value": 3})
+
+        received = []
+        subscriber = StatuSubscribers(received.append, "*-status-*")
+        with patch.object(client._data_converter, 'has_converter', return_value=False):
+            client.add_subscribe_to_status(
+                subscriber, "*-status-*", replay_last_value=True)
+
+        assert sorted((item["name"], item["data"]["value"]) for item in received) == [
+            ("gateway1-status-*", 2), ("gateway2-status-*", 3)]
+        assert all(item["subStatusName"] == "*-status-*" for item in received)
+
+    def test_no_replay_by_default(self):
+        """Test subscribers only see new statuses unless they ask for a replay"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        middleware.send_status("gateway1-status-*", {"value": 1})
+
+        received = []
+        client.add_subscribe_to_status(StatuSubscribers(
+            received.append, "gateway1-status-*"), "gateway1-status-*")
+
+        assert received == []
+
+    def test_replay_only_new_subscriber(self):
+        """Test existing subscribers of the same status are not replayed to again"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        middleware.send_status("gateway1-status-*", {"value": 1})
+
+        first, second = [], []
+        client.add_subscribe_to_status(StatuSubscribers(
+            first.append, "gateway1-status-*"), "gateway1-status-*")
+        client.add_subscribe_to_status(StatuSubscribers(
+            second.append, "gateway1-status-*"), "gateway1-status-*", replay_last_value=True)
+
+        assert first == []
+        assert len(second) == 1
+
+    def test_live_status_is_not_overwritten_by_replay(self):
+        """Test a status dispatched while the replay runs reaches the subscriber after it"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        client.add_subscribe_to_status(StatuSubscribers(lambda _: None, "gateway1-status-*"), "gateway1-status-*")
+        middleware.send_status("gateway1-status-*", {"value": 1})
+        client.run_middleware_update()
+
+        received = []
+        replay_started = threading.Event()
+        live_dispatched = threading.Event()
+
+        def on_status(status_info):
+            if not replay_started.is_set():
+                replay_started.set()
+                # Without the lock the live status would be delivered meanwhile
+                live_dispatched.wait(0.2)
+            received.append(status_info["data"]["value"])
+
+        def publish_live():
+            replay_started.wait(1)
+            middleware.send_status("gateway1-status-*", {"value": 2})
+            client.run_middleware_update()
+            live_dispatched.set()
+
+        publisher = threading.Thread(target=publish_live)
+        publisher.start()
+        client.add_subscribe_to_status(StatuSubscribers(on_status, "gateway1-status-*"),
+                                       "gateway1-status-*", replay_last_value=True)
+        publisher.join(timeout=2)
+
+        assert received == [1, 2]
+
+    def test_get_last_status(self):
+        """Test the last value of a status is read from the shared middleware"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        middleware.send_status_array([{"statusName": "gateway1-status-*", "data": "report"}])
+
+        assert client.get_last_status("gateway1-status-*") == "report"
+        assert client.get_last_status("gateway2-status-*") is None
+
+
+class TestCommandDeadlines:
+    """Test futures and deadlines of pending requests"""
+
+    @pytest.fixture
+    def clients(self):
+        middleware = Middleware()
+        requester = ClientMiddleware(middleware, "requester")
+        owner = ClientMiddleware(middleware, "owner")
+        return middleware, requester, owner
+
+    def test_future_resolves_with_answer(self, clients):
+        """Test the future receives the answer once the requester dispatches it"""
+        _, requester, owner = clients
+        owner.add_commands({"do": lambda command: owner.send_command_answear(
+            True, {"ok": 1}, command["requestId"])})
+
+        future = requester.send_command_future("do", {})
+        owner.run_middleware_update()
+        assert not future.done()
+        requester.run_middleware_update()
+
+        assert future.result(timeout=0)["data"] == {"ok": 1}
+        assert requester.get_request_metrics() == {
+            "pending": 0, "answered": 1, "timedOut": 0}
+
+    def test_future_raises_error_answer(self, clients):
+        """Test an error answer raises CommandError with the answer attached"""
+        _, requester, owner = clients
+        owner.add_commands({"do": lambda command: owner.send_command_answear(
+            False, "bad request", command["requestId"])})
+
+        future = requester.send_command_future("do", {})
+        owner.run_middleware_update()
+        requester.run_middleware_update()
+
+        with pytest.raises(CommandError) as error:
+            future.result(timeout=0)
+        assert error.value.answer["data"] == "bad request"
+
+    def test_unknown_command_future(self, clients):
+        """Test a command without owner fails the future right away"""
+        _, requester, _ = clients
+        future = requester.send_command_future("missing", {})
+
+        with pytest.raises(CommandError):
+            future.result(timeout=0)
+        assert requester.get_request_metrics()["pending"] == 0
+
+    def test_request_expires(self, clients):
+        """Test an unanswered request is removed and reported as timed out"""
+        middleware, requester, _ = clients
+        requester.add_commands({})
+        ClientMiddleware(middleware, "silent").add_commands(
+            {"do": lambda command: None})
+        error_handler = MagicMock()
+
+        request_id = requester.send_command(
+            "do", {}, MagicMock(), error_handler, timeout=0)
+        time.sleep(requester._request_deadlines.tick_seconds * 2)
+        requester.expire_requests()
+
+        error_handler.assert_called_once()
+        answer = error_handler.call_args[0][0]
+        assert answer["requestId"] == request_id
+        assert answer["timedOut"] is True
+        assert request_id not in middleware._pending_replies
+        assert requester.get_request_metrics() == {
+            "pending": 0, "answered": 0, "timedOut": 1}
+
+    def test_timeout_future(self, clients):
+        """Test a future whose deadline expires raises CommandTimeoutError"""
+        _, requester, owner = clients
+        owner.add_commands({"do": lambda command: None})
+
+        with patch.object(requester._request_deadlines, 'advance') as mock_advance:
+            future = requester.send_command_future("do", {})
+            request_id = next(iter(requester._request_queue))
+            mock_advance.return_value = [request_id]
+            requester.expire_requests()
+
+        with pytest.raises(CommandTimeoutError):
+            future.result(timeout=0)
+
+    def test_late_answer_is_ignored(self, clients):
+        """Test an answer arriving after the deadline calls nothing"""
+        _, requester, _ = clients
+        callback = MagicMock()
+        requester.send_command("missing", {}, callback)
+        requester._command_update({"name": "", "result": True, "data": {},
+                                   "requestId": "late", "isCommand": True})
+
+        callback.assert_not_called()
+        assert requester.get_request_metrics()["answered"] == 0
+
+    def test_send_command_async(self, clients):
+        """Test the coroutine API awaits the answer"""
+        _, requester, owner = clients
+        owner.add_commands({"do": lambda command: owner.send_command_answear(
+            True, "done", command["requestId"])})
+
+        async def run():
+            pending = asyncio.ensure_future(
+                requester.send_command_async("do", {}))
+            await asyncio.sleep(0)
+            owner.run_middleware_update()
+            requester.run_middleware_update()
+            return await pending
+
+        assert asyncio.run(run())["data"] == "done"
+
+
+class TestSubscriptionDispatch:
+    """Test per-subscription dispatch modes"""
+
+    def test_serial_subscriber_does_not_block_inline(self):
+        """Test a slow serial subscriber runs off the draining thread"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        release = threading.Event()
+        slow_done = threading.Event()
+        fast = MagicMock()
+
+        def slow_handler(status_info):
+            release.wait(timeout=5)
+            slow_done.set()
+
+        client.add_subscribe_to_status(StatuSubscribers(slow_handler, "gw-status-*"), "gw-status-*",
+                                       dispatch_mode=DispatchMode.SERIAL)
+        client.add_subscribe_to_status(
+            StatuSubscribers(fast, "*-status-*"), "*-status-*")
+
+        with patch.object(client._data_converter, 'has_converter', return_value=False):
+            middleware.send_status("gw-status-*", 1)
+            client.run_middleware_update()
+
+        fast.assert_called_once()
+        assert not slow_done.is_set()
+        release.set()
+        assert slow_done.wait(timeout=5)
+
+    def test_serial_subscriber_keeps_order(self):
+        """Test a serial subscriber receives statuses in publish order"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        received = []
+        done = threading.Event()
+
+        def handler(status_info):
+            received.append(status_info["data"])
+            if len(received) == 50:
+                done.set()
+
+        client.add_subscribe_to_status(StatuSubscribers(handler, "gw-status-*"), "gw-status-*",
+                                       dispatch_mode=DispatchMode.SERIAL)
+        with patch.object(client._data_converter, 'has_converter', return_value=False):
+            for index in range(50):
+                middleware.send_status("gw-status-*", index)
+            client.run_middleware_update()
+
+        assert done.wait(timeout=5)
+        assert received == list(range(50))
+
+    def test_pool_subscribers_share_executor(self):
+        """Test pool subscriptions run on the client shared pool"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        done = threading.Event()
+        threads = []
+
+        def handler(status_info):
+            threads.append(threading.current_thread().name)
+            done.set()
+
+        client.add_subscribe_to_status(StatuSubscribers(handler, "gw-status-*"), "gw-status-*",
+                                       dispatch_mode=DispatchMode.POOL)
+        with patch.object(client._data_converter, 'has_converter', return_value=False):
+            middleware.send_status("gw-status-*", 1)
+            client.run_middleware_update()
+
+        assert done.wait(timeout=5)
+        assert threads[0].startswith("client-dispatch")
+
+    def test_serial_lane_shared_by_subscriptions(self):
+        """Test serial subscriptions of one lane run in order on a single thread"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        received = []
+        threads = set()
+        done = threading.Event()
+
+        def handler(status_info):
+            threads.add(threading.current_thread().name)
+            received.append(status_info["name"])
+            if len(received) == 200:
+                done.set()
+
+        for gateway in range(200):
+            topic = f"gw{gateway}-status-*"
+            client.add_subscribe_to_status(StatuSubscribers(handler, topic), topic,
+                                           dispatch_mode=DispatchMode.SERIAL, serial_lane="socket")
+        with patch.object(client._data_converter, 'has_converter', return_value=False):
+            for gateway in range(200):
+                middleware.send_status(f"gw{gateway}-status-*", gateway)
+            client.run_middleware_update()
+
+        assert done.wait(timeout=5)
+        assert received == [f"gw{gateway}-status-*" for gateway in range(200)]
+        assert len(threads) == 1
+        assert threads.pop().startswith("client-socket")
+
+    def test_close_serial_lane(self):
+        """Test a closed lane stops its thread and later statuses are not delivered"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        handler = MagicMock()
+        subscriber = StatuSubscribers(handler, "gw-status-*")
+        client.add_subscribe_to_status(subscriber, "gw-status-*",
+                                       dispatch_mode=DispatchMode.SERIAL, serial_lane="socket")
+        lane = client._serial_lanes["socket"]
+
+        client.close_serial_lane("socket")
+        with patch.object(client._data_converter, 'has_converter', return_value=False):
+            middleware.send_status("gw-status-*", 1)
+            client.run_middleware_update()
+
+        assert "socket" not in client._serial_lanes
+        assert lane._shutdown
+        handler.assert_not_called()
+
+    def test_inline_subscriber_error_does_not_reach_the_loop(self):
+        """Test an inline subscriber that raises is logged and the others still get every status"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        failing = StatuSubscribers(MagicMock(side_effect=ValueError("boom")), "gw-status-*")
+        client.add_subscribe_to_status(failing, "gw-status-*")
+        received = []
+        client.add_subscribe_to_status(StatuSubscribers(received.append, "gw-status-*"), "gw-status-*")
+        dispatcher = client._subscribers["gw-status-*"]._subscriber_map[failing.get_id()]
+        dispatcher._logger = MagicMock()
+
+        with patch.object(client._data_converter, 'has_converter', return_value=False):
+            middleware.send_status("gw-status-*", 1)
+            middleware.send_status("gw-status-*", 2)
+            assert client.run_middleware_update() is True
+
+        assert [status_info["data"] for status_info in received] == [1, 2]
+        assert dispatcher._logger.error.call_count == 2
+        assert "boom" in dispatcher._logger.error.call_args.args[0]
+
+    def test_subscription_stats(self):
+        """Test handler latency and errors are reported per subscription"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "client")
+        subscriber = StatuSubscribers(MagicMock(side_effect=ValueError("boom")), "gw-status-*")
+        client.add_subscribe_to_status(subscriber, "gw-status-*")
+
+        with patch.object(client._data_converter, 'has_converter', return_value=False):
+            middleware.send_status("gw-status-*", 1)
+            client.run_middleware_update()
+
+        stats = client.get_subscription_stats()["gw-status-*"][subscriber.get_id()]
+        assert stats["mode"] == DispatchMode.INLINE
+        assert stats["calls"] == 1
+        assert stats["errors"] == 1
+        assert stats["handlerTimeMaxMs"] >= 0
+        assert stats["queueTimeMaxMs"] == 0
+
+
+def _answer_commands(middleware):
+    owner = ClientMiddleware(middleware, "owner", use_multiprocessing=True)
+    owner.add_commands({"do": lambda command: owner.send_command_answear(
+        True, command["data"] * 2, command["requestId"])})
+    owner.run_middleware_loop()
+
+
+class TestProcessTransport:
+    """Test clients running in separate processes"""
+
+    def test_ring_status_reaches_process_client(self):
+        """Test a process client receives readings from the ring and caches them"""
+        ring = SharedMemoryRing(record_size=1024, record_count=8)
+        try:
+            middleware = Middleware(status_ring=ring)
+            client = ClientMiddleware(middleware, "client", use_multiprocessing=True)
+            subscriber = StatuSubscribers(MagicMock(), "gw1-status-*")
+            client.add_subscribe_to_status(subscriber, "gw1-status-*")
+
+            with patch.object(client._data_converter, 'has_converter', return_value=False):
+                middleware.send_status("gw1-status-*", {"value": 1})
+                client.wait_middleware_update(timeout=0.1)
+
+            subscriber._callback.assert_called_once()
+            assert client.get_last_status("gw1-status-*") == {"value": 1}
+        finally:
+            ring.close()
+            ring.unlink()
+
+    def test_command_round_trip_across_processes(self):
+        """Test a command owned by a forked process is answered to its requester"""
+        context = multiprocessing.get_context("fork")
+        sync_manager = context.Manager()
+        try:
+            middleware = Middleware(sync_manager.dict(), sync_manager.dict())
+            middleware.add_new_middleware_listener(True, "owner")
+            middleware.add_new_middleware_listener(True, "requester")
+            owner_process = context.Process(target=_answer_commands, args=(middleware,))
+            owner_process.start()
+
+            requester = ClientMiddleware(middleware, "requester", use_multiprocessing=True)
+            deadline = time.monotonic() + 10
+            while middleware._command_owners.get("do") is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+
+            future = requester.send_command_future("do", 21)
+            while not future.done() and time.monotonic() < deadline:
+                requester.wait_middleware_update(timeout=0.1)
+
+            assert future.result(timeout=0)["data"] == 42
+            middleware.get_listener_queue("owner").put(SHUTDOWN_MESSAGE)
+            owner_process.join(timeout=10)
+            assert owner_process.exitcode == 0
+        finally:
+            sync_manager.shutdown()
+
+
 class TestConcurrency:
     """Test thread safety and concurrency"""
 
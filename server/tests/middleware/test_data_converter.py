@@ -0,0 +1,60 @@
+from unittest.mock import MagicMock
+
+from middleware.data_converter.data_converter import DataConverter
+from middleware.data_converter.current import Current
+from middleware.data_converter.tag import Tag
+from middleware.data_converter.tension import Tension
+
+
+class TestDataConverterRegistry:
+    """Test the converter registry built at startup"""
+
+    def test_registry_loads_package_converters(self):
+        """Test converters are found and instantiated once per topic"""
+        converter = DataConverter()
+
+        assert isinstance(converter._converters["current"], Current)
+        assert isinstance(converter._converters["tension"], Tension)
+        assert isinstance(converter._converters["tag"], Tag)
+
+    def test_registry_reuses_instances(self):
+        """Test the same converter instance serves every status"""
+        converter = DataConverter()
+        instance = converter._converters["tag"]
+
+        converter.convert_data("tag", {"value": 1, "timestamp": 0})
+
+        assert converter._converters["tag"] is instance
+
+    def test_helper_modules_are_not_converters(self):
+        """Test modules without a matching converter class are skipped"""
+        converter = DataConverter()
+
+        assert not converter.has_converter("power_report")
+        assert not converter.has_converter("data_converter")
+
+    def test_missing_converter_is_cached_as_negative_entry(self):
+        """Test a miss is remembered instead of being looked up again"""
+        converter = DataConverter()
+
+        assert converter.has_converter("status") is False
+        assert "status" in converter._converters
+        assert converter._converters["status"] is None
+        assert converter.convert_data("status", {}) is None
+
+    def test_convert_data_uses_converter(self):
+        """Test conversion is delegated to the registered converter"""
+        converter = DataConverter()
+        data = {"value": 0x3ffcee10, "timestamp": "now"}
+
+        assert converter.convert_data("tag", data) == {
+            "value": "João Silva", "timestamp": "now"}
+
+    def test_convert_data_error_returns_none(self):
+        """Test a failing converter does not break dispatch"""
+        converter = DataConverter()
+        failing = MagicMock()
+        failing.convert_in_new_status.side_effect = Exception("boom")
+        converter._converters["failing"] = failing
+
+        assert converter.convert_data("failing", {}) is None
@@ -0,0 +1,303 @@
+import queue
+import threading
+from unittest.mock import MagicMock
+
+import pytest
+
+from middleware.listener_queue import CommandOverloadPolicy, ListenerQueue, StatusOverloadPolicy
+from middleware.middleware import Middleware
+
+
+def _status(name, value=0):
+    return {"name": name, "data": value, "isCommand": False}
+
+
+def _command(name):
+    return {"name": name, "data": {}, "requestId": name, "isCommand": True}
+
+
+class TestListenerQueueWakeup:
+    """Test wakeup notifications of the in-process listener queue"""
+
+    def test_put_without_callback(self):
+        """Test the queue works as a plain queue when no callback is set"""
+        listener_queue = ListenerQueue()
+        message = _status("message")
+        listener_queue.put(message)
+        assert listener_queue.get_nowait() is message
+
+    def test_put_calls_wakeup_callback(self):
+        """Test the callback fires when a message arrives"""
+        callback = MagicMock()
+        listener_queue = ListenerQueue()
+        listener_queue.set_wakeup_callback(callback)
+
+        listener_queue.put(_status("message"))
+
+        callback.assert_called_once()
+
+    def test_wakeup_is_coalesced_until_cleared(self):
+        """Test a burst of puts schedules a single wakeup"""
+        callback = MagicMock()
+        listener_queue = ListenerQueue()
+        listener_queue.set_wakeup_callback(callback)
+
+        for index in range(10):
+            listener_queue.put(_status("burst", index))
+        assert callback.call_count == 1
+
+        listener_queue.clear_wakeup()
+        listener_queue.put(_status("after drain"))
+        assert callback.call_count == 2
+
+    def test_set_callback_with_pending_data_wakes_immediately(self):
+        """Test data queued before the callback was set is not forgotten"""
+        callback = MagicMock()
+        listener_queue = ListenerQueue()
+        listener_queue.put(_status("message"))
+
+        listener_queue.set_wakeup_callback(callback)
+
+        callback.assert_called_once()
+
+
+class TestListenerQueueOverload:
+    """Test capacity, overload policies and metrics"""
+
+    def test_unbounded_by_default(self):
+        """Test the queue has no capacity unless configured"""
+        listener_queue = ListenerQueue()
+        for index in range(100):
+            listener_queue.put(_status("gw-status-*", index))
+
+        metrics = listener_queue.get_metrics()
+        assert metrics["depth"] == 100
+        assert metrics["capacity"] == 0
+        assert metrics["droppedStatuses"] == 0
+
+    def test_drop_oldest_status(self):
+        """Test a full queue drops its oldest status for a new one"""
+        listener_queue = ListenerQueue(2)
+        listener_queue.put(_status("a"))
+        listener_queue.put(_status("b"))
+        listener_queue.put(_status("c"))
+
+        assert [listener_queue.get_nowait()["name"] for _ in range(2)] == [
+            "b", "c"]
+        assert listener_queue.get_metrics()["droppedStatuses"] == 1
+
+    def test_dropped_batch_counts_its_statuses(self):
+        """Test dropping a batch envelope counts every status it carried"""
+        listener_queue = ListenerQueue(1)
+        listener_queue.put({"statuses": [{"name": "a", "data": 0}, {"name": "b", "data": 0},
+                                         {"name": "c", "data": 0}],
+                            "isBatch": True, "isCommand": False})
+        listener_queue.put(_status("d"))
+
+        assert listener_queue.get_nowait()["name"] == "d"
+        assert listener_queue.get_metrics()["droppedStatuses"] == 3
+
+    def test_keep_latest_conflates_same_topic(self):
+        """Test a full queue replaces the queued value of the same topic"""
+        listener_queue = ListenerQueue(
+            2, status_policy=StatusOverloadPolicy.KEEP_LATEST)
+        listener_queue.put(_status("a", 1))
+        listener_queue.put(_status("b", 1))
+        listener_queue.put(_status("a", 2))
+
+        first = listener_queue.get_nowait()
+        second = listener_queue.get_nowait()
+        assert (first["name"], first["data"]) == ("a", 2)
+        assert (second["name"], second["data"]) == ("b", 1)
+        assert listener_queue.get_metrics()["conflatedStatuses"] == 1
+        assert listener_queue.get_metrics()["droppedStatuses"] == 0
+
+    def test_keep_latest_new_topic_drops_oldest(self):
+        """Test a new topic on a full conflating queue drops the oldest status"""
+        listener_queue = ListenerQueue(
+            2, status_policy=StatusOverloadPolicy.KEEP_LATEST)
+        listener_queue.put(_status("a"))
+        listener_queue.put(_status("b"))
+        listener_queue.put(_status("c"))
+
+        assert [listener_queue.get_nowait()["name"] for _ in range(2)] == [
+            "b", "c"]
+
+    def test_command_replaces_status(self):
+        """Test commands are never dropped, queued statuses make room for them"""
+        listener_queue = ListenerQueue(1)
+        listener_queue.put(_status("a"))
+        listener_queue.put(_command("cmd"))
+
+        assert listener_queue.get_nowait()["name"] == "cmd"
+        assert listener_queue.get_metrics()["droppedStatuses"] == 1
+
+    def test_status_dropped_when_only_commands_queued(self):
+        """Test a status is discarded instead of blocking the publisher"""
+        listener_queue = ListenerQueue(1)
+        listener_queue.put(_command("cmd"))
+        listener_queue.put(_status("a"))
+
+        assert listener_queue.qsize() == 1
+        assert listener_queue.get_nowait()["name"] == "cmd"
+        assert listener_queue.get_metrics()["droppedStatuses"] == 1
+
+    def test_command_raise_policy(self):
+        """Test the raise policy rejects commands on a queue full of commands"""
+        listener_queue = ListenerQueue(
+            1, command_policy=CommandOverloadPolicy.RAISE)
+        listener_queue.put(_command("first"))
+
+        with pytest.raises(queue.Full):
+            listener_queue.put(_command("second"))
+        assert listener_queue.get_metrics()["rejectedCommands"] == 1
+
+    def test_command_block_policy_waits_for_consumer(self):
+        """Test the block policy waits until the consumer makes room"""
+        listener_queue = ListenerQueue(1)
+        listener_queue.put(_command("first"))
+
+        consumer = threading.Timer(0.05, listener_queue.get_nowait)
+        consumer.start()
+        listener_queue.put(_command("second"), timeout=2)
+        consumer.join()
+
+        assert listener_queue.get_nowait()["name"] == "second"
+
+    def test_command_block_policy_timeout(self):
+        """Test a blocked command gives up after the timeout"""
+        listener_queue = ListenerQueue(1)
+        listener_queue.put(_command("first"))
+
+        with pytest.raises(queue.Full):
+            listener_queue.put(_command("second"), timeout=0.01)
+
+    def test_high_water_mark(self):
+        """Test the high-water mark keeps the deepest level reached"""
+        listener_queue = ListenerQueue()
+        for index in range(5):
+            listener_queue.put(_status("a", index))
+        for _ in range(5):
+            listener_queue.get_nowait()
+
+        metrics = listener_queue.get_metrics()
+        assert metrics["depth"] == 0
+        assert metrics["highWaterMark"] == 5
+        assert metrics["enqueued"] == 5
+
+
+class TestListenerQueueLanes:
+    """Test command and status priority lanes"""
+
+    def test_commands_served_before_statuses(self):
+        """Test a command queued after a burst of statuses is served first"""
+        listener_queue = ListenerQueue()
+        for index in range(5):
+            listener_queue.put(_status("gw-status-*", index))
+        listener_queue.put(_command("addPanel"))
+
+        assert listener_queue.get_nowait()["name"] == "addPanel"
+        assert [listener_queue.get_nowait()["data"] for _ in range(5)] == list(range(5))
+
+    def test_shutdown_uses_command_lane(self):
+        """Test a stop request is not stuck behind queued statuses"""
+        listener_queue = ListenerQueue()
+        listener_queue.put(_status("gw-status-*"))
+        listener_queue.put({"isCommand": False, "isShutdown": True})
+
+        assert listener_queue.get_nowait().get("isShutdown")
+
+    def test_starvation_guard(self):
+        """Test a waiting status goes through after the configured commands in a row"""
+        listener_queue = ListenerQueue(starvation_limit=2)
+        listener_queue.put(_status("gw-status-*"))
+        for index in range(4):
+            listener_queue.put(_command(f"cmd{index}"))
+
+        names = [listener_queue.get_nowait()["name"] for _ in range(5)]
+
+        assert names == ["cmd0", "cmd1", "gw-status-*", "cmd2", "cmd3"]
+        assert listener_queue.get_metrics()["starvationPromotions"] == 1
+
+    def test_lane_metrics(self):
+        """Test each lane reports depth, dispatches and wait time"""
+        listener_queue = ListenerQueue()
+        listener_queue.put(_status("gw-status-*"))
+        listener_queue.put(_status("gw-status-*"))
+        listener_queue.put(_command("cmd"))
+        listener_queue.get_nowait()
+
+        lanes = listener_queue.get_metrics()["lanes"]
+        assert lanes["command"]["dispatched"] == 1
+        assert lanes["command"]["depth"] == 0
+        assert lanes["status"]["dispatched"] == 0
+        assert lanes["status"]["depth"] == 2
+        assert lanes["command"]["waitMaxMs"] >= 0
+
+
+class TestListenerQueueBatchConflation:
+    """Test keep-latest conflation of batch envelopes published through the middleware"""
+
+    @staticmethod
+    def _statuses(gateways, value):
+        return [{"statusName": f"gw{gateway}-status-*", "data": value} for gateway in gateways]
+
+    @staticmethod
+    def _drain(listener_queue):
+        latest = {}
+        while not listener_queue.empty():
+            message = listener_queue.get_nowait()
+            for status in message["statuses"]:
+                latest[status["name"]] = status["data"]
+        return latest
+
+    def test_overload_keeps_latest_value_per_gateway(self):
+        """Test batches of the same gateways replace each other's statuses instead of being dropped"""
+        middleware = Middleware()
+        listener_queue = middleware.add_new_middleware_listener(
+            capacity=3, status_policy=StatusOverloadPolicy.KEEP_LATEST)
+
+        for value in range(6):
+            middleware.send_status_array(self._statuses(range(10), value))
+
+        metrics = listener_queue.get_metrics()
+        assert metrics["droppedStatuses"] == 0
+        assert metrics["conflatedStatuses"] == 30
+        assert self._drain(listener_queue) == {f"gw{gateway}-status-*": 5 for gateway in range(10)}
+
+    def test_overload_keeps_every_gateway_of_disjoint_batches(self):
+        """Test batches of different gateways are merged instead of dropping the oldest one"""
+        middleware = Middleware()
+        listener_queue = middleware.add_new_middleware_listener(
+            capacity=2, status_policy=StatusOverloadPolicy.KEEP_LATEST)
+
+        for shard in range(5):
+            middleware.send_status_array(self._statuses(range(shard * 4, shard * 4 + 4), shard))
+
+        assert listener_queue.qsize() == 2
+        assert listener_queue.get_metrics()["droppedStatuses"] == 0
+        assert self._drain(listener_queue) == {f"gw{gateway}-status-*": gateway // 4 for gateway in range(20)}
+
+    def test_conflation_does_not_edit_shared_envelopes(self):
+        """Test a batch conflated in one listener is still complete in another"""
+        middleware = Middleware()
+        conflating = middleware.add_new_middleware_listener(
+            capacity=1, status_policy=StatusOverloadPolicy.KEEP_LATEST)
+        unbounded = middleware.add_new_middleware_listener()
+
+        middleware.send_status_array(self._statuses(range(3), 0))
+        middleware.send_status_array(self._statuses(range(2), 1))
+
+        first = unbounded.get_nowait()
+        assert len(first["statuses"]) == 3
+        assert [status["data"] for status in conflating.get_nowait()["statuses"]] == [0, 1, 1]
+
+    def test_single_status_conflates_into_queued_batch(self):
+        """Test a single status removes its older value from a queued batch"""
+        listener_queue = ListenerQueue(1, status_policy=StatusOverloadPolicy.KEEP_LATEST)
+        listener_queue.put({"statuses": [{"name": "a", "data": 1}], "isBatch": True, "isCommand": False})
+        listener_queue.put(_status("a", 2))
+
+        message = listener_queue.get_nowait()
+        assert (message["name"], message["data"]) == ("a", 2)
+        assert listener_queue.get_metrics()["conflatedStatuses"] == 1
@@ -1,5 +1,10 @@
-from middleware.middleware import Middleware
+from middleware.middleware import Middleware, UnknownCommandError
+from middleware.shared_memory_ring import SharedMemoryRing
+import pickle
+import queue
+import threading
 from unittest.mock import patch, MagicMock
+import pytest
 import sys
 import os
 
@@ -24,7 +29,7 @@ class TestMiddlewareInitialization:
 class TestMiddlewareListenerManagement:
     """Test listener management methods."""
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_add_new_middleware_listener(self, mock_queue_class):
         """Test adding a new middleware listener."""
         mock_queue = MagicMock()
@@ -40,7 +45,7 @@ class TestMiddlewareListenerManagement:
         assert mock_queue in middleware._subscriber_queues
         mock_queue_class.assert_called_once()
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_add_new_request_listener(self, mock_queue_class):
         """Test adding a new request listener."""
         mock_queue = MagicMock()
@@ -57,6 +62,33 @@ class TestMiddlewareListenerManagement:
         mock_queue_class.assert_called_once()
 
     @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
+    def test_add_new_middleware_listener_in_process_by_default(self, mock_queue_class, mock_mp_queue_class):
+        """Test that listeners use the in-process transport unless asked otherwise."""
+        middleware = Middleware()
+
+        middleware.add_new_middleware_listener()
+
+        mock_queue_class.assert_called_once()
+        mock_mp_queue_class.assert_not_called()
+
+    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
+    def test_add_new_middleware_listener_multiprocessing_opt_in(self, mock_queue_class, mock_mp_queue_class):
+        """Test that the multiprocessing transport is only used when requested."""
+        mock_mp_queue = MagicMock()
+        mock_mp_queue_class.return_value = mock_mp_queue
+
+        middleware = Middleware()
+
+        listener_queue = middleware.add_new_middleware_listener(
+            use_multiprocessing=True)
+
+        assert listener_queue == mock_mp_queue
+        assert mock_mp_queue in middleware._subscriber_queues
+        mock_queue_class.assert_not_called()
+
+    @patch('middleware.middleware.ListenerQueue')
     def test_multiple_listeners(self, mock_queue_class):
         """Test adding multiple listeners."""
         mock_queues = [MagicMock() for _ in range(5)]
@@ -82,10 +114,45 @@ class TestMiddlewareListenerManagement:
         assert req_queue2 in middleware._request_queues
 
 
+class TestMiddlewareListenerMetrics:
+    """Test listener capacity and metrics."""
+
+    def test_listener_capacity_and_metrics(self):
+        """Test listeners are created with the given capacity and report metrics."""
+        middleware = Middleware()
+        middleware.add_new_middleware_listener(
+            listener_id="bounded", capacity=2)
+
+        for index in range(3):
+            middleware.send_status("gw-status-*", index)
+
+        metrics = middleware.get_listener_metrics()["bounded"]
+        assert metrics["capacity"] == 2
+        assert metrics["depth"] == 2
+        assert metrics["droppedStatuses"] == 1
+
+    def test_full_multiprocessing_listener_drops_statuses(self):
+        """Test statuses never block the publisher on a full queue of another process."""
+        middleware = Middleware()
+        process_queue = middleware.add_new_middleware_listener(
+            True, "process", capacity=1)
+
+        middleware.send_status("gw-status-*", 1)
+        publisher = threading.Thread(target=middleware.send_status_array, args=(
+            [{"statusName": "gw1-status-*", "data": 2}, {"statusName": "gw2-status-*", "data": 3}],),
+            daemon=True)
+        publisher.start()
+        publisher.join(timeout=2)
+
+        assert not publisher.is_alive()
+        assert process_queue.get(timeout=1)["data"] == 1
+        assert middleware.get_listener_metrics()["process"]["droppedStatuses"] == 2
+
+
 class TestMiddlewareStatusSending:
     """Test status sending methods."""
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_send_status_single_subscriber(self, mock_queue_class):
         """Test sending status to a single subscriber."""
         mock_queue = MagicMock()
@@ -107,7 +174,7 @@ class TestMiddlewareStatusSending:
         }
         mock_queue.put.assert_called_once_with(expected_message)
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_send_status_multiple_subscribers(self, mock_queue_class):
         """Test sending status to multiple subscribers."""
         mock_queues = [MagicMock() for _ in range(3)]
@@ -145,7 +212,7 @@ class TestMiddlewareStatusSending:
         # No queues to check, just ensure no exception was raised
         assert True
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_send_status_array_single_subscriber(self, mock_queue_class):
         """Test sending status array to a single subscriber."""
         mock_queue = MagicMock()
@@ -162,22 +229,18 @@ class TestMiddlewareStatusSending:
 
         middleware.send_status_array(status_list)
 
-        # Check that all statuses were sent
-        assert mock_queue.put.call_count == 3
-
-        # Check each call individually
-        calls = mock_queue.put.call_args_list
-        expected_messages = [
-            {"name": "status1", "data": {"value": 1}, "isCommand": False},
-            {"name": "status2", "data": {"value": 2}, "isCommand": False},
-            {"name": "status3", "data": {"value": 3}, "isCommand": False}
-        ]
-
-        for expected in expected_messages:
-            assert any(
-                call[0][0] == expected for call in calls), f"Expected message {expected} not found in calls"
+        # Check that the whole array was sent in a single envelope
+        mock_queue.put.assert_called_once_with({
+            "statuses": [
+                {"name": "status1", "data": {"value": 1}},
+                {"name": "status2", "data": {"value": 2}},
+                {"name": "status3", "data": {"value": 3}}
+            ],
+            "isBatch": True,
+            "isCommand": False
+        })
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_send_status_array_multiple_subscribers(self, mock_queue_class):
         """Test sending status array to multiple subscribers."""
         mock_queues = [MagicMock() for _ in range(2)]
@@ -196,20 +259,21 @@ class TestMiddlewareStatusSending:
 
         middleware.send_status_array(status_list)
 
-        # Check both queues received all messages
-        expected_messages = [
-            {"name": "batch1", "data": {"id": 1}, "isCommand": False},
-            {"name": "batch2", "data": {"id": 2}, "isCommand": False}
-        ]
+        # Check both queues received the same single envelope
+        expected_batch = {
+            "statuses": [
+                {"name": "batch1", "data": {"id": 1}},
+                {"name": "batch2", "data": {"id": 2}}
+            ],
+            "isBatch": True,
+            "isCommand": False
+        }
 
         for mock_queue in mock_queues:
-            assert mock_queue.put.call_count == 2
-            calls = mock_queue.put.call_args_list
-            for expected in expected_messages:
-                assert any(
-                    call[0][0] == expected for call in calls), f"Expected message {expected} not found in calls"
+            mock_queue.put.assert_called_once_with(expected_batch)
+        assert mock_queues[0].put.call_args[0][0] is mock_queues[1].put.call_args[0][0]
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_send_status_array_empty_list(self, mock_queue_class):
         """Test sending empty status array."""
         mock_queue = MagicMock()
@@ -234,154 +298,244 @@ class TestMiddlewareStatusSending:
         assert True
 
 
-class TestMiddlewareCommandSending:
-    """Test command sending methods."""
-
-    @patch('uuid.uuid4')
-    @patch('multiprocessing.Queue')
-    def test_send_command_single_subscriber(self, mock_queue_class, mock_uuid):
-        """Test sending command to a single subscriber."""
-        mock_uuid.return_value = "test-uuid-123"
-        mock_queue = MagicMock()
-        mock_queue_class.return_value = mock_queue
+class TestMiddlewareZeroCopyDelivery:
+    """Test that in-process listeners share the published objects."""
 
+    def test_send_status_shares_same_object_between_listeners(self):
+        """Test every listener receives the very same message and data objects."""
         middleware = Middleware()
-        middleware.add_new_middleware_listener()
-
-        command_name = "test_command"
-        data = {"param1": "value1", "param2": 42}
+        queue1 = middleware.add_new_middleware_listener()
+        queue2 = middleware.add_new_middleware_listener()
 
-        request_id = middleware.send_command(command_name, data)
+        data = object()
+        middleware.send_status("gateway1-status-*", data)
 
-        # Check return value
-        assert request_id == "test-uuid-123"
+        message1 = queue1.get_nowait()
+        message2 = queue2.get_nowait()
+        assert message1 is message2
+        assert message1["data"] is data
 
-        # Check that message was put in queue
-        expected_message = {
-            "name": command_name,
-            "data": data,
-            "requestId": "test-uuid-123",
-            "isCommand": True
-        }
-        mock_queue.put.assert_called_once_with(expected_message)
 
-    @patch('uuid.uuid4')
-    @patch('multiprocessing.Queue')
-    def test_send_command_multiple_subscribers(self, mock_queue_class, mock_uuid):
-        """Test sending command to multiple subscribers."""
-        mock_uuid.return_value = "multi-uuid-456"
-        mock_queues = [MagicMock() for _ in range(2)]
-        mock_queue_class.side_effect = mock_queues
+class TestMiddlewareLastValueCache:
+    """Test the last value kept per status name."""
 
+    def test_last_value_per_status(self):
+        """Test single and batched statuses update the cache."""
         middleware = Middleware()
+        middleware.send_status("gw1-status-*", 1)
+        middleware.send_status("gw1-status-*", 2)
+        middleware.send_status_array([{"statusName": "gw2-status-*", "data": 3},
+                                      {"statusName": "gw1-status-*", "data": 4}])
+
+        assert middleware.get_last_value("gw1-status-*") == 4
+        assert middleware.get_last_values() == {
+            "gw1-status-*": 4, "gw2-status-*": 3}
+        assert middleware.get_last_value("unknown") is None
+
+
+class TestMiddlewareStatusRing:
+    """Test gateway readings carried by the shared-memory ring."""
+
+    @pytest.fixture
+    def ring(self):
+        shared_ring = SharedMemoryRing(record_size=1024, record_count=8)
+        yield shared_ring
+        shared_ring.close()
+        shared_ring.unlink()
+
+    def test_readings_skip_process_queues(self, ring):
+        """Test gateway readings go to the ring instead of the process listener queues."""
+        middleware = Middleware(status_ring=ring)
+        process_queue = middleware.add_new_middleware_listener(True, "process")
+        local_queue = middleware.add_new_middleware_listener(listener_id="local")
+        reader = middleware.create_ring_reader()
+
+        middleware.send_status("gw1-status-*", {"value": 1})
+
+        assert pickle.loads(reader.read_available()[0])["data"] == {"value": 1}
+        assert local_queue.get_nowait()["name"] == "gw1-status-*"
+        with pytest.raises(queue.Empty):
+            process_queue.get(timeout=0.1)
+
+    def test_other_statuses_use_queues(self, ring):
+        """Test statuses that are not readings keep using the listener queues."""
+        middleware = Middleware(status_ring=ring)
+        process_queue = middleware.add_new_middleware_listener(True, "process")
+        reader = middleware.create_ring_reader()
+
+        middleware.send_status("ui-update-*", {"panels": []})
+
+        assert reader.read_available() == []
+        assert process_queue.get(timeout=1)["name"] == "ui-update-*"
+
+    def test_oversized_reading_falls_back_to_queues(self, ring):
+        """Test a reading larger than a ring record is still delivered."""
+        middleware = Middleware(status_ring=ring)
+        process_queue = middleware.add_new_middleware_listener(True, "process")
+
+        middleware.send_status("gw1-status-*", "x" * 2048)
+
+        assert process_queue.get(timeout=1)["data"] == "x" * 2048
+
+    def test_large_batch_is_split_across_records(self, ring):
+        """Test a batch larger than one record is written as several records."""
+        middleware = Middleware(status_ring=ring)
+        process_queue = middleware.add_new_middleware_listener(True, "process")
+        reader = middleware.create_ring_reader()
+
+        middleware.send_status_array([{"statusName": f"gw{index}-status-*", "data": str(index) * 300}
+                                      for index in range(6)])
+
+        records = [pickle.loads(payload) for payload in reader.read_available()]
+        assert len(records) > 1
+        assert [status["name"] for record in records for status in record["statuses"]] == \
+            [f"gw{index}-status-*" for index in range(6)]
+        with pytest.raises(queue.Empty):
+            process_queue.get(timeout=0.1)
+
+    def test_shared_command_registry(self):
+        """Test commands and replies resolve through the injected registries."""
+        command_owners, pending_replies = {}, {}
+        registering = Middleware(command_owners, pending_replies)
+        owner_queue = registering.add_new_middleware_listener(listener_id="owner")
+        requester_queue = registering.add_new_middleware_listener(listener_id="requester")
+        registering.register_commands("owner", ["do"])
+
+        request_id = registering.send_command("do", {}, "requester")
+        assert command_owners == {"do": "owner"}
+        assert pending_replies == {request_id: "requester"}
+        assert owner_queue.get_nowait()["requestId"] == request_id
+
+        registering.send_command_answear("", True, {}, request_id)
+        assert pending_replies == {}
+        assert requester_queue.get_nowait()["requestId"] == request_id
 
-        # Add multiple subscribers
-        middleware.add_new_middleware_listener()
-        middleware.add_new_middleware_listener()
 
-        command_name = "multi_command"
-        data = {"action": "start", "priority": "high"}
+class TestMiddlewareCommandSending:
+    """Test directed command routing."""
 
-        request_id = middleware.send_command(command_name, data)
+    @patch('uuid.uuid4')
+    @patch('middleware.middleware.ListenerQueue')
+    def test_send_command_only_to_owner(self, mock_queue_class, mock_uuid):
+        """Test a command is delivered only to the listener that registered it."""
+        mock_uuid.return_value = "test-uuid-123"
+        owner_queue, other_queue = MagicMock(), MagicMock()
+        mock_queue_class.side_effect = [owner_queue, other_queue]
 
-        # Check return value
-        assert request_id == "multi-uuid-456"
+        middleware = Middleware()
+        middleware.add_new_middleware_listener(listener_id="owner")
+        middleware.add_new_middleware_listener(listener_id="other")
+        middleware.register_commands("owner", ["test_command"])
 
-        # Check all queues received the message
-        expected_message = {
-            "name": command_name,
+        data = {"param1": "value1", "param2": 42}
+        request_id = middleware.send_command("test_command", data)
+
+        assert request_id == "test-uuid-123"
+        owner_queue.put.assert_called_once_with({
+            "name": "test_command",
             "data": data,
-            "requestId": "multi-uuid-456",
+            "requestId": "test-uuid-123",
+            "replyTo": None,
             "isCommand": True
-        }
-
-        for mock_queue in mock_queues:
-            mock_queue.put.assert_called_once_with(expected_message)
+        })
+        other_queue.put.assert_not_called()
 
-    def test_send_command_no_subscribers(self):
-        """Test sending command when no subscribers exist."""
+    def test_send_command_with_given_request_id(self):
+        """Test a caller supplied request id is used as is."""
         middleware = Middleware()
+        owner_queue = middleware.add_new_middleware_listener(
+            listener_id="owner")
+        middleware.register_commands("owner", ["test_command"])
 
-        # Should not raise any exception and should return a UUID
-        request_id = middleware.send_command("test", {"data": "value"})
+        request_id = middleware.send_command(
+            "test_command", {}, "owner", "my-request")
 
-        # Should return a valid UUID string
-        assert isinstance(request_id, str)
-        assert len(request_id) > 0
+        assert request_id == "my-request"
+        assert owner_queue.get_nowait()["requestId"] == "my-request"
 
-    @patch('multiprocessing.Queue')
-    def test_send_command_answer_single_subscriber(self, mock_queue_class):
-        """Test sending command answer to a single subscriber."""
-        mock_queue = MagicMock()
-        mock_queue_class.return_value = mock_queue
+    def test_send_unknown_command_fails_fast(self):
+        """Test sending a command nobody handles raises instead of vanishing."""
+        middleware = Middleware()
+        middleware.add_new_middleware_listener(listener_id="listener")
+
+        with pytest.raises(UnknownCommandError):
+            middleware.send_command("unknown_command", {"data": "value"})
 
+    def test_register_commands_unknown_listener(self):
+        """Test commands can only be registered by existing listeners."""
         middleware = Middleware()
-        middleware.add_new_middleware_listener()
 
-        command_name = "test_command"
-        result = True
-        data = {"response": "success", "code": 200}
-        request_id = "req-123-456"
+        with pytest.raises(ValueError):
+            middleware.register_commands("ghost", ["test_command"])
 
-        middleware.send_command_answear(command_name, result, data, request_id)
+    def test_register_commands_new_owner(self):
+        """Test registering an owned command moves it to the new listener."""
+        middleware = Middleware()
+        first_queue = middleware.add_new_middleware_listener(
+            listener_id="first")
+        second_queue = middleware.add_new_middleware_listener(
+            listener_id="second")
+        middleware.register_commands("first", ["test_command"])
+        middleware.register_commands("second", ["test_command"])
 
-        # Check that message was put in queue
-        expected_message = {
-            "name": command_name,
-            "result": result,
-            "data": data,
-            "requestId": request_id,
-            "isCommand": True
-        }
-        mock_queue.put.assert_called_once_with(expected_message)
+        middleware.send_command("test_command", {})
 
-    @patch('multiprocessing.Queue')
-    def test_send_command_answer_multiple_subscribers(self, mock_queue_class):
-        """Test sending command answer to multiple subscribers."""
-        mock_queues = [MagicMock() for _ in range(2)]
-        mock_queue_class.side_effect = mock_queues
+        assert first_queue.empty()
+        assert not second_queue.empty()
 
+    def test_duplicated_listener_id(self):
+        """Test listener ids must be unique."""
         middleware = Middleware()
+        middleware.add_new_middleware_listener(listener_id="listener")
 
-        # Add multiple subscribers
-        middleware.add_new_middleware_listener()
-        middleware.add_new_middleware_listener()
+        with pytest.raises(ValueError):
+            middleware.add_new_middleware_listener(listener_id="listener")
 
-        command_name = "answer_command"
-        result = False
-        data = {"error": "not found", "code": 404}
-        request_id = "answer-req-789"
+    def test_send_command_answer_only_to_requester(self):
+        """Test an answer is delivered only to the listener given as reply-to."""
+        middleware = Middleware()
+        owner_queue = middleware.add_new_middleware_listener(
+            listener_id="owner")
+        requester_queue = middleware.add_new_middleware_listener(
+            listener_id="requester")
+        bystander_queue = middleware.add_new_middleware_listener(
+            listener_id="bystander")
+        middleware.register_commands("owner", ["test_command"])
+
+        request_id = middleware.send_command(
+            "test_command", {}, reply_to="requester")
+        owner_queue.get_nowait()
 
-        middleware.send_command_answear(command_name, result, data, request_id)
+        data = {"response": "success", "code": 200}
+        middleware.send_command_answear("", True, data, request_id)
 
-        # Check all queues received the message
-        expected_message = {
-            "name": command_name,
-            "result": result,
+        assert requester_queue.get_nowait() == {
+            "name": "",
+            "result": True,
             "data": data,
             "requestId": request_id,
             "isCommand": True
         }
+        assert owner_queue.empty()
+        assert bystander_queue.empty()
+        assert request_id not in middleware._pending_replies
 
-        for mock_queue in mock_queues:
-            mock_queue.put.assert_called_once_with(expected_message)
-
-    def test_send_command_answer_no_subscribers(self):
-        """Test sending command answer when no subscribers exist."""
+    def test_send_command_answer_without_requester(self):
+        """Test answers to fire and forget commands are dropped."""
         middleware = Middleware()
+        listener_queue = middleware.add_new_middleware_listener(
+            listener_id="listener")
 
-        # Should not raise any exception
         middleware.send_command_answear(
             "test", True, {"data": "value"}, "req-123")
 
-        # No queues to check, just ensure no exception was raised
-        assert True
+        assert listener_queue.empty()
 
 
 class TestMiddlewareEdgeCases:
     """Test edge cases and error conditions."""
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_send_status_with_none_data(self, mock_queue_class):
         """Test sending status with None data."""
         mock_queue = MagicMock()
@@ -399,7 +553,7 @@ class TestMiddlewareEdgeCases:
         }
         mock_queue.put.assert_called_once_with(expected_message)
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_send_status_with_complex_data(self, mock_queue_class):
         """Test sending status with complex nested data."""
         mock_queue = MagicMock()
@@ -428,14 +582,15 @@ class TestMiddlewareEdgeCases:
         }
         mock_queue.put.assert_called_once_with(expected_message)
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_send_command_with_empty_data(self, mock_queue_class):
         """Test sending command with empty data."""
         mock_queue = MagicMock()
         mock_queue_class.return_value = mock_queue
 
         middleware = Middleware()
-        middleware.add_new_middleware_listener()
+        middleware.add_new_middleware_listener(listener_id="owner")
+        middleware.register_commands("owner", ["empty_command"])
 
         request_id = middleware.send_command("empty_command", {})
 
@@ -447,7 +602,7 @@ class TestMiddlewareEdgeCases:
         assert call_args["requestId"] == request_id
         assert call_args["isCommand"] == True
 
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_send_status_array_with_mixed_data_types(self, mock_queue_class):
         """Test sending status array with mixed data types."""
         mock_queue = MagicMock()
@@ -466,51 +621,47 @@ class TestMiddlewareEdgeCases:
 
         middleware.send_status_array(status_list)
 
-        # Check that all 5 messages were sent
-        assert mock_queue.put.call_count == 5
-
-        # Check each message type
-        expected_messages = [
-            {"name": "string_status", "data": "hello world", "isCommand": False},
-            {"name": "number_status", "data": 42, "isCommand": False},
-            {"name": "boolean_status", "data": True, "isCommand": False},
-            {"name": "list_status", "data": [1, 2, 3], "isCommand": False},
-            {"name": "dict_status", "data": {"key": "value"}, "isCommand": False}
+        # Check that the 5 statuses were sent in one envelope
+        mock_queue.put.assert_called_once()
+        batch = mock_queue.put.call_args[0][0]
+        assert batch["isBatch"] is True
+        assert batch["isCommand"] is False
+        assert batch["statuses"] == [
+            {"name": "string_status", "data": "hello world"},
+            {"name": "number_status", "data": 42},
+            {"name": "boolean_status", "data": True},
+            {"name": "list_status", "data": [1, 2, 3]},
+            {"name": "dict_status", "data": {"key": "value"}}
         ]
 
-        calls = mock_queue.put.call_args_list
-        for expected in expected_messages:
-            assert any(
-                call[0][0] == expected for call in calls), f"Expected message {expected} not found in calls"
-
-    @patch('multiprocessing.Queue')
+    @patch('middleware.middleware.ListenerQueue')
     def test_concurrent_operations(self, mock_queue_class):
-        """Test that middleware can handle concurrent operations."""
-        mock_queues = [MagicMock() for _ in range(2)]
-        mock_queue_class.side_effect = mock_queues
+        """Test that middleware can handle mixed statuses, commands and answers."""
+        owner_queue, requester_queue = MagicMock(), MagicMock()
+        mock_queue_class.side_effect = [owner_queue, requester_queue]
 
         middleware = Middleware()
 
-        # Add multiple subscribers
-        middleware.add_new_middleware_listener()
-        middleware.add_new_middleware_listener()
+        middleware.add_new_middleware_listener(listener_id="owner")
+        middleware.add_new_middleware_listener(listener_id="requester")
+        middleware.register_commands("owner", ["command1"])
 
-        # Simulate concurrent operations
         middleware.send_status("status1", {"id": 1})
-        middleware.send_command("command1", {"action": "start"})
+        request_id = middleware.send_command(
+            "command1", {"action": "start"}, "requester")
         middleware.send_status("status2", {"id": 2})
         middleware.send_command_answear(
-            "command1", True, {"result": "success"}, "req-123")
+            "", True, {"result": "success"}, request_id)
 
-        # Check that each queue received 4 messages
-        for mock_queue in mock_queues:
-            assert mock_queue.put.call_count == 4
+        # Both get the statuses, the owner gets the command and the
+        # requester gets the answer
+        for mock_queue in (owner_queue, requester_queue):
+            assert mock_queue.put.call_count == 3
 
-            # Verify message types
             calls = mock_queue.put.call_args_list
             status_calls = [
                 call for call in calls if not call[0][0]["isCommand"]]
             command_calls = [call for call in calls if call[0][0]["isCommand"]]
 
-            assert len(status_calls) == 2  # 2 status messages
-            assert len(command_calls) == 2  # 2 command messages
+            assert len(status_calls) == 2
+            assert len(command_calls) == 1
@@ -0,0 +1,80 @@
+import multiprocessing
+
+import pytest
+
+from middleware.shared_memory_ring import SharedMemoryRing
+
+
+@pytest.fixture
+def ring():
+    shared_ring = SharedMemoryRing(record_size=64, record_count=4)
+    yield shared_ring
+    shared_ring.close()
+    shared_ring.unlink()
+
+
+def _write_records(shared_ring, count):
+    for index in range(count):
+        shared_ring.write(f"child-{index}".encode())
+
+
+class TestSharedMemoryRing:
+    """Test the fixed-record shared-memory ring"""
+
+    def test_reader_receives_records_in_order(self, ring):
+        """Test a reader gets every record written after its creation"""
+        ring.write(b"before")
+        reader = ring.create_reader()
+        ring.write(b"first")
+        ring.write(b"second")
+
+        assert reader.lag() == 2
+        assert reader.read_available() == [b"first", b"second"]
+        assert reader.read_available() == []
+        assert reader.lag() == 0
+
+    def test_readers_are_independent(self, ring):
+        """Test each reader keeps its own cursor"""
+        first_reader = ring.create_reader()
+        second_reader = ring.create_reader()
+        ring.write(b"data")
+
+        assert first_reader.read_available() == [b"data"]
+        assert second_reader.read_available() == [b"data"]
+
+    def test_max_records(self, ring):
+        """Test a reader can drain the ring in chunks"""
+        reader = ring.create_reader()
+        for index in range(3):
+            ring.write(bytes([index]))
+
+        assert reader.read_available(max_records=2) == [b"\x00", b"\x01"]
+        assert reader.read_available() == [b"\x02"]
+
+    def test_lagging_reader_skips_overwritten_records(self, ring):
+        """Test a reader lapped by the writer skips to the oldest record and counts the loss"""
+        reader = ring.create_reader()
+        for index in range(6):
+            ring.write(bytes([index]))
+
+        assert reader.read_available() == [bytes([index]) for index in range(2, 6)]
+        assert reader.overruns == 2
+
+    def test_oversized_payload_is_refused(self, ring):
+        """Test payloads that do not fit a record are not written"""
+        reader = ring.create_reader()
+
+        assert not ring.write(b"x" * (ring.max_payload_size + 1))
+        assert ring.write(b"x" * ring.max_payload_size)
+        assert reader.read_available() == [b"x" * ring.max_payload_size]
+
+    def test_records_cross_processes(self, ring):
+        """Test records written by a forked process are read by its parent"""
+        reader = ring.create_reader()
+        process = multiprocessing.get_context("fork").Process(
+            target=_write_records, args=(ring, 3))
+        process.start()
+        process.join(timeout=10)
+
+        assert process.exitcode == 0
+        assert reader.read_available() == [b"child-0", b"child-1", b"child-2"]
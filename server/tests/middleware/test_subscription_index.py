@@ -0,0 +1,109 @@
+from unittest.mock import MagicMock
+
+from middleware.subscription_index import SubscriptionIndex
+
+
+class TestSubscriptionIndexSplit:
+    """Test status name splitting"""
+
+    def test_split_full_status_name(self):
+        """Test a gateway-topic-indicator name is split in three levels"""
+        assert SubscriptionIndex.split_status_name(
+            "gateway1-sensor1-temp") == ("gateway1", "sensor1", "temp")
+
+    def test_split_short_status_name(self):
+        """Test names with less than three levels are padded"""
+        assert SubscriptionIndex.split_status_name(
+            "test_status") == ("test_status", "", "")
+
+
+class TestSubscriptionIndexMatching:
+    """Test subscription matching logic"""
+
+    def _match(self, subscriber_status_name, status_name):
+        index = SubscriptionIndex()
+        subscriber = MagicMock()
+        index.add(subscriber_status_name, subscriber)
+        return index.match(status_name) == (subscriber,)
+
+    def test_exact_match(self):
+        """Test exact subscription match"""
+        assert self._match("gateway1-sensor1-temp", "gateway1-sensor1-temp")
+
+    def test_wildcard_gateway(self):
+        """Test subscription match with wildcard gateway"""
+        assert self._match("*-sensor1-temp", "gateway1-sensor1-temp")
+
+    def test_wildcard_topic(self):
+        """Test subscription match with wildcard topic"""
+        assert self._match("gateway1-*-temp", "gateway1-sensor1-temp")
+
+    def test_wildcard_indicator(self):
+        """Test subscription match with wildcard indicator"""
+        assert self._match("gateway1-sensor1-*", "gateway1-sensor1-temp")
+
+    def test_no_match(self):
+        """Test subscription with no match"""
+        assert not self._match("gateway1-sensor1-temp",
+                               "gateway2-sensor2-humidity")
+
+    def test_all_wildcards(self):
+        """Test subscription match with every level as wildcard"""
+        assert self._match("*-*-*", "gateway1-sensor1-temp")
+
+    def test_status_name_with_wildcard_matches_once(self):
+        """Test a published name containing '*' does not match the same pattern twice"""
+        assert self._match("gateway1-status-*", "gateway1-status-*")
+
+    def test_multiple_patterns_match(self):
+        """Test every matching pattern is returned"""
+        index = SubscriptionIndex()
+        exact, gateway_wide, everything, other = (
+            MagicMock(), MagicMock(), MagicMock(), MagicMock())
+        index.add("gateway1-sensor1-temp", exact)
+        index.add("gateway1-*-*", gateway_wide)
+        index.add("*-*-*", everything)
+        index.add("gateway2-*-*", other)
+
+        result = index.match("gateway1-sensor1-temp")
+
+        assert set(result) == {exact, gateway_wide, everything}
+
+
+class TestSubscriptionIndexMaintenance:
+    """Test index updates and match cache invalidation"""
+
+    def test_add_invalidates_cached_match(self):
+        """Test a cached miss is refreshed when a subscription is added"""
+        index = SubscriptionIndex()
+        assert index.match("gateway1-sensor1-temp") == ()
+
+        subscriber = MagicMock()
+        index.add("gateway1-*-*", subscriber)
+
+        assert index.match("gateway1-sensor1-temp") == (subscriber,)
+
+    def test_remove_invalidates_cached_match(self):
+        """Test a cached hit is dropped when the subscription is removed"""
+        index = SubscriptionIndex()
+        index.add("gateway1-*-*", MagicMock())
+        index.match("gateway1-sensor1-temp")
+
+        index.remove("gateway1-*-*")
+
+        assert index.match("gateway1-sensor1-temp") == ()
+        assert len(index) == 0
+        assert "gateway1-*-*" not in index
+
+    def test_remove_unknown_pattern(self):
+        """Test removing an unknown pattern does nothing"""
+        index = SubscriptionIndex()
+        index.remove("gateway1-*-*")
+        assert len(index) == 0
+
+    def test_matches(self):
+        """Test single pattern matching follows the index semantics"""
+        assert SubscriptionIndex.matches("*-status-*", "gw1-status-*")
+        assert SubscriptionIndex.matches("gw1-temp-0", "gw1-temp-0")
+        assert not SubscriptionIndex.matches("gw1-temp-0", "gw1-temp-*")
+        assert not SubscriptionIndex.matches("gw2-*-*", "gw1-temp-0")
@@ -0,0 +1,54 @@
+from middleware.timer_wheel import TimerWheel
+
+
+class TestTimerWheel:
+    """Test deadline scheduling on the timing wheel"""
+
+    def test_key_expires_after_timeout(self):
+        """Test a key is returned only once its deadline has passed"""
+        wheel = TimerWheel(tick_seconds=1, slots=8, now=0)
+        wheel.schedule("request", 2.5, now=0)
+
+        assert wheel.advance(now=2) == []
+        assert "request" in wheel
+        assert wheel.advance(now=3) == ["request"]
+        assert "request" not in wheel
+        assert wheel.advance(now=4) == []
+
+    def test_cancel(self):
+        """Test cancelled keys never expire"""
+        wheel = TimerWheel(tick_seconds=1, slots=8, now=0)
+        wheel.schedule("request", 1, now=0)
+
+        assert wheel.cancel("request")
+        assert not wheel.cancel("request")
+        assert wheel.advance(now=5) == []
+        assert len(wheel) == 0
+
+    def test_reschedule_replaces_deadline(self):
+        """Test scheduling an existing key moves its deadline"""
+        wheel = TimerWheel(tick_seconds=1, slots=8, now=0)
+        wheel.schedule("request", 1, now=0)
+        wheel.schedule("request", 5, now=0)
+
+        assert wheel.advance(now=2) == []
+        assert wheel.advance(now=5) == ["request"]
+
+    def test_deadline_beyond_one_revolution(self):
+        """Test keys sharing a slot only expire on their own revolution"""
+        wheel = TimerWheel(tick_seconds=1, slots=4, now=0)
+        wheel.schedule("near", 2, now=0)
+        wheel.schedule("far", 6, now=0)
+
+        assert wheel.advance(now=2) == ["near"]
+        assert wheel.advance(now=5) == []
+        assert wheel.advance(now=6) == ["far"]
+
+    def test_long_idle_period(self):
+        """Test advancing far past every deadline expires all keys"""
+        wheel = TimerWheel(tick_seconds=1, slots=4, now=0)
+        for index in range(10):
+            wheel.schedule(index, index + 1, now=0)
+
+        assert sorted(wheel.advance(now=1000)) == list(range(10))
+        assert len(wheel) == 0
@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from benchmarks.fake_broker import FakeBroker, FakeMqttClient
+from modules.titanium_mqtt.ingest_group import IngestMode, MqttIngestGroup, get_shared_subscription
+
+SHARED_TOPICS = [(get_shared_subscription("iocloud/response/#", "titanium"), 0)]
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.005)
+    return False
+
+
+class _ScriptedClientFactory:
+    """
+    Clients whose own broker publishes count reports of a gateway named after
+    the process once they subscribe, picklable so member processes can be spawned
+    """
+
+    def __init__(self, count):
+        self._count = count
+
+    def __call__(self):
+        broker = FakeBroker()
+        client = FakeMqttClient(broker, "member")
+        subscribe = client.subscribe
+
+        def subscribe_and_publish(topic, qos=0):
+            result = subscribe(topic, qos)
+            publisher = FakeMqttClient(broker, "gateways")
+            for index in range(self._count):
+                publisher.publish(f"iocloud/response/gw{os.getpid()}/sensor/report", str(index).encode())
+            return result
+        client.subscribe = subscribe_and_publish
+        return client
+
+
+class TestMqttIngestGroup:
+    """Test the extra connections of the shared subscription"""
+
+    def test_shared_subscription_topic(self):
+        """Test the shared subscription filter of a group"""
+        assert get_shared_subscription("iocloud/response/#", "g1") == "$share/g1/iocloud/response/#"
+
+    def test_invalid_arguments(self):
+        """Test the member count and mode are validated"""
+        with pytest.raises(ValueError):
+            MqttIngestGroup(MagicMock(), SHARED_TOPICS, MagicMock(), MagicMock(), members=0)
+        with pytest.raises(ValueError):
+            MqttIngestGroup(MagicMock(), SHARED_TOPICS, MagicMock(), MagicMock(), mode="fibers")
+
+    def test_thread_members_share_the_traffic(self):
+        """Test every thread member joins the group and receives its share"""
+        broker = FakeBroker()
+        received = []
+        lock = threading.Lock()
+
+        def on_message(_client, _userdata, msg):
+            with lock:
+                received.append(msg.topic)
+
+        group = MqttIngestGroup(broker.create_client_factory(), SHARED_TOPICS, on_message, MagicMock(),
+                                members=3)
+        group.start()
+        publisher = FakeMqttClient(broker)
+        for gateway in range(30):
+            publisher.publish(f"iocloud/response/gw{gateway}/sensor/report", b"{}")
+        assert _wait_for(lambda: len(received) == 30)
+        group.stop()
+
+        stats = group.get_stats()
+        assert sum(member["received"] for member in stats) == 30
+        assert all(member["received"] > 0 for member in stats)
+
+    def test_process_members_forward_in_order(self):
+        """Test worker processes forward what they receive, in order, with its arrival stamp"""
+        received = []
+        lock = threading.Lock()
+
+        def on_received(topic, payload, received_at):
+            with lock:
+                received.append((topic, payload, received_at))
+
+        group = MqttIngestGroup(_ScriptedClientFactory(50), SHARED_TOPICS, MagicMock(), on_received,
+                                members=2, mode=IngestMode.PROCESSES)
+        group.start()
+        assert _wait_for(lambda: len(received) == 100, timeout=10)
+        group.stop(timeout=10)
+
+        by_gateway = {}
+        for topic, payload, _ in received:
+            by_gateway.setdefault(topic, []).append(int(payload))
+        assert len(by_gateway) == 2
+        assert all(sequences == list(range(50)) for sequences in by_gateway.values())
+        assert all(isinstance(received_at, float) for _, _, received_at in received)
+        assert [member["received"] for member in group.get_stats()] == [50, 50]
+
+
+class TestTitaniumMqttSharedSubscription:
+    """TitaniumMqtt with several connections on the broker stand-in"""
+
+    @pytest.fixture
+    def titanium_mqtt(self):
+        with patch('modules.titanium_mqtt.mqtt.IoCloudApiTranslator') as mock_translator_class, \
+                patch('modules.titanium_mqtt.mqtt.Logger'):
+            from modules.titanium_mqtt.mqtt import TitaniumMqtt
+            broker = FakeBroker()
+            instance = TitaniumMqtt(MagicMock(), broker.create_client_factory(), ingest_clients=4)
+            translated = []
+
+            def translate(topic, payload):
+                translated.append((topic.split("/")[2], int(payload)))
+                result = MagicMock()
+                result.data.full_topic = f"{topic}-status-*"
+                return result
+            mock_translator_class.return_value.translate_incoming_message.side_effect = translate
+            yield instance, broker, translated
+            instance.stop()
+
+    def test_traffic_is_spread_and_ordered_per_gateway(self, titanium_mqtt):
+        """Test every connection gets gateways while each gateway keeps its order"""
+        titanium_mqtt, broker, translated = titanium_mqtt
+        titanium_mqtt._deduplicator = None
+        titanium_mqtt.run()
+        assert broker.get_stats()["sharedSubscriptions"] == 4
+
+        publisher = FakeMqttClient(broker)
+        for sequence in range(20):
+            for gateway in range(16):
+                publisher.publish(f"iocloud/response/gw{gateway}/sensor/report", str(sequence).encode())
+        assert _wait_for(lambda: len(translated) == 320)
+
+        by_gateway = {}
+        for gateway, sequence in translated:
+            by_gateway.setdefault(gateway, []).append(sequence)
+        assert all(sequences == list(range(20)) for sequences in by_gateway.values())
+        assert all(member["received"] > 0 for member in titanium_mqtt.get_ingest_stats())
+
+    def test_single_client_keeps_plain_subscription(self):
+        """Test one ingest client subscribes without a shared group"""
+        with patch('modules.titanium_mqtt.mqtt.IoCloudApiTranslator'), \
+                patch('modules.titanium_mqtt.mqtt.Logger'):
+            from modules.titanium_mqtt.mqtt import SUBSCRIBE_TOPIC_LIST, TitaniumMqtt
+            instance = TitaniumMqtt(MagicMock(), FakeBroker().create_client_factory(), ingest_clients=1)
+
+        assert instance._subscribe_topic_list == SUBSCRIBE_TOPIC_LIST
+        assert instance.get_ingest_stats() == []
@@ -71,9 +71,7 @@ def test_create_reading_success(translator):
                 "gw1", timestamp, reading_json, index_obj)
 
             assert result == mock_instance
-            assert result.value == 25.0
-            assert result.is_active is True
-            assert result.full_topic == "topic/test"
+            MockModel.assert_called_once_with("topic/test", 25.0, timestamp, True)
             assert index_obj["current_index"] == 1
 
 
@@ -126,20 +124,61 @@ def test_read_sensor_report_message_reads_valid_data(translator):
     message_json = {"timestamp": 1000000000,
                     "sensors": [{"value": 10, "active": True}]}
 
-    mock_reading = MagicMock()
-    mock_reading.full_topic = "topic/temperature/0"
-
-    with patch.object(translator, "_create_reading", return_value=mock_reading), \
-        patch("modules.titanium_mqtt.translators.io_cloud_api.MqttHelper.get_topic_from_mosquitto_obj_report",
-              return_value="topic/test"):
+    with patch("modules.titanium_mqtt.translators.gateway_plan.MqttHelper.get_topic_from_mosquitto_obj_report",
+               side_effect=lambda gateway, topic, indicator: f"{gateway}/{topic}/{indicator}"):
         result = translator._read_sensor_report_message("gw1", message_json)
 
-        # The method returns a MqttGatewayReadingModel object, not a list
-        assert hasattr(result, 'readings')
-        assert hasattr(result, 'full_topic')
-        assert result.full_topic == "topic/test"
-        assert len(result.readings) == 1
-        assert result.readings[0] == mock_reading
+    # The method returns a MqttGatewayReadingModel object, not a list
+    assert hasattr(result, 'readings')
+    assert result.full_topic == "gw1/status/*"
+    assert len(result.readings) == 1
+    assert result.readings[0].full_topic == "gw1/temperature/0"
+    assert result.readings[0].value == 10
+    assert result.readings[0].is_active is True
+
+
+def _system_message(device_id, units):
+    return {"device_id": device_id, "ip_address": "10.0.0.1", "uptime": 1,
+            "sensors": [{"index": index, "unit": unit, "state": 0, "gain": 1, "offset": 0}
+                        for index, unit in enumerate(units)]}
+
+
+def test_system_message_compiles_plan(translator):
+    translator._create_system_update(_system_message("planGw", ["°C", "XYZ", "A"]))
+
+    plan = translator._plans["planGw"]
+    assert plan.topics == ["planGw-temperature-0", None, "planGw-current-2"]
+    assert plan.kinds == ["temperature", None, "current"]
+    assert plan.configured == [True, True, True]
+
+
+def test_calibration_recompiles_plan(translator):
+    translator._create_system_update(_system_message("calGw", ["°C", "kPa"]))
+    translator.update_calibration(
+        [{"gateway": "calGw", "indicator": 1, "gain": 2, "offset": 0.5}])
+
+    result = translator._read_sensor_report_message(
+        "calGw", {"timestamp": 1000000000,
+                  "sensors": [{"value": 10, "active": True}, {"value": 10, "active": False}]})
+    assert [reading.value for reading in result.readings] == [10, 20.5]
+
+
+def test_report_uses_plan_kinds(translator):
+    translator._create_system_update(_system_message("pfGw", ["%", "A", "V", "XYZ"]))
+    translator.logger.error = MagicMock()
+
+    result = translator._read_sensor_report_message(
+        "pfGw", {"timestamp": 1000000000,
+                 "sensors": [{"value": 80, "active": True}, {"value": 0.05, "active": True},
+                             {"value": 220, "active": True}, {"value": 1, "active": True},
+                             {"value": 1, "active": True}]})
+
+    assert [reading.full_topic for reading in result.readings] == \
+        ["pfGw-powerFactor-0", "pfGw-current-1", "pfGw-tension-2"]
+    # Power factor forced to 100 without current
+    assert result.readings[0].value == 100
+    # Only the index without configuration is reported
+    translator.logger.error.assert_called_once()
 
 
 def test_translate_incoming_message_report(monkeypatch, translator):
@@ -2,11 +2,14 @@ import pytest
 import json
 import threading
 import queue
+import time
 from unittest.mock import MagicMock, patch, call
 from datetime import datetime
 
 # Test the MQTT commands first
 from modules.titanium_mqtt.mqtt_commands import MqttCommands
+from modules.titanium_mqtt.report_deduplicator import ReportDeduplicator
+from modules.titanium_mqtt.traffic_recorder import TrafficRecorder, read_traffic
 
 
 class TestMqttCommands:
@@ -524,3 +527,165 @@ class TestTitaniumMqttIntegration:
         )
         mock_middleware.send_status.assert_called_once_with(
             "gateway1/sensor1", mock_translated_message.data)
+
+
+class TestTitaniumMqttBatchConsumer:
+    """Test the blocking batch consumer of the real TitaniumMqtt."""
+
+    @pytest.fixture
+    def titanium_mqtt(self):
+        with patch('modules.titanium_mqtt.mqtt.IoCloudApiTranslator') as mock_translator_class, \
+                patch('modules.titanium_mqtt.mqtt.Logger'):
+            from modules.titanium_mqtt.mqtt import TitaniumMqtt
+            instance = TitaniumMqtt(MagicMock())
+            instance._client = MagicMock()
+            translator = mock_translator_class.return_value
+
+            def translate(topic, payload):
+                translated = MagicMock()
+                translated.data.full_topic = f"{topic}-status-*"
+                return translated
+            translator.translate_incoming_message.side_effect = translate
+            yield instance
+
+    @staticmethod
+    def _message(topic):
+        msg = MagicMock()
+        msg.topic = topic
+        msg.payload = b"{}"
+        return msg
+
+    @staticmethod
+    def _published_topics(titanium_mqtt):
+        return [status["statusName"] for call_args in titanium_mqtt._middleware.send_status_array.call_args_list
+                for status in call_args[0][0]]
+
+    def test_drains_queue_into_one_batch(self, titanium_mqtt):
+        """Test every queued message is published in a single status array."""
+        for gateway in ("gw1", "gw2", "gw3"):
+            titanium_mqtt._read_queue.put(self._message(gateway))
+
+        titanium_mqtt._publish_translated(
+            titanium_mqtt._translate_batch(titanium_mqtt._read_batch()))
+        titanium_mqtt._middleware.send_status_array.assert_called_once()
+        assert self._published_topics(titanium_mqtt) == \
+            ["gw1-status-*", "gw2-status-*", "gw3-status-*"]
+
+    def test_batch_size_is_bounded(self, titanium_mqtt):
+        """Test a wakeup never takes more than the batch size."""
+        titanium_mqtt._batch_size = 2
+        for gateway in ("gw1", "gw2", "gw3"):
+            titanium_mqtt._read_queue.put(self._message(gateway))
+
+        assert len(titanium_mqtt._read_batch()) == 2
+        assert len(titanium_mqtt._read_batch()) == 1
+
+    def test_failed_translation_does_not_drop_batch(self, titanium_mqtt):
+        """Test a message that fails to translate only skips itself."""
+        translate = titanium_mqtt._translator.translate_incoming_message.side_effect
+
+        def flaky(topic, payload):
+            if topic == "bad":
+                raise ValueError("bad payload")
+            return translate(topic, payload)
+        titanium_mqtt._translator.translate_incoming_message.side_effect = flaky
+
+        titanium_mqtt._publish_translated(titanium_mqtt._translate_batch(
+            [self._message("gw1"), self._message("bad"), self._message("gw2")]))
+        assert self._published_topics(titanium_mqtt) == ["gw1-status-*", "gw2-status-*"]
+
+    def test_duplicate_reports_are_not_translated(self, titanium_mqtt):
+        """Test retransmitted reports are dropped before translation."""
+        titanium_mqtt._deduplicator = ReportDeduplicator()
+        for _ in range(2):
+            msg = self._message("iocloud/response/gw1/sensor/report")
+            msg.payload = b'{"timestamp": 1000, "sensors": []}'
+            titanium_mqtt._read_queue.put(msg)
+        # Both queued before the handler runs, so they share one batch
+        titanium_mqtt._messages_handler.start()
+        for _ in range(100):
+            if titanium_mqtt._middleware.send_status_array.called:
+                break
+            time.sleep(0.01)
+
+        titanium_mqtt.stop()
+
+        titanium_mqtt._translator.translate_incoming_message.assert_called_once()
+        assert titanium_mqtt.get_ingest_filter_stats()["duplicates"] == 1
+
+    def test_on_message_records_traffic(self, titanium_mqtt, tmp_path):
+        """Test received messages are recorded before being queued."""
+        path = str(tmp_path / "traffic.rec")
+        titanium_mqtt._recorder = TrafficRecorder(path)
+
+        titanium_mqtt.on_message(None, None, self._message("gw1"))
+        titanium_mqtt.stop()
+
+        assert [(topic, payload) for _, topic, payload in read_traffic(path)] == [("gw1", b"{}")]
+        assert titanium_mqtt._read_queue.get_nowait().topic == "gw1"
+
+    def test_batch_trace_starts_at_on_message(self, titanium_mqtt):
+        """Test the arrival stamp of on_message reaches the middleware with the batch."""
+        titanium_mqtt.on_message(None, None, self._message("gw1"))
+        titanium_mqtt._messages_handler.start()
+        for _ in range(100):
+            if titanium_mqtt._middleware.send_status_array.called:
+                break
+            time.sleep(0.01)
+        titanium_mqtt.stop()
+
+        trace = titanium_mqtt._middleware.send_status_array.call_args[0][1]
+        assert trace["received"] <= trace["translated"] <= time.monotonic()
+
+    def test_handler_blocks_and_stops(self, titanium_mqtt):
+        """Test the handler thread waits for messages and wakes up on stop."""
+        titanium_mqtt._messages_handler.start()
+        titanium_mqtt._read_queue.put(self._message("gw1"))
+        for _ in range(100):
+            if titanium_mqtt._middleware.send_status_array.called:
+                break
+            time.sleep(0.01)
+
+        titanium_mqtt.stop()
+
+        assert not titanium_mqtt._messages_handler.is_alive()
+        titanium_mqtt._middleware.send_status_array.assert_called_once()
+        sent = titanium_mqtt._middleware.send_status_array.call_args[0][0]
+        assert sent[0]["statusName"] == "gw1-status-*"
+
+    @staticmethod
+    def _wait_for(condition):
+        for _ in range(200):
+            if condition():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def test_failed_filter_does_not_stop_handler(self, titanium_mqtt):
+        """Test a batch the deduplicator fails on is logged and later batches still go through."""
+        titanium_mqtt._deduplicator = MagicMock()
+        titanium_mqtt._deduplicator.accept_message.side_effect = [ValueError("bad report"), True]
+        titanium_mqtt._messages_handler.start()
+
+        titanium_mqtt._read_queue.put(self._message("gw1"))
+        assert self._wait_for(lambda: titanium_mqtt._logger.error.called)
+        titanium_mqtt._read_queue.put(self._message("gw2"))
+        assert self._wait_for(lambda: titanium_mqtt._middleware.send_status_array.called)
+        titanium_mqtt.stop()
+
+        assert self._published_topics(titanium_mqtt) == ["gw2-status-*"]
+
+    def test_failed_pool_submit_does_not_stop_handler(self, titanium_mqtt):
+        """Test a translation pool error only loses its batch."""
+        titanium_mqtt._translation_pool = MagicMock()
+        titanium_mqtt._translation_pool.submit.side_effect = [RuntimeError("worker died"), None]
+        titanium_mqtt._messages_handler.start()
+
+        titanium_mqtt._read_queue.put(self._message("gw1"))
+        assert self._wait_for(lambda: titanium_mqtt._translation_pool.submit.call_count == 1)
+        titanium_mqtt._read_queue.put(self._message("gw2"))
+        assert self._wait_for(lambda: titanium_mqtt._translation_pool.submit.call_count == 2)
+        assert titanium_mqtt._messages_handler.is_alive()
+        titanium_mqtt.stop()
+
+        assert titanium_mqtt._translation_pool.submit.call_args[0][0][0].topic == "gw2"
@@ -0,0 +1,133 @@
+import json
+from unittest.mock import patch
+
+import pytest
+
+from modules.titanium_mqtt.translators.payload_decoder import (
+    MsgspecPayloadDecoder,
+    PayloadDecoder,
+    ReportColumns,
+    create_payload_decoder,
+    get_available_decoders,
+)
+
+REPORT = {"timestamp": 1000000000,
+          "sensors": [{"value": 25.5, "active": True}, {"value": 3, "active": False}]}
+
+
+@pytest.fixture(params=list(get_available_decoders()))
+def decoder(request):
+    return create_payload_decoder(request.param)
+
+
+class TestPayloadDecoders:
+    """Test every installed decoder gives the same result from bytes."""
+
+    def test_loads_bytes(self, decoder):
+        """Test generic payloads are decoded straight from bytes."""
+        payload = json.dumps({"command_index": 2, "device_id": "gwé"}).encode("utf-8")
+        assert decoder.loads(payload) == {"command_index": 2, "device_id": "gwé"}
+
+    def test_decode_report(self, decoder):
+        """Test reports are decoded into columns."""
+        columns = decoder.decode_report(json.dumps(REPORT).encode())
+
+        assert isinstance(columns, ReportColumns)
+        assert columns.timestamp == 1000000000
+        assert columns.values == [25.5, 3]
+        assert columns.active == [True, False]
+
+    def test_unusual_report_shape(self, decoder):
+        """Test reports with other fields or types still decode like plain JSON."""
+        report = {"timestamp": 1000000000, "extra": 1,
+                  "sensors": [{"value": "1", "active": 1, "unit": "V"}]}
+        columns = decoder.decode_report(json.dumps(report).encode())
+
+        assert columns.values == ["1"]
+        assert columns.active == [1]
+
+    def test_report_without_sensors(self, decoder):
+        """Test a report missing its sensors fails like the decoded JSON would."""
+        with pytest.raises(KeyError):
+            decoder.decode_report(b'{"timestamp": 1000000000}')
+
+
+class TestMsgspecPayloadDecoder:
+    """Test the typed report path of the msgspec decoder."""
+
+    @pytest.fixture
+    def msgspec_decoder(self):
+        pytest.importorskip("msgspec")
+        return MsgspecPayloadDecoder()
+
+    def test_report_decoded_through_typed_structs(self, msgspec_decoder):
+        """Test the usual report shape goes through the typed decoder, not the generic path."""
+        with patch.object(PayloadDecoder, "decode_report") as generic:
+            columns = msgspec_decoder.decode_report(json.dumps(REPORT).encode())
+
+        generic.assert_not_called()
+        assert columns.timestamp == 1000000000
+        assert [(type(value), value) for value in columns.values] == [(float, 25.5), (int, 3)]
+        assert columns.active == [True, False]
+
+    @pytest.mark.parametrize("sensor", [
+        {"value": True, "active": True},
+        {"value": 1, "active": 1},
+        {"value": None, "active": True},
+    ])
+    def test_other_types_match_the_generic_path(self, msgspec_decoder, sensor):
+        """Test values and flags of other types come out as the stdlib decoder gives them."""
+        payload = json.dumps({"timestamp": 1000000000, "sensors": [sensor]}).encode()
+
+        columns = msgspec_decoder.decode_report(payload)
+        expected = PayloadDecoder().decode_report(payload)
+
+        assert [(type(value), value) for value in columns.values] == \
+            [(type(value), value) for value in expected.values]
+        assert [(type(flag), flag) for flag in columns.active] == \
+            [(type(flag), flag) for flag in expected.active]
+
+    def test_auto_picks_msgspec(self):
+        """Test msgspec is the first choice when installed."""
+        pytest.importorskip("msgspec")
+        assert create_payload_decoder("auto").name == MsgspecPayloadDecoder.name
+
+
+class TestCreatePayloadDecoder:
+    """Test the decoder selection."""
+
+    def test_auto_picks_fastest(self):
+        """Test auto uses the first installed decoder."""
+        assert create_payload_decoder("auto").name == next(iter(get_available_decoders()))
+
+    def test_stdlib_is_always_available(self):
+        """Test the standard library decoder is the last resort."""
+        assert list(get_available_decoders())[-1] == PayloadDecoder.name
+
+    def test_unknown_decoder_falls_back(self):
+        """Test an unknown decoder name falls back to the standard library."""
+        with patch("modules.titanium_mqtt.translators.payload_decoder.Logger"):
+            assert create_payload_decoder("simdjson").name == PayloadDecoder.name
+
+
+class TestTranslatorDecoding:
+    """Test the translator decodes payloads through its decoder."""
+
+    def test_report_payload(self, decoder):
+        """Test a report payload is translated whatever decoder is used."""
+        from modules.titanium_mqtt.translators.io_cloud_api import IoCloudApiTranslator
+
+        translator = IoCloudApiTranslator()
+        translator.initialize()
+        translator._decoder = decoder
+        translator.translate_incoming_message("iocloud/response/decGw/command", json.dumps({
+            "command_index": 2, "device_id": "decGw", "ip_address": "10.0.0.1", "uptime": 1,
+            "sensors": [{"index": 0, "unit": "°C", "state": 0, "gain": 1, "offset": 0},
+                        {"index": 1, "unit": "V", "state": 0, "gain": 1, "offset": 0}]}).encode())
+
+        message = translator.translate_incoming_message(
+            "iocloud/response/decGw/sensor/report", json.dumps(REPORT).encode())
+
+        assert [reading.full_topic for reading in message.data.readings] == \
+            ["decGw-temperature-0", "decGw-tension-1"]
+        assert [reading.value for reading in message.data.readings] == [25.5, 3]
@@ -0,0 +1,150 @@
+import pickle
+from datetime import datetime, timezone
+
+import pytest
+
+from modules.titanium_mqtt.translators.payload_model import (
+    ColumnarGatewayReading,
+    MqttGatewayReadingModel,
+    MqttReadingModel,
+    PackedGatewayReading,
+)
+
+
+def _make_report(count=10, gateway="gw1"):
+    report = MqttGatewayReadingModel()
+    report.full_topic = f"{gateway}-status-*"
+    timestamp = datetime.fromtimestamp(1700000000)
+    for index in range(count):
+        reading = MqttReadingModel()
+        reading.full_topic = f"{gateway}-{'temperature' if index % 2 else 'current'}-{index}"
+        reading.value = index * 1.5
+        reading.timestamp = timestamp
+        reading.is_active = index % 3 == 0
+        report.readings.append(reading)
+    return report
+
+
+def test_pickle_sends_packed_report():
+    report = _make_report()
+
+    restored = pickle.loads(pickle.dumps(report))
+
+    assert isinstance(restored, PackedGatewayReading)
+    assert isinstance(restored, MqttGatewayReadingModel)
+    assert restored.full_topic == "gw1-status-*"
+    assert restored.gateway == "gw1"
+    assert len(restored) == 10
+
+
+def test_packed_report_keeps_to_dict_view():
+    report = _make_report()
+
+    restored = pickle.loads(pickle.dumps(report))
+
+    assert restored.to_dict() == report.to_dict()
+
+
+def test_packed_report_rebuilds_readings():
+    report = _make_report()
+
+    restored = pickle.loads(pickle.dumps(report))
+
+    for original, reading in zip(report.readings, restored.readings):
+        assert reading.full_topic == original.full_topic
+        assert reading.value == original.value
+        assert reading.timestamp == original.timestamp
+        assert reading.is_active == original.is_active
+
+
+def test_packed_arrays():
+    restored = PackedGatewayReading(PackedGatewayReading.pack(_make_report(3)))
+
+    assert list(restored.indicator_ids) == [0, 1, 2]
+    assert list(restored.values) == [0.0, 1.5, 3.0]
+    assert [restored.is_active(index) for index in range(3)] == [True, False, False]
+    assert restored.get_full_topic(1) == "gw1-temperature-1"
+
+
+def test_packed_report_is_smaller():
+    report = _make_report(32)
+
+    assert len(pickle.dumps(report)) < len(pickle.dumps([reading.to_dict() for reading in report.readings]))
+
+
+def test_repickling_packed_report_reuses_payload():
+    restored = pickle.loads(pickle.dumps(_make_report()))
+
+    assert pickle.loads(pickle.dumps(restored))._payload == restored._payload
+
+
+def test_packed_report_keeps_int_values():
+    report = _make_report(4)
+    report.readings[0].value = 221
+    report.readings[2].value = 2 ** 53 + 1
+    report.readings[3].value = -7
+
+    restored = pickle.loads(pickle.dumps(report))
+
+    assert isinstance(restored, PackedGatewayReading)
+    assert [(type(reading.value), reading.value) for reading in restored.readings] == \
+        [(int, 221), (float, 1.5), (int, 2 ** 53 + 1), (int, -7)]
+    assert restored.to_dict() == report.to_dict()
+
+
+@pytest.mark.parametrize("field, value", [
+    ("value", 2 ** 64),
+    ("value", True),
+    ("value", "221"),
+    ("is_active", 1),
+    ("timestamp", datetime.fromtimestamp(1700000000, timezone.utc)),
+])
+def test_report_that_would_change_falls_back_to_objects(field, value):
+    report = _make_report(2)
+    for reading in report.readings:
+        setattr(reading, field, value)
+
+    restored = pickle.loads(pickle.dumps(report))
+
+    assert type(restored) is MqttGatewayReadingModel
+    assert [getattr(reading, field) for reading in restored.readings] == [value, value]
+    assert type(getattr(restored.readings[0], field)) is type(value)
+
+
+@pytest.mark.parametrize("full_topic", ["gw2-temperature-0", "gw1-temperature-01", "gw1-temperature-x"])
+def test_unpackable_report_falls_back_to_objects(full_topic):
+    report = _make_report(2)
+    report.readings[0].full_topic = full_topic
+
+    restored = pickle.loads(pickle.dumps(report))
+
+    assert type(restored) is MqttGatewayReadingModel
+    assert restored.readings[0].full_topic == full_topic
+
+
+def test_empty_report_falls_back_to_objects():
+    report = MqttGatewayReadingModel()
+    report.full_topic = "gw1-status-*"
+
+    restored = pickle.loads(pickle.dumps(report))
+
+    assert type(restored) is MqttGatewayReadingModel
+    assert restored.readings == []
+
+
+class TestColumnarGatewayReading:
+    """Test the columnar report model."""
+
+    def test_readings_and_packing(self):
+        """Test readings are built from the columns and survive pickling."""
+        timestamp = datetime.fromtimestamp(1000000000)
+        report = ColumnarGatewayReading("gw1-status-*", timestamp,
+                                        ["gw1-temperature-0", "gw1-pressure-1"], [1.5, 2.0], [True, False])
+
+        assert len(report) == 2
+        assert [reading.full_topic for reading in report.readings] == \
+            ["gw1-temperature-0", "gw1-pressure-1"]
+        assert report.readings[1].is_active is False
+
+        restored = pickle.loads(pickle.dumps(report))
+        assert restored.to_dict() == report.to_dict()
@@ -0,0 +1,98 @@
+import json
+
+from modules.titanium_mqtt.report_deduplicator import ReportDeduplicator, extract_report_timestamp
+
+TOPIC = "iocloud/response/gw1/sensor/report"
+
+
+def _payload(timestamp, value=1.0):
+    return json.dumps({"timestamp": timestamp, "sensors": [{"value": value, "active": True}]}).encode()
+
+
+class TestExtractReportTimestamp:
+    """Test the timestamp is read without decoding the report."""
+
+    def test_reads_timestamp(self):
+        """Test integer, float and spaced timestamps."""
+        assert extract_report_timestamp(b'{"timestamp": 1000}') == 1000.0
+        assert extract_report_timestamp(b'{"timestamp":1000.5,"sensors":[]}') == 1000.5
+
+    def test_missing_timestamp(self):
+        """Test payloads without a numeric timestamp."""
+        assert extract_report_timestamp(b'{"sensors": []}') is None
+        assert extract_report_timestamp(b'{"timestamp": null}') is None
+
+
+class TestReportDeduplicator:
+    """Test per-gateway watermarks and the dedup window."""
+
+    def test_drops_retransmitted_report(self):
+        """Test the same report received twice is only accepted once."""
+        deduplicator = ReportDeduplicator()
+
+        assert deduplicator.accept_message(TOPIC, _payload(1000))
+        assert not deduplicator.accept_message(TOPIC, _payload(1000))
+        assert deduplicator.get_stats()["duplicates"] == 1
+
+    def test_drops_stale_report(self):
+        """Test a report older than the watermark is dropped."""
+        deduplicator = ReportDeduplicator()
+        deduplicator.accept_message(TOPIC, _payload(1000))
+        deduplicator.accept_message(TOPIC, _payload(1010))
+
+        assert not deduplicator.accept_message(TOPIC, _payload(1005))
+        assert deduplicator.get_watermark("gw1") == 1010
+        assert deduplicator.get_stats()["stale"] == 1
+
+    def test_tolerance_accepts_late_reports_once(self):
+        """Test reports within the tolerance are accepted unless already seen."""
+        deduplicator = ReportDeduplicator(tolerance=10)
+        deduplicator.accept_message(TOPIC, _payload(1010))
+
+        assert deduplicator.accept_message(TOPIC, _payload(1005))
+        assert not deduplicator.accept_message(TOPIC, _payload(1005))
+        assert not deduplicator.accept_message(TOPIC, _payload(990))
+
+    def test_same_timestamp_different_content(self):
+        """Test distinct reports sharing a timestamp are both kept."""
+        deduplicator = ReportDeduplicator()
+
+        assert deduplicator.accept_message(TOPIC, _payload(1000, 1.0))
+        assert deduplicator.accept_message(TOPIC, _payload(1000, 2.0))
+
+    def test_gateways_are_independent(self):
+        """Test a gateway watermark does not affect the others."""
+        deduplicator = ReportDeduplicator()
+        deduplicator.accept_message(TOPIC, _payload(2000))
+
+        assert deduplicator.accept_message("iocloud/response/gw2/sensor/report", _payload(1000))
+        assert deduplicator.get_stats()["gateways"] == 2
+
+    def test_window_forgets_old_reports(self):
+        """Test only the last window_size reports are remembered."""
+        deduplicator = ReportDeduplicator(window_size=2, tolerance=100)
+        for timestamp in (1000, 1001, 1002):
+            deduplicator.accept_message(TOPIC, _payload(timestamp))
+
+        assert deduplicator.accept_message(TOPIC, _payload(1000))
+        assert not deduplicator.accept_message(TOPIC, _payload(1002))
+
+    def test_clock_reset(self):
+        """Test a gateway whose clock went far back is followed instead of dropped."""
+        deduplicator = ReportDeduplicator(clock_reset=3600)
+        deduplicator.accept_message(TOPIC, _payload(100000))
+
+        assert deduplicator.accept_message(TOPIC, _payload(1000))
+        assert deduplicator.accept_message(TOPIC, _payload(1001))
+        assert deduplicator.get_watermark("gw1") == 1001
+        assert deduplicator.get_stats()["watermarkResets"] == 1
+
+    def test_other_messages_pass(self):
+        """Test commands and reports without a valid timestamp are left to the translator."""
+        deduplicator = ReportDeduplicator()
+        command = b'{"command_index": 2}'
+
+        assert deduplicator.accept_message("iocloud/response/gw1/command", command)
+        assert deduplicator.accept_message("iocloud/response/gw1/command", command)
+        assert deduplicator.accept_message(TOPIC, _payload(0))
+        assert deduplicator.get_stats()["accepted"] == 0
@@ -0,0 +1,64 @@
+import pytest
+
+from modules.titanium_mqtt.traffic_recorder import Compression, TrafficRecorder, read_traffic
+
+
+class TestTrafficRecorder:
+    """Test the raw MQTT recording format."""
+
+    @pytest.mark.parametrize("compression", [Compression.NONE, Compression.GZIP])
+    def test_round_trip(self, tmp_path, compression):
+        """Test recorded frames are read back in order."""
+        path = str(tmp_path / "traffic.rec")
+        recorder = TrafficRecorder(path, compression)
+        recorder.record("iocloud/response/gw1/sensor/report", b'{"timestamp": 1}', 10.5)
+        recorder.record("iocloud/response/gwé/command", b"\x00\xff", 11.0)
+        recorder.close()
+
+        assert recorder.frames == 2
+        assert list(read_traffic(path)) == [
+            (10.5, "iocloud/response/gw1/sensor/report", b'{"timestamp": 1}'),
+            (11.0, "iocloud/response/gwé/command", b"\x00\xff"),
+        ]
+
+    @pytest.mark.parametrize("compression", [Compression.NONE, Compression.GZIP])
+    def test_append(self, tmp_path, compression):
+        """Test reopening a recording appends to it."""
+        path = str(tmp_path / "traffic.rec")
+        for arrival_time in (1.0, 2.0):
+            recorder = TrafficRecorder(path, compression)
+            recorder.record("topic", b"payload", arrival_time)
+            recorder.close()
+
+        assert [frame[0] for frame in read_traffic(path)] == [1.0, 2.0]
+
+    def test_truncated_frame_ends_recording(self, tmp_path):
+        """Test a frame cut short by a crash is ignored."""
+        path = tmp_path / "traffic.rec"
+        recorder = TrafficRecorder(str(path))
+        recorder.record("topic", b"complete", 1.0)
+        recorder.record("topic", b"cut short", 2.0)
+        recorder.close()
+        path.write_bytes(path.read_bytes()[:-3])
+
+        assert [frame[2] for frame in read_traffic(str(path))] == [b"complete"]
+
+    def test_rejects_other_files(self, tmp_path):
+        """Test a file that is not a recording is refused."""
+        path = tmp_path / "other.bin"
+        path.write_bytes(b"not a recording")
+
+        with pytest.raises(ValueError):
+            list(read_traffic(str(path)))
+
+    def test_record_after_close_is_ignored(self, tmp_path):
+        """Test messages arriving while stopping do not fail."""
+        recorder = TrafficRecorder(str(tmp_path / "traffic.rec"))
+        recorder.close()
+        recorder.record("topic", b"late")
+        assert recorder.frames == 0
+
+    def test_unknown_compression(self, tmp_path):
+        """Test only the supported compressions are accepted."""
+        with pytest.raises(ValueError):
+            TrafficRecorder(str(tmp_path / "traffic.rec"), "zstd")
@@ -0,0 +1,129 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from modules.titanium_mqtt.translation_pool import (
+    TranslationMode,
+    TranslationWorkerPool,
+    get_gateway_from_topic,
+)
+
+
+class EchoTranslator:
+    """Translator that returns the payload and the calibration it has seen."""
+
+    def initialize(self):
+        self.calibration = []
+
+    def update_calibration(self, calibration_info):
+        self.calibration = calibration_info
+
+    def translate_incoming_message(self, topic, payload):
+        if payload == b"bad":
+            raise ValueError("bad payload")
+        return SimpleNamespace(topic=topic, payload=payload, calibration=self.calibration,
+                               worker=threading.current_thread().name)
+
+
+def _message(gateway, payload):
+    return SimpleNamespace(topic=f"iocloud/response/{gateway}/sensor/report", payload=payload)
+
+
+@pytest.fixture
+def collected():
+    results = []
+    lock = threading.Lock()
+
+    def on_translated(translated, _trace):
+        with lock:
+            results.extend(translated)
+    return results, on_translated
+
+
+class TestTranslationWorkerPool:
+    """Test gateway-sharded translation workers."""
+
+    def test_gateway_from_topic(self):
+        """Test the gateway id is the third level of the topic."""
+        assert get_gateway_from_topic("iocloud/response/gw1/sensor/report") == "gw1"
+        assert get_gateway_from_topic("short") == "short"
+
+    def test_invalid_configuration(self):
+        """Test the pool refuses zero workers and unknown modes."""
+        with pytest.raises(ValueError):
+            TranslationWorkerPool(EchoTranslator, print, workers=0)
+        with pytest.raises(ValueError):
+            TranslationWorkerPool(EchoTranslator, print, mode="fibers")
+
+    def test_per_gateway_order_and_affinity(self, collected):
+        """Test every gateway stays on one worker and keeps its order."""
+        results, on_translated = collected
+        pool = TranslationWorkerPool(EchoTranslator, on_translated, workers=3)
+        pool.start()
+        for batch in range(20):
+            pool.submit([_message(f"gw{gateway}", str(batch).encode()) for gateway in range(8)])
+        pool.stop(timeout=5)
+
+        assert len(results) == 160
+        for gateway in range(8):
+            topic = f"iocloud/response/gw{gateway}/sensor/report"
+            gateway_results = [result for result in results if result.topic == topic]
+            assert [result.payload for result in gateway_results] == \
+                [str(batch).encode() for batch in range(20)]
+            assert {result.worker for result in gateway_results} == \
+                {f"mqtt-translation-{pool.get_worker_index(f'gw{gateway}')}"}
+
+    def test_calibration_applies_in_order(self, collected):
+        """Test calibration reaches every worker between the messages it was sent with."""
+        results, on_translated = collected
+        pool = TranslationWorkerPool(EchoTranslator, on_translated, workers=2)
+        pool.start()
+        pool.submit([_message("gw1", b"before"), _message("gw2", b"before")])
+        pool.update_calibration([{"gateway": "gw1", "indicator": 0, "gain": 2, "offset": 0}])
+        pool.submit([_message("gw1", b"after"), _message("gw2", b"after")])
+        pool.stop(timeout=5)
+
+        for result in results:
+            assert bool(result.calibration) == (result.payload == b"after")
+
+    def test_stats(self, collected):
+        """Test per-worker counters add up to the submitted messages."""
+        _, on_translated = collected
+        pool = TranslationWorkerPool(EchoTranslator, on_translated, workers=2)
+        pool.start()
+        pool.submit([_message("gw1", b"1"), _message("gw1", b"bad"), _message("gw2", b"2")])
+        pool.stop(timeout=5)
+
+        stats = pool.get_stats()
+        assert len(stats) == 2
+        assert sum(worker["submitted"] for worker in stats) == 3
+        assert sum(worker["translated"] for worker in stats) == 2
+        assert sum(worker["errors"] for worker in stats) == 1
+        assert all(worker["depth"] == 0 for worker in stats)
+        assert sum(worker["gateways"] for worker in stats) == 2
+
+    def test_process_workers(self, collected):
+        """Test translations done in worker processes are published in this process."""
+        results, on_translated = collected
+        pool = TranslationWorkerPool(
+            EchoTranslator, on_translated, workers=2, mode=TranslationMode.PROCESSES)
+        pool.start()
+        pool.submit([_message(f"gw{gateway}", b"1") for gateway in range(4)])
+        pool.stop(timeout=10)
+
+        assert sorted(result.topic for result in results) == \
+            sorted(f"iocloud/response/gw{gateway}/sensor/report" for gateway in range(4))
+        assert sum(worker["translated"] for worker in pool.get_stats()) == 4
+
+    def test_trace_is_stamped_after_translation(self):
+        """Test the batch trace reaches on_translated with its translation stamp."""
+        traces = []
+        pool = TranslationWorkerPool(
+            EchoTranslator, lambda _translated, trace: traces.append(trace), workers=1)
+        pool.start()
+        pool.submit([_message("gw1", b"1")], {"received": 1.0})
+        pool.stop(timeout=10)
+
+        assert traces[0]["received"] == 1.0
+        assert traces[0]["translated"] >= 1.0
@@ -0,0 +1,119 @@
+import math
+from unittest.mock import MagicMock
+
+import pytest
+
+from modules.titanium_mqtt.translators.io_cloud_api import IoCloudApiTranslator
+from modules.titanium_mqtt.translators.payload_model import ColumnarGatewayReading
+
+np = pytest.importorskip("numpy")
+
+
+def _translator(device_id, units, calibration=None):
+    translator = IoCloudApiTranslator()
+    translator.initialize()
+    translator.logger = MagicMock()
+    translator._vectorized = True
+    translator._create_system_update({
+        "device_id": device_id, "ip_address": "10.0.0.1", "uptime": 1,
+        "sensors": [{"index": index, "unit": unit, "state": 0, "gain": 1, "offset": 0}
+                    for index, unit in enumerate(units)]})
+    if calibration:
+        translator.update_calibration(calibration)
+    return translator
+
+
+def _report(values, active=True):
+    return {"timestamp": 1000000000,
+            "sensors": [{"value": value, "active": active} for value in values]}
+
+
+class TestVectorizedCalibration:
+    """Test the NumPy report path against the scalar one."""
+
+    @pytest.mark.parametrize("values", [
+        [80, 0.05, 220, 25.5, 3],
+        [80, 2.0, 220, 25.5, 3],
+        [80, 0.05, 0, 25.5],
+        [1, 2],
+    ])
+    def test_matches_scalar_path(self, values):
+        """Test both paths produce the same readings."""
+        translator = _translator("vecGw", ["%", "A", "V", "°C", "kPa"],
+                                 [{"gateway": "vecGw", "indicator": 3, "gain": 2, "offset": 1}])
+        vectorized = translator._read_sensor_report_message("vecGw", _report(values))
+        translator._vectorized = False
+        scalar = translator._read_sensor_report_message("vecGw", _report(values))
+
+        assert isinstance(vectorized, ColumnarGatewayReading)
+        assert vectorized.full_topic == scalar.full_topic
+        assert vectorized.to_dict() == scalar.to_dict()
+
+    def test_sensors_without_topic_are_left_out(self):
+        """Test sensors without topic or configuration are left out, non finite values are kept."""
+        translator = _translator("nanGw", ["°C", "XYZ", "°C"])
+        translator.logger.error.reset_mock()
+
+        report = translator._read_sensor_report_message(
+            "nanGw", _report([1.0, 2.0, float("nan"), 4.0]))
+
+        assert report.topics == ["nanGw-temperature-0", "nanGw-temperature-2"]
+        assert report.values[0] == 1.0
+        assert math.isnan(report.values[1])
+        # Index 3 has no configuration
+        translator.logger.error.assert_called_once()
+
+    def test_non_numeric_report_uses_scalar_path(self):
+        """Test a report with values that are not numbers goes through the scalar path."""
+        translator = _translator("strGw", ["°C"])
+
+        with pytest.raises(TypeError):
+            # The scalar path refuses it like before
+            translator._read_sensor_report_message("strGw", _report(["1"]))
+
+    def test_plan_vectors_follow_calibration(self):
+        """Test a calibration change reaches the cached vectors."""
+        translator = _translator("calVecGw", ["°C"])
+        assert translator._read_sensor_report_message("calVecGw", _report([10])).values == [10.0]
+
+        translator.update_calibration([{"gateway": "calVecGw", "indicator": 0, "gain": 3, "offset": 0}])
+        assert translator._read_sensor_report_message("calVecGw", _report([10])).values == [30.0]
+
+
+def _typed_readings(report):
+    # repr tells 1 from 1.0 and keeps nan comparable
+    return [(reading["subStatusName"], type(reading["value"]), repr(reading["value"]),
+             type(reading["isActive"]), reading["isActive"])
+            for reading in report.to_dict()["readings"]]
+
+
+class TestVectorizedScalarParity:
+    """Test both paths produce the same values with the same types."""
+
+    UNITS = ["%", "A", "V", "°C", "kPa", "°C"]
+
+    @pytest.mark.parametrize("calibration", [
+        None,
+        [{"gateway": "parityGw", "indicator": 3, "gain": 2, "offset": 1}],
+        [{"gateway": "parityGw", "indicator": 3, "gain": 0.5, "offset": 1},
+         {"gateway": "parityGw", "indicator": 4, "gain": 0, "offset": 0}],
+    ])
+    @pytest.mark.parametrize("values, active", [
+        ([80, 0.05, 220, 25, 3, 7], True),
+        ([80, 2, 220, 25.5, 3, -7], 1),
+        ([80.0, 0.0, 0, float("nan"), float("inf"), float("-inf")], False),
+        ([True, False, 1, 2, float("inf"), 0], 0),
+        ([2 ** 40, 1, 2, 3, 4, 5], True),
+        ([1, 2, 3], True),
+        ([1, 2, 3, 4, 5, 6, 7, 8], True),
+        ([], True),
+    ])
+    def test_same_readings(self, calibration, values, active):
+        """Test NaN, inf, integer and boolean readings come out of both paths alike."""
+        translator = _translator("parityGw", self.UNITS, calibration)
+        vectorized = translator._read_sensor_report_message("parityGw", _report(values, active))
+        translator._vectorized = False
+        scalar = translator._read_sensor_report_message("parityGw", _report(values, active))
+
+        assert isinstance(vectorized, ColumnarGatewayReading)
+        assert _typed_readings(vectorized) == _typed_readings(scalar)
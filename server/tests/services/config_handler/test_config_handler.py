@@ -25,6 +25,7 @@ def mock_middleware():
     middleware.send_status = MagicMock()
     middleware.add_subscribe_to_status = MagicMock()
     middleware.remove_subscribe_from_status = MagicMock()
+    middleware.get_last_status = MagicMock(return_value=None)
     return middleware
 
 
@@ -50,8 +51,6 @@ def mock_sensor_data_storage():
     sensor_data_storage.add_new_subscription = MagicMock(
         return_value=(True, "Success"))
     sensor_data_storage.erase_sensor_info = MagicMock()
-    sensor_data_storage.get_last_status_for_topic = MagicMock(
-        return_value=None)
     return sensor_data_storage
 
 
@@ -914,6 +913,30 @@ class TestPanelListAndStatus:
         assert "PanelsInfo" in result
         assert "calibrateUpdate" in result
 
+    def test_create_object_from_panels_info_uses_last_status(self, config_handler, sample_panel_info, mock_config_storage, mock_middleware):
+        """Test panel values come from the middleware last-value cache."""
+        mock_config_storage.add_panel_group.return_value = 1
+        config_handler.add_panel_group("0")
+        mock_config_storage.add_panel.return_value = 1
+        config_handler.add_panel(sample_panel_info)
+
+        reading = MagicMock()
+        reading.full_topic = ClientMiddleware.get_status_topic(
+            sample_panel_info["gateway"], sample_panel_info["topic"], sample_panel_info["indicator"])
+        reading.value = 42.0
+        reading.timestamp = datetime.now()
+        reading.is_active = True
+        mock_middleware.get_last_status.return_value = MagicMock(readings=[
+                                                                 reading])
+
+        result = config_handler.create_object_from_panels_info()
+
+        mock_middleware.get_last_status.assert_called_with(
+            ClientMiddleware.get_gateway_status_topic(sample_panel_info["gateway"]))
+        panel_json = result["PanelsInfo"]["1"]["panels"][0]
+        assert panel_json["value"] == 42.0
+        assert panel_json["isActive"] is True
+
     def test_send_ui_update_action(self, config_handler, mock_middleware):
         """Test sending UI update action."""
         config_handler.send_ui_update_action()
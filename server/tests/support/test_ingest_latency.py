@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from middleware.client_middleware import ClientMiddleware
+from middleware.middleware import Middleware
+from middleware.status_subscriber import StatuSubscribers
+from middleware.subscriber_dispatcher import DispatchMode
+from support.ingest_latency import IngestLatencyTracker, IngestStage, ingest_latency
+
+
+@pytest.fixture
+def tracker():
+    ingest_latency.reset()
+    yield ingest_latency
+    ingest_latency.reset()
+
+
+class TestIngestLatencyTracker:
+    """Test suite for the per-stage ingest latency"""
+
+    def test_start_trace_uses_oldest_message(self):
+        """Test a batch trace starts at the oldest stamped message"""
+        tracker = IngestLatencyTracker(enabled=True)
+        messages = [SimpleNamespace(received_at=5.0), SimpleNamespace(received_at=3.0),
+                    SimpleNamespace(topic="not stamped")]
+
+        assert tracker.start_trace(messages) == {"received": 3.0}
+        assert tracker.start_trace([SimpleNamespace()]) is None
+
+    def test_disabled_tracker_does_not_trace(self):
+        """Test nothing is traced when tracking is disabled"""
+        tracker = IngestLatencyTracker(enabled=False)
+
+        assert tracker.start_trace([SimpleNamespace(received_at=1.0)]) is None
+
+    def test_record_interval_and_query(self):
+        """Test stage latencies are queryable by percentile and in the stats"""
+        tracker = IngestLatencyTracker(enabled=True)
+        for index in range(100):
+            tracker.record_interval(IngestStage.TRANSLATE,
+                                    {"received": 1.0, "translated": 1.0 + (index + 1) / 1000},
+                                    "received", "translated")
+        tracker.record_interval(IngestStage.PUBLISH, {"translated": 1.0}, "translated", "enqueued")
+
+        assert tracker.get_percentile(IngestStage.TRANSLATE, 99) == pytest.approx(0.099, rel=0.02)
+        assert tracker.get_percentile(IngestStage.PUBLISH, 99) is None
+        assert list(tracker.get_stats()) == [IngestStage.TRANSLATE]
+        assert tracker.get_stats()[IngestStage.TRANSLATE]["count"] == 100
+
+    def test_record_subscriber(self):
+        """Test a subscriber records its own stage and the end-to-end latency"""
+        tracker = IngestLatencyTracker(enabled=True)
+        now = time.monotonic()
+
+        tracker.record_subscriber("storage", {"received": now - 0.5, "dequeued": now - 0.1})
+
+        assert tracker.get_percentile("subscriber.storage", 50) == pytest.approx(0.1, abs=0.05)
+        assert tracker.get_percentile("endToEnd.storage", 50) == pytest.approx(0.5, abs=0.05)
+
+
+class TestIngestTraceThroughMiddleware:
+    """A traced batch through a real middleware"""
+
+    @pytest.mark.parametrize("dispatch_mode", [DispatchMode.INLINE, DispatchMode.SERIAL])
+    def test_every_stage_is_recorded(self, tracker, dispatch_mode):
+        """Test the publish, queue and subscriber stages of a traced batch"""
+        with patch("middleware.client_middleware.Logger"):
+            middleware = Middleware()
+            publisher = ClientMiddleware(middleware, "publisher")
+            listener = ClientMiddleware(middleware, "listener")
+        listener.add_subscribe_to_status(StatuSubscribers(MagicMock(), "gw1-status-*"), "gw1-status-*",
+                                         dispatch_mode=dispatch_mode, latency_stage="storage")
+
+        now = time.monotonic()
+        publisher.send_status_array([{"statusName": "gw1-status-*", "data": 1}],
+                                    {"received": now - 0.2, "translated": now - 0.1})
+        listener.run_middleware_update()
+        deadline = time.time() + 5
+        while tracker.get_histogram("endToEnd.storage") is None and time.time() < deadline:
+            time.sleep(0.005)
+        listener._close_dispatchers()
+
+        stats = tracker.get_stats()
+        assert stats[IngestStage.PUBLISH]["count"] == 1
+        assert stats["queue.listener"]["count"] == 1
+        assert stats["subscriber.storage"]["count"] == 1
+        assert stats["endToEnd.storage"]["p99"] >= 200
+
+    def test_untraced_batch_records_nothing(self, tracker):
+        """Test batches without a trace keep the previous delivery path"""
+        with patch("middleware.client_middleware.Logger"):
+            middleware = Middleware()
+            publisher = ClientMiddleware(middleware, "publisher")
+            listener = ClientMiddleware(middleware, "listener")
+        callback = MagicMock()
+        listener.add_subscribe_to_status(StatuSubscribers(callback, "gw1-status-*"), "gw1-status-*",
+                                         latency_stage="storage")
+
+        publisher.send_status_array([{"statusName": "gw1-status-*", "data": 1}])
+        listener.run_middleware_update()
+
+        callback.assert_called_once_with(
+            {"name": "gw1-status-*", "data": 1, "subStatusName": "gw1-status-*"})
+        assert tracker.get_stats() == {}
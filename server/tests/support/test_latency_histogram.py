@@ -0,0 +1,88 @@
+import random
+import threading
+
+import pytest
+
+from support.latency_histogram import LatencyHistogram
+
+
+class TestLatencyHistogram:
+    """Test suite for the HDR-style latency histogram"""
+
+    def test_empty_histogram(self):
+        """Test an empty histogram reports zeros"""
+        histogram = LatencyHistogram()
+
+        assert histogram.get_value_at_percentile(99) == 0
+        assert histogram.get_stats()["count"] == 0
+        assert histogram.get_stats()["mean"] == 0.0
+
+    def test_small_values_are_exact(self):
+        """Test latencies below the sub-bucket count keep microsecond resolution"""
+        histogram = LatencyHistogram()
+        for microseconds in range(1, 101):
+            histogram.record(microseconds / 1e6)
+
+        assert histogram.get_value_at_percentile(50) == pytest.approx(50e-6)
+        assert histogram.get_value_at_percentile(99) == pytest.approx(99e-6)
+        assert histogram.get_value_at_percentile(100) == pytest.approx(100e-6)
+
+    def test_percentiles_within_precision(self):
+        """Test percentiles of a wide distribution stay within the relative error"""
+        generator = random.Random(1)
+        samples = sorted(generator.lognormvariate(-6, 1.5) for _ in range(20000))
+        histogram = LatencyHistogram()
+        for sample in samples:
+            histogram.record(sample)
+
+        for percentile in (50, 90, 99, 99.9):
+            expected = samples[int(len(samples) * percentile / 100) - 1]
+            assert histogram.get_value_at_percentile(percentile) == pytest.approx(expected, rel=0.02)
+        assert histogram.get_stats()["max"] == pytest.approx(samples[-1] * 1000, rel=1e-3)
+
+    def test_values_above_range_are_clamped(self):
+        """Test latencies beyond max_latency land in the last bucket"""
+        histogram = LatencyHistogram(max_latency=1.0)
+        histogram.record(10.0)
+        histogram.record(-1.0)
+
+        assert histogram.count == 2
+        assert histogram.get_value_at_percentile(100) == pytest.approx(1.0)
+        assert histogram.get_stats()["min"] == 0
+
+    def test_merge_and_reset(self):
+        """Test merging adds the counts of another histogram"""
+        first = LatencyHistogram()
+        second = LatencyHistogram()
+        first.record(0.001)
+        second.record(0.003)
+        second.record(0.005)
+
+        first.merge(second)
+
+        assert first.count == 3
+        assert first.get_stats()["min"] == pytest.approx(1.0, rel=0.02)
+        assert first.get_stats()["max"] == pytest.approx(5.0, rel=0.02)
+        first.reset()
+        assert first.count == 0
+
+    def test_merge_rejects_other_range(self):
+        """Test histograms of different ranges cannot be merged"""
+        with pytest.raises(ValueError):
+            LatencyHistogram(max_latency=1).merge(LatencyHistogram(max_latency=100))
+
+    def test_concurrent_recording(self):
+        """Test samples recorded from several threads are all counted"""
+        histogram = LatencyHistogram()
+
+        def record():
+            for _ in range(5000):
+                histogram.record(0.002)
+
+        threads = [threading.Thread(target=record) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert histogram.count == 20000
@@ -0,0 +1,70 @@
+import json
+import threading
+from unittest.mock import MagicMock
+
+from middleware.client_middleware import ClientMiddleware
+from middleware.middleware import Middleware
+from middleware.status_subscriber import StatuSubscribers
+from support.ingest_latency import ingest_latency
+from support.runtime_metrics import RuntimeMetricsReporter
+
+
+class TestRuntimeMetricsReporter:
+    """Test suite for the periodic runtime metrics line"""
+
+    def test_metrics_include_sources_and_ingest_latency(self):
+        """Test every source is collected next to the ingest latency percentiles"""
+        reporter = RuntimeMetricsReporter()
+        reporter.add_source("queue", lambda: {"depth": 3})
+
+        metrics = reporter.get_metrics()
+
+        assert metrics["queue"] == {"depth": 3}
+        assert metrics["ingestLatencyMs"] == ingest_latency.get_stats()
+
+    def test_failing_source_is_left_out(self):
+        """Test a source that raises does not hide the others"""
+        reporter = RuntimeMetricsReporter()
+        reporter._logger = MagicMock()
+        reporter.add_source("broken", MagicMock(side_effect=RuntimeError("gone")))
+        reporter.add_source("queue", lambda: {"depth": 0})
+
+        metrics = reporter.get_metrics()
+
+        assert "broken" not in metrics
+        assert metrics["queue"] == {"depth": 0}
+        reporter._logger.error.assert_called_once()
+
+    def test_client_metrics_are_logged_periodically(self):
+        """Test the queue, command and subscription metrics of a client reach the log line"""
+        middleware = Middleware()
+        client = ClientMiddleware(middleware, "metrics_client")
+        client.add_subscribe_to_status(StatuSubscribers(lambda _: None, "gw1-status-*"), "gw1-status-*")
+        middleware.send_status("gw1-status-*", {"value": 1})
+        client.run_middleware_update()
+
+        reporter = RuntimeMetricsReporter()
+        reporter._logger = MagicMock()
+        logged = threading.Event()
+        reporter._logger.info.side_effect = lambda _: logged.set()
+        reporter.add_source("metrics_client", client.get_metrics)
+
+        reporter.start(interval=0.01)
+        assert logged.wait(1)
+        reporter.stop()
+
+        line = reporter._logger.info.call_args_list[0].args[0]
+        assert line.startswith("RuntimeMetrics: ")
+        metrics = json.loads(line[len("RuntimeMetrics: "):])["metrics_client"]
+        assert metrics["queue"]["depth"] == 0
+        assert metrics["requests"] == {"pending": 0, "answered": 0, "timedOut": 0}
+        [stats] = metrics["subscriptions"]["gw1-status-*"].values()
+        assert stats["calls"] == 1
+
+    def test_zero_interval_disables_the_line(self):
+        """Test no thread is started when the interval is 0"""
+        reporter = RuntimeMetricsReporter()
+
+        reporter.start(interval=0)
+
+        assert reporter._thread is None
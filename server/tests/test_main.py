@@ -0,0 +1,62 @@
+import multiprocessing
+import time
+from unittest.mock import MagicMock, patch
+
+import main
+from middleware.client_middleware import ClientMiddleware
+
+
+class _StartupSender:
+    """Manager that fires a command while it is being built, like ConfigHandler"""
+    LISTENER_NAME = "sender"
+    QUEUE_CAPACITY = 0
+    COMMANDS = ()
+
+    def __init__(self, middleware, use_multiprocessing=False):
+        self._middleware = ClientMiddleware(middleware, self.LISTENER_NAME, use_multiprocessing)
+        self._middleware.send_command("Calibration", {"gateway": "gw1"})
+
+    def run(self):
+        pass
+
+    def wait(self):
+        pass
+
+
+class _SlowOwner:
+    """Manager that registers its command only after a slow construction"""
+    LISTENER_NAME = "owner"
+    QUEUE_CAPACITY = 0
+    COMMANDS = ("Calibration",)
+    received = None
+
+    def __init__(self, middleware, use_multiprocessing=False):
+        time.sleep(0.3)
+        self._middleware = ClientMiddleware(middleware, self.LISTENER_NAME, use_multiprocessing)
+        self._middleware.add_commands({"Calibration": self.calibrate_command})
+        self._done = False
+
+    def calibrate_command(self, command):
+        self.received.put(command["data"])
+        self._done = True
+
+    def run(self):
+        pass
+
+    def wait(self):
+        deadline = time.monotonic() + 5
+        while not self._done and time.monotonic() < deadline:
+            self._middleware.wait_middleware_update(0.05)
+
+
+class TestRunProcesses:
+    """Test the one process per manager deployment"""
+
+    def test_startup_command_reaches_owner_built_later(self):
+        """Test a command sent during startup is delivered once its owner runs"""
+        _SlowOwner.received = multiprocessing.get_context("fork").Queue()
+
+        with patch.object(main, "MANAGER_CLASSES", (_StartupSender, _SlowOwner)):
+            main.run_processes(MagicMock())
+
+        assert _SlowOwner.received.get(timeout=1) == {"gateway": "gw1"}